@@ -0,0 +1,87 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks run against a throwaway test database created with Django's test database machinery,
+so they never touch the development database. Run them from the repository root, e.g.:
+
+    python -m benchmarks.bench_indexes
+"""
+import contextlib
+import os
+import statistics
+import time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blog_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment, teardown_test_environment  # noqa: E402
+
+
+@contextlib.contextmanager
+def test_database():
+    """
+    Creates and migrates a throwaway test database for the duration of the block.
+
+    Yields:
+        str: The name of the test database.
+    """
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield name
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def timeit(func, repeat=50):
+    """
+    Calls `func` repeatedly and returns timing statistics in milliseconds.
+
+    Args:
+        func (callable): The function to time.
+        repeat (int): The number of calls.
+
+    Returns:
+        dict: `median`, `p95` and `mean` latency in milliseconds.
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def summarize(samples):
+    """
+    Returns timing statistics of latency samples.
+
+    Args:
+        samples (list): Latencies in milliseconds.
+
+    Returns:
+        dict: `median`, `p95` and `mean` latency in milliseconds.
+    """
+    samples = sorted(samples)
+    return {
+        'median': statistics.median(samples),
+        'p95': samples[max(int(len(samples) * 0.95) - 1, 0)],
+        'mean': statistics.fmean(samples),
+    }
+
+
+def report(title, stats):
+    """
+    Prints one line of timing statistics.
+
+    Args:
+        title (str): The label for the measurement.
+        stats (dict): Statistics as returned by `timeit`.
+    """
+    print(f"  {title:<40} median {stats['median']:8.3f} ms   p95 {stats['p95']:8.3f} ms   mean {stats['mean']:8.3f} ms")
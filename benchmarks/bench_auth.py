@@ -0,0 +1,80 @@
+"""
+Benchmarks authenticated request throughput with the stock JWT authentication against the
+claims-based fast path.
+
+Seeds a throwaway database with a user and some posts and notifications, then issues requests to
+the post list and the notification list with a bearer token, first authenticated by simplejwt's
+`JWTAuthentication` (one user query per request) and then by `ClaimsJWTAuthentication` (none),
+and prints latency, requests per second and queries per request for each.
+
+Usage:
+    python -m benchmarks.bench_auth [--posts N] [--notifications N] [--repeat N]
+"""
+import argparse
+from unittest import mock
+
+from benchmarks._django import report, test_database, timeit
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from blog.authentication import ClaimsJWTAuthentication, ClaimsRefreshToken
+from blog.models import BlogPost, Notification
+
+AUTHENTICATION = {
+    'JWTAuthentication (user query)': JWTAuthentication,
+    'ClaimsJWTAuthentication (claims)': ClaimsJWTAuthentication,
+}
+
+
+def seed(posts, notifications):
+    """
+    Bulk-inserts a user with posts and notifications.
+
+    Args:
+        posts (int): The number of posts.
+        notifications (int): The number of notifications.
+
+    Returns:
+        CustomUser: The user.
+    """
+    user = get_user_model().objects.create(username='reader', email='reader@example.com', password='!')
+    BlogPost.objects.bulk_create(
+        [BlogPost(title=f'Post {i}', content='Body', author=user) for i in range(posts)], batch_size=2000,
+    )
+    Notification.objects.bulk_create(
+        [Notification(user=user, message=f'Notification {i}') for i in range(notifications)], batch_size=2000,
+    )
+    return user
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=1000)
+    parser.add_argument('--notifications', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=500)
+    args = parser.parse_args()
+
+    with test_database():
+        user = seed(args.posts, args.notifications)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {ClaimsRefreshToken.for_user(user).access_token}')
+        for name in ('post-list-create', 'notification-list'):
+            url = reverse(name)
+            print(f'\nGET {url}:')
+            for title, authentication in AUTHENTICATION.items():
+                with mock.patch.object(APIView, 'authentication_classes', [authentication]):
+                    client.get(url)
+                    with CaptureQueriesContext(connection) as queries:
+                        client.get(url)
+                    count = len(queries.captured_queries)
+                    stats = timeit(lambda: client.get(url), args.repeat)
+                report(title, stats)
+                print(f"  {'':<40} {1000 / stats['mean']:8.0f} req/s   {count} queries per request")
+
+
+if __name__ == '__main__':
+    main()
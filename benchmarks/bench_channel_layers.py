@@ -0,0 +1,107 @@
+"""
+Benchmarks group send throughput of the channel layer backends.
+
+Joins `--members` channels to each of `--groups` groups, then for `--rounds` rounds sends one
+message to every group and receives it on every member, as the notification and post activity
+consumers do, and prints the group sends and deliveries per second and the latency of a
+group send for:
+
+- channels' `InMemoryChannelLayer`,
+- `blog.layers.LocalChannelLayer`,
+- channels_redis' `RedisChannelLayer` on the first of `--redis-hosts`,
+- `blog.layers.ShardedRedisChannelLayer` on all of `--redis-hosts`.
+
+The Redis backends are skipped when a host cannot be reached. The messages carry pre-encoded
+frames, like the events of `blog.outbox` and `blog.activity`.
+
+Usage:
+    python -m benchmarks.bench_channel_layers [--groups N] [--members N] [--rounds N]
+        [--redis-hosts redis://127.0.0.1:6379,redis://127.0.0.1:6380]
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks._django import report, summarize
+from channels.layers import InMemoryChannelLayer
+from channels_redis.core import RedisChannelLayer
+from redis.exceptions import RedisError
+from blog.frames import encode_frames
+from blog.layers import LocalChannelLayer, ShardedRedisChannelLayer
+
+MESSAGE = {
+    'type': 'post_activity',
+    'frames': encode_frames({'type': 'activity', 'post': 1, 'comments': [], 'deltas': {'like_count': 3}}),
+}
+
+
+async def measure(layer, args):
+    """
+    Runs the rounds on a layer.
+
+    Returns:
+        tuple: The group send latencies in milliseconds, and the seconds spent sending and in total.
+    """
+    groups = {}
+    for group_number in range(args.groups):
+        group = f'bench_{group_number}'
+        groups[group] = [await layer.new_channel() for _ in range(args.members)]
+        for channel in groups[group]:
+            await layer.group_add(group, channel)
+    channels = [channel for members in groups.values() for channel in members]
+
+    latencies, sending = [], 0.0
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        round_start = time.perf_counter()
+        for group in groups:
+            send_start = time.perf_counter()
+            await layer.group_send(group, MESSAGE)
+            latencies.append((time.perf_counter() - send_start) * 1000)
+        sending += time.perf_counter() - round_start
+        await asyncio.gather(*(layer.receive(channel) for channel in channels))
+    total = time.perf_counter() - start
+
+    for group, members in groups.items():
+        for channel in members:
+            await layer.group_discard(group, channel)
+    return latencies, sending, total
+
+
+async def run(args):
+    hosts = args.redis_hosts.split(',')
+    layers = {
+        'InMemoryChannelLayer': lambda: InMemoryChannelLayer(),
+        'LocalChannelLayer': lambda: LocalChannelLayer(),
+        'RedisChannelLayer': lambda: RedisChannelLayer(hosts=hosts[:1]),
+        f'ShardedRedisChannelLayer ({len(hosts)} hosts)': lambda: ShardedRedisChannelLayer(hosts=hosts),
+    }
+    deliveries = args.groups * args.members * args.rounds
+    print(f'{args.groups} groups of {args.members} members, {args.rounds} rounds, {deliveries} deliveries')
+    for name, build in layers.items():
+        layer = build()
+        try:
+            if isinstance(layer, RedisChannelLayer):
+                for index in range(layer.ring_size):
+                    await asyncio.wait_for(layer.connection(index).ping(), 2)
+            latencies, sending, total = await measure(layer, args)
+            await layer.flush()
+        except (OSError, asyncio.TimeoutError, RedisError) as exc:
+            print(f'{name}: skipped ({exc!r})')
+            continue
+        print(f'{name}: {len(latencies) / sending:.0f} group sends/s, {deliveries / total:.0f} deliveries/s')
+        report('group send latency', summarize(latencies))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--groups', type=int, default=200)
+    parser.add_argument('--members', type=int, default=10)
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--redis-hosts', default='redis://127.0.0.1:6379')
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmarks the CPU cost of pushing notifications to WebSocket clients.
+
+Pushes one notification through `NotificationConsumer.send_notification` `--pushes` times, as a
+group send reaching that many sockets does, with the channel layer and the transport stubbed out,
+and prints the CPU time per 10k pushes and the frame size for:
+
+- an event carrying the notification, encoded as JSON by every socket (the previous behaviour),
+- an event carrying frames pre-encoded once, sent as JSON text frames,
+- the same event, sent as msgpack binary frames.
+
+Usage:
+    python -m benchmarks.bench_frames [--pushes N] [--repeat N]
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks._django import report, summarize
+from django.utils import timezone
+from blog.consumers import NotificationConsumer
+from blog.frames import encode_frames, encode_message
+
+NOTIFICATION = {
+    'id': 123456,
+    'message': '12 new comments on your post "Scaling WebSocket notifications"',
+    'is_read': False,
+    'created_at': timezone.now(),
+}
+
+
+async def discard(message):
+    pass
+
+
+async def push(event, encoding, pushes):
+    """
+    Sends an event to a consumer `pushes` times and returns the CPU seconds spent.
+    """
+    consumer = NotificationConsumer()
+    consumer.encoding = encoding
+    consumer.base_send = discard
+    start = time.process_time()
+    for _ in range(pushes):
+        await consumer.send_notification(event)
+    return time.process_time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pushes', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    message = {'type': 'notification', **NOTIFICATION}
+    legacy = {**NOTIFICATION, 'created_at': str(NOTIFICATION['created_at'])}
+    cases = {
+        'JSON encoded per socket (before)': (lambda: {'type': 'send_notification', 'notification': legacy}, 'json'),
+        'JSON pre-encoded once': (lambda: {'type': 'send_notification', 'frames': encode_frames(message)}, 'json'),
+        'msgpack pre-encoded once': (lambda: {'type': 'send_notification', 'frames': encode_frames(message)}, 'msgpack'),
+    }
+    print(f'CPU time per {args.pushes} pushes of one notification (event built once, sent to every socket):')
+    for title, (build_event, encoding) in cases.items():
+        samples = []
+        for _ in range(args.repeat):
+            start = time.process_time()
+            event = build_event()
+            built = time.process_time() - start
+            samples.append((built + asyncio.run(push(event, encoding, args.pushes))) * 1000)
+        frame = event['frames'][encoding] if 'frames' in event else encode_message({'type': 'notification', **legacy})
+        report(title, summarize(samples))
+        print(f"  {'':<40} {len(frame)} bytes per frame")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Benchmarks the hot filter/order paths before and after the composite and partial indexes.
+
+Migrates a throwaway database to the latest schema, drops the indexes added by the keyset and
+hot-path index migrations, seeds it and prints the EXPLAIN plan and latency of each query, then
+recreates the indexes and prints them again. Seeding at the latest schema keeps the benchmark
+working as later migrations add columns to the seeded models.
+
+Usage:
+    python -m benchmarks.bench_indexes [--users N] [--posts N] [--rows N] [--repeat N]
+"""
+import argparse
+import random
+
+from datetime import timedelta
+from benchmarks._django import report, test_database, timeit
+from django.contrib.auth import get_user_model
+from django.apps import apps
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.operations import AddIndex
+from django.utils import timezone
+from blog.models import BlogPost, Comment, Notification, PostView
+
+INDEX_MIGRATIONS = ('0010_keyset_pagination_indexes', '0011_hot_path_indexes')
+
+
+def measured_indexes():
+    """
+    Returns the indexes added by the index migrations being measured.
+
+    The migrations are read from disk without a connection, so the development database is
+    neither created nor queried.
+
+    Returns:
+        list: `(model, index)` pairs.
+    """
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    return [
+        (apps.get_model('blog', operation.model_name), operation.index)
+        for name in INDEX_MIGRATIONS
+        for operation in loader.get_migration('blog', name).operations
+        if isinstance(operation, AddIndex)
+    ]
+
+
+def seed(users, posts, rows):
+    """
+    Bulk-inserts users, posts, comments, views and notifications.
+
+    Args:
+        users (int): The number of users.
+        posts (int): The number of posts.
+        rows (int): The number of comments, views and notifications each.
+    """
+    User = get_user_model()
+    User.objects.bulk_create(
+        [User(username=f'user{i}', email=f'user{i}@example.com', password='!') for i in range(users)],
+        batch_size=2000,
+    )
+    user_ids = list(User.objects.values_list('id', flat=True))
+    BlogPost.objects.bulk_create(
+        [BlogPost(title=f'Post {i}', content='Content', author_id=random.choice(user_ids)) for i in range(posts)],
+        batch_size=2000,
+    )
+    post_ids = list(BlogPost.objects.values_list('id', flat=True))
+    Comment.objects.bulk_create(
+        [Comment(post_id=random.choice(post_ids), author_id=random.choice(user_ids), content='Comment')
+         for _ in range(rows)],
+        batch_size=5000,
+    )
+    PostView.objects.bulk_create(
+        [PostView(post_id=random.choice(post_ids), user_id=random.choice(user_ids)) for _ in range(rows)],
+        batch_size=5000,
+    )
+    Notification.objects.bulk_create(
+        [Notification(user_id=random.choice(user_ids), message='Hello', is_read=random.random() < 0.9)
+         for _ in range(rows)],
+        batch_size=5000,
+    )
+
+
+def queries():
+    """
+    Builds the hot-path querysets exercised by the API.
+
+    Returns:
+        list: `(label, queryset)` pairs.
+    """
+    user_id = Notification.objects.values_list('user_id', flat=True).first()
+    post_id = PostView.objects.values_list('post_id', flat=True).first()
+    return [
+        ('unread notifications for a user',
+         Notification.objects.filter(user_id=user_id, is_read=False).order_by('-created_at')[:20]),
+        ('notification page for a user',
+         Notification.objects.filter(user_id=user_id).order_by('-created_at', '-id')[:20]),
+        ('views of a post',
+         PostView.objects.filter(post_id=post_id).values('post_id')),
+        ('views of a post in the last hour',
+         PostView.objects.filter(post_id=post_id, created_at__gte=timezone.now() - timedelta(hours=1)).values('post_id')),
+        ('top-level comments of a post',
+         Comment.objects.filter(post_id=post_id, parent__isnull=True).order_by('created_at')[:20]),
+        ('post list page',
+         BlogPost.objects.order_by('-created_at', '-id')[:10]),
+    ]
+
+
+def run(label, repeat):
+    """
+    Prints the plan and latency of every hot-path query.
+
+    Args:
+        label (str): The heading for this pass.
+        repeat (int): The number of timed executions per query.
+    """
+    print(f'\n== {label} ==')
+    for title, queryset in queries():
+        print(f'\n{title}:')
+        for line in queryset.explain().splitlines():
+            print(f'    {line}')
+        if title.startswith('views of a post'):
+            report(title, timeit(queryset.count, repeat))
+        else:
+            report(title, timeit(lambda: list(queryset.all()), repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--rows', type=int, default=300000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    indexes = measured_indexes()
+    with test_database():
+        with connection.schema_editor() as editor:
+            for model, index in indexes:
+                editor.remove_index(model, index)
+        print(f'Seeding {args.users} users, {args.posts} posts and {args.rows} comments/views/notifications...')
+        seed(args.users, args.posts, args.rows)
+        run(f'before (without the {len(indexes)} indexes of {", ".join(INDEX_MIGRATIONS)})', args.repeat)
+        with connection.schema_editor() as editor:
+            for model, index in indexes:
+                editor.add_index(model, index)
+        run('after', args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmarks the cost of a login with each password hasher and the login throughput under
+concurrency.
+
+Prints the latency of one password check with PBKDF2 (Django's default) and the configured
+`blog.hashers.ScryptPasswordHasher`, then runs concurrent `authenticate` calls from a
+number of request threads and prints logins per second with the hashing pool.
+
+Usage:
+    python -m benchmarks.bench_login [--threads N] [--logins N] [--repeat N]
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks._django import report, test_database, timeit
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.hashers import check_password, make_password
+from django.db import connections
+
+HASHERS = {
+    'PBKDF2 (Django default)': 'pbkdf2_sha256',
+    'scrypt (configured)': 'scrypt',
+}
+
+
+def login(username):
+    """
+    Authenticates a user from a request thread and closes the thread's connection.
+
+    Args:
+        username (str): The username.
+    """
+    try:
+        assert authenticate(username=username, password='password') is not None
+    finally:
+        connections.close_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--logins', type=int, default=64)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    print('One password check:')
+    for title, hasher in HASHERS.items():
+        encoded = make_password('password', hasher=hasher)
+        report(title, timeit(lambda: check_password('password', encoded), args.repeat))
+
+    with test_database():
+        User = get_user_model()
+        for i in range(args.threads):
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='password')
+        with ThreadPoolExecutor(max_workers=args.threads) as requests:
+            start = time.perf_counter()
+            list(requests.map(login, (f'user{i % args.threads}' for i in range(args.logins))))
+            elapsed = time.perf_counter() - start
+        print(f'\n{args.logins} logins from {args.threads} request threads: '
+              f'{elapsed:.2f} s, {args.logins / elapsed:.1f} logins/s')
+
+
+if __name__ == '__main__':
+    main()
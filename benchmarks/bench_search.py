@@ -0,0 +1,129 @@
+"""
+Benchmarks full-text search over a generated corpus against a `LIKE '%term%'` scan.
+
+Seeds a throwaway database with posts and comments whose words follow a Zipf-like distribution,
+times a bulk `reindex_search`, then compares the latency of ranked index queries with the
+equivalent `icontains` scans for common, rare and multi-term queries.
+
+Usage:
+    python -m benchmarks.bench_search [--posts N] [--comments N] [--words N] [--repeat N]
+"""
+import argparse
+import random
+import time
+
+from benchmarks._django import report, test_database, timeit
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from blog.models import BlogPost, Comment
+from blog.search import SearchResults, parse_terms, reindex
+
+VOCABULARY = 20000
+
+
+def word(rank):
+    """
+    Returns the synthetic word of the given frequency rank.
+
+    Args:
+        rank (int): The rank, 0 for the most frequent word.
+
+    Returns:
+        str: The word.
+    """
+    return f'w{rank:05d}x'
+
+
+def text(rng, words, weights):
+    """
+    Generates a text of Zipf-distributed words.
+
+    Args:
+        rng (random.Random): The random generator.
+        words (int): The number of words.
+        weights (list): The cumulative weights of the vocabulary.
+
+    Returns:
+        str: The text.
+    """
+    return ' '.join(word(rank) for rank in rng.choices(range(VOCABULARY), cum_weights=weights, k=words))
+
+
+def seed(posts, comments, words):
+    """
+    Bulk-inserts a user, posts and comments. Signals are bypassed, so the index is left empty.
+
+    Args:
+        posts (int): The number of posts.
+        comments (int): The number of comments.
+        words (int): The number of words per post; comments are a quarter as long.
+    """
+    rng = random.Random(42)
+    weights = []
+    total = 0.0
+    for rank in range(VOCABULARY):
+        total += 1.0 / (rank + 1)
+        weights.append(total)
+    user = get_user_model().objects.create(username='author', email='author@example.com', password='!')
+    BlogPost.objects.bulk_create(
+        [BlogPost(title=text(rng, 6, weights), content=text(rng, words, weights), author=user) for _ in range(posts)],
+        batch_size=2000,
+    )
+    post_ids = list(BlogPost.objects.values_list('id', flat=True))
+    Comment.objects.bulk_create(
+        [Comment(post_id=rng.choice(post_ids), author=user, content=text(rng, max(words // 4, 1), weights))
+         for _ in range(comments)],
+        batch_size=5000,
+    )
+
+
+def scan(terms):
+    """
+    Returns the first page of the `icontains` scan equivalent to a search.
+
+    Args:
+        terms (list): The search terms.
+
+    Returns:
+        tuple: The matching post and comment ids on the page.
+    """
+    post_filter, comment_filter = Q(), Q()
+    for term in terms:
+        post_filter &= Q(title__icontains=term) | Q(content__icontains=term)
+        comment_filter &= Q(content__icontains=term)
+    return (list(BlogPost.objects.filter(post_filter).values_list('id', flat=True)[:20]),
+            list(Comment.objects.filter(comment_filter).values_list('id', flat=True)[:20]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--comments', type=int, default=100000)
+    parser.add_argument('--words', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with test_database():
+        print(f'Seeding {args.posts} posts of {args.words} words and {args.comments} comments...')
+        seed(args.posts, args.comments, args.words)
+        start = time.perf_counter()
+        posts, comments = reindex()
+        print(f'Reindexed {posts} posts and {comments} comments in {time.perf_counter() - start:.2f} s')
+
+        queries = {
+            'common term': word(1),
+            'rare term': word(15000),
+            'two terms': f'{word(10)} {word(200)}',
+            'prefix': 'w0012*',
+        }
+        for title, query in queries.items():
+            terms = parse_terms(query)
+            results = SearchResults(terms)
+            print(f'\n{title} ({query!r}, {results.count()} matches):')
+            report('index: count + ranked page', timeit(lambda: (SearchResults(terms).count(), SearchResults(terms)[:20]), args.repeat))
+            if not query.endswith('*'):
+                report('LIKE scan: first page', timeit(lambda: scan(terms), args.repeat))
+
+
+if __name__ == '__main__':
+    main()
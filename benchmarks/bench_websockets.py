@@ -0,0 +1,298 @@
+"""
+Load-tests the notification WebSocket endpoint with many concurrent connections.
+
+Opens `--connections` WebSockets to `ws/notifications/` on a running server (e.g.
+`daphne blog_project.asgi:application`), each authenticated with its own access token offered as
+the `bearer` subprotocol, and prints:
+
+- connect latency (TCP connect plus handshake) and the number of failed connects,
+- server memory per connection, from the resident set size of `--server-pid` before and after,
+- fan-out latency: every connected user is sent one notification through the channel layer, and
+  the delay until each notification arrives is measured, along with the time until all arrived.
+
+Tokens carry the user claims and are minted locally for user ids starting at `--first-user-id`,
+so the server authenticates the connections without a query and the users need not exist.
+Fan-out needs the harness and the server to share the channel layer (the Redis layer in
+`CHANNEL_LAYERS`). The client is a minimal WebSocket implementation over asyncio streams, so one
+process can hold tens of thousands of sockets. The open file limit is raised to its hard limit;
+beyond about 28000 connections to one address, spread them over `--local-addresses`.
+
+Usage:
+    python -m benchmarks.bench_websockets [--url URL] [--connections N] [--concurrency N]
+        [--server-pid PID] [--rounds N] [--local-addresses 127.0.0.1,127.0.0.2,...]
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import resource
+import struct
+import time
+from urllib.parse import urlsplit
+
+from benchmarks._django import report, summarize
+from channels.layers import get_channel_layer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+def mint_token(user_id):
+    """
+    Returns an access token with the user claims `ClaimsJWTAuthentication` accepts without a query.
+
+    Args:
+        user_id (int): The user id claim.
+
+    Returns:
+        str: The encoded token.
+    """
+    token = AccessToken()
+    token[api_settings.USER_ID_CLAIM] = user_id
+    token['username'] = f'load{user_id}'
+    token['is_staff'] = token['is_superuser'] = False
+    return str(token)
+
+
+def rss_kib(pid):
+    """
+    Returns the resident set size of a process.
+
+    Args:
+        pid (int): The process id.
+
+    Returns:
+        int: The resident set size in KiB.
+    """
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def raise_open_file_limit():
+    """
+    Raises the soft limit of open files to the hard limit.
+
+    Returns:
+        int: The new soft limit.
+    """
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard != resource.RLIM_INFINITY and soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        soft = hard
+    return soft
+
+
+class WebSocketClient:
+    """
+    Minimal WebSocket client over asyncio streams.
+
+    Handles the opening handshake, unfragmented text frames, pings and closing, which is all the
+    notification endpoint needs, at a fraction of the memory of a full client library.
+
+    Methods:
+        connect(host, port, path, subprotocols, local_address): Opens the connection.
+        receive(): Returns the next text message.
+        close(): Closes the connection.
+    """
+
+    def __init__(self):
+        self.reader = self.writer = None
+
+    async def connect(self, host, port, path, subprotocols, local_address=None):
+        """
+        Opens the TCP connection and performs the WebSocket handshake.
+
+        Args:
+            host (str): The server host.
+            port (int): The server port.
+            path (str): The request path.
+            subprotocols (list): The subprotocols offered.
+            local_address (str): The local address to connect from, if any.
+
+        Raises:
+            ConnectionError: If the server does not switch protocols.
+        """
+        self.reader, self.writer = await asyncio.open_connection(
+            host, port, local_addr=(local_address, 0) if local_address else None,
+        )
+        key = base64.b64encode(os.urandom(16)).decode()
+        self.writer.write((
+            f'GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+            f'Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n'
+            f'Sec-WebSocket-Protocol: {", ".join(subprotocols)}\r\n\r\n'
+        ).encode())
+        response = await self.reader.readuntil(b'\r\n\r\n')
+        if not response.startswith(b'HTTP/1.1 101'):
+            raise ConnectionError(response.split(b'\r\n', 1)[0].decode(errors='replace'))
+
+    async def receive(self):
+        """
+        Returns the next text message, answering pings while waiting.
+
+        Returns:
+            str: The message.
+
+        Raises:
+            ConnectionError: If the server closes the connection.
+        """
+        while True:
+            first, second = await self.reader.readexactly(2)
+            length = second & 0x7f
+            if length == 126:
+                length, = struct.unpack('!H', await self.reader.readexactly(2))
+            elif length == 127:
+                length, = struct.unpack('!Q', await self.reader.readexactly(8))
+            payload = await self.reader.readexactly(length)
+            opcode = first & 0x0f
+            if opcode == 0x1:
+                return payload.decode()
+            if opcode == 0x8:
+                raise ConnectionError('Connection closed by the server.')
+            if opcode == 0x9:
+                self._send_frame(0xa, payload)
+
+    def _send_frame(self, opcode, payload):
+        # Client frames must be masked.
+        mask = os.urandom(4)
+        if len(payload) < 126:
+            header = struct.pack('!BB', 0x80 | opcode, 0x80 | len(payload))
+        elif len(payload) < 1 << 16:
+            header = struct.pack('!BBH', 0x80 | opcode, 0x80 | 126, len(payload))
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, 0x80 | 127, len(payload))
+        self.writer.write(header + mask + bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload)))
+
+    async def close(self):
+        """
+        Sends a close frame and closes the connection.
+        """
+        if self.writer is None:
+            return
+        try:
+            self._send_frame(0x8, struct.pack('!H', 1000))
+            await self.writer.drain()
+        except ConnectionError:
+            pass
+        self.writer.close()
+
+
+async def open_connections(args, host, port, path):
+    """
+    Opens one connection per user, at most `--concurrency` handshakes at a time.
+
+    Returns:
+        tuple: The clients by user id, the connect latencies in milliseconds and the number of
+            failed connects.
+    """
+    user_ids = range(args.first_user_id, args.first_user_id + args.connections)
+    tokens = {user_id: mint_token(user_id) for user_id in user_ids}
+    addresses = args.local_addresses.split(',') if args.local_addresses else [None]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    clients, latencies, failures = {}, [], []
+
+    async def open_one(user_id):
+        client = WebSocketClient()
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(client.connect(
+                    host, port, path, ['bearer', tokens[user_id]], addresses[user_id % len(addresses)],
+                ), args.timeout)
+            except (OSError, ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError) as exc:
+                failures.append(exc)
+                await client.close()
+                return
+            latencies.append((time.perf_counter() - start) * 1000)
+        clients[user_id] = client
+
+    await asyncio.gather(*(open_one(user_id) for user_id in user_ids))
+    if failures:
+        print(f'  first failure: {failures[0]!r}')
+    return clients, latencies, len(failures)
+
+
+async def fan_out(clients, concurrency, timeout):
+    """
+    Sends one notification to every connected user through the channel layer and waits for them.
+
+    Returns:
+        tuple: The delivery latencies in milliseconds, the number of notifications not delivered
+            within the timeout, and the seconds spent sending and until all were delivered.
+    """
+    layer = get_channel_layer()
+
+    async def receive(client):
+        notification = json.loads(await client.receive())
+        return (time.time() - notification['sent_at']) * 1000
+
+    receivers = [asyncio.create_task(asyncio.wait_for(receive(client), timeout)) for client in clients.values()]
+    user_ids = list(clients)
+    start = time.perf_counter()
+    for offset in range(0, len(user_ids), concurrency):
+        await asyncio.gather(*(
+            layer.group_send(f'notifications_{user_id}', {
+                'type': 'send_notification',
+                'notification': {'message': 'Load test', 'sent_at': time.time()},
+            })
+            for user_id in user_ids[offset:offset + concurrency]
+        ))
+    sent = time.perf_counter() - start
+    results = await asyncio.gather(*receivers, return_exceptions=True)
+    delivered = [result for result in results if not isinstance(result, BaseException)]
+    return delivered, len(results) - len(delivered), sent, time.perf_counter() - start
+
+
+async def run(args):
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    limit = raise_open_file_limit()
+    if limit < args.connections + 100:
+        print(f'Warning: the open file limit is {limit}, fewer than the connections requested.')
+
+    server_before = rss_kib(args.server_pid) if args.server_pid else None
+    client_before = rss_kib(os.getpid())
+    start = time.perf_counter()
+    clients, latencies, failed = await open_connections(args, host, port, url.path or '/')
+    elapsed = time.perf_counter() - start
+    print(f'Connected {len(clients)}/{args.connections} in {elapsed:.2f} s '
+          f'({len(clients) / elapsed:.0f} connects/s), {failed} failed')
+    if latencies:
+        report('connect latency', summarize(latencies))
+
+    await asyncio.sleep(1)
+    if clients:
+        if server_before is not None:
+            server_after = rss_kib(args.server_pid)
+            print(f'Server memory: {(server_after - server_before) / 1024:+.1f} MiB, '
+                  f'{(server_after - server_before) / len(clients):.1f} KiB per connection')
+        print(f'Harness memory: {(rss_kib(os.getpid()) - client_before) / len(clients):.1f} KiB per connection')
+
+        for round_number in range(1, args.rounds + 1):
+            delivered, missed, sent, total = await fan_out(clients, args.concurrency, args.timeout)
+            print(f'Fan-out round {round_number}: {len(delivered)} delivered, {missed} missed, '
+                  f'sent in {sent:.2f} s, all delivered in {total:.2f} s')
+            if delivered:
+                report('delivery latency', summarize(delivered))
+
+    await asyncio.gather(*(client.close() for client in clients.values()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='ws://127.0.0.1:8000/ws/notifications/')
+    parser.add_argument('--connections', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=500)
+    parser.add_argument('--server-pid', type=int)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--first-user-id', type=int, default=1000000)
+    parser.add_argument('--local-addresses')
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
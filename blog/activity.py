@@ -0,0 +1,159 @@
+from collections import Counter, defaultdict
+from datetime import datetime, timezone as dt_timezone
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from .buffers import WriteBuffer, build_store
+from .frames import encode_frames, push_events
+from .models import BlogPost
+
+DEFAULT_CONFIG = {
+    'BACKEND': 'local',
+    'MAX_SIZE': 10000,
+    'MAX_AGE': 1.0,
+    'BACKGROUND': True,
+}
+
+COMMENT = 'comment'
+COUNTERS = ('like_count', 'comment_count', 'view_count')
+
+
+def post_group(post_id):
+    """
+    Returns the channel layer group of the sockets watching a post.
+
+    Args:
+        post_id (int): The primary key of the blog post.
+
+    Returns:
+        str: The group name.
+    """
+    return f'post_{post_id}'
+
+
+class PostActivityBuffer(WriteBuffer):
+    """
+    Buffer of post activity streamed to the sockets watching each post (`PostActivityConsumer`).
+
+    New comments are buffered as `['comment', post_id, comment_id, author_id, parent_id, content,
+    timestamp]` items and counter changes as `[field, post_id, delta]` items. Each flush sends one
+    `activity` message per active post, with its new comments and the summed change of each
+    counter, so a post liked or viewed thousands of times a second costs its watchers one message
+    per `MAX_AGE` seconds per flushing worker. The message is pre-encoded once and shared by every
+    watcher (see `blog.frames`).
+
+    Changes are buffered after they commit, so a watcher's snapshot may already include deltas
+    still waiting in the buffer. Each message therefore also carries the posts' absolute `counts`,
+    read with one query per flush, and the time `at` they were read; clients set their counters
+    from `counts` (ignoring counts older than their snapshot) and use `deltas` only for display.
+
+    Methods:
+        write(items): Pushes a drained batch of activity to the watchers.
+    """
+
+    def write(self, items):
+        """
+        Pushes one `activity` message per post in the batch.
+
+        Args:
+            items (list): The drained comment and counter items, oldest first.
+        """
+        comments, deltas = defaultdict(list), defaultdict(Counter)
+        for kind, post_id, *values in items:
+            if kind == COMMENT:
+                comment_id, author_id, parent_id, content, created_at = values
+                comments[post_id].append({
+                    'id': comment_id,
+                    'post': post_id,
+                    'author': author_id,
+                    'parent': parent_id,
+                    'content': content,
+                    'created_at': datetime.fromtimestamp(created_at, tz=dt_timezone.utc),
+                })
+            else:
+                deltas[post_id][kind] += values[0]
+        post_ids = list(dict.fromkeys([*comments, *deltas]))
+        read_at = timezone.now()
+        counts = {row.pop('pk'): row for row in BlogPost.objects.filter(pk__in=post_ids).values('pk', *COUNTERS)}
+        events = []
+        for post_id in post_ids:
+            message = {
+                'type': 'activity',
+                'post': post_id,
+                'at': read_at,
+                'counts': counts.get(post_id),
+                'comments': comments[post_id],
+                'deltas': {field: delta for field, delta in deltas[post_id].items() if delta},
+            }
+            if message['counts'] is not None and (message['comments'] or message['deltas']):
+                events.append((post_group(post_id), {'type': 'post_activity', 'frames': encode_frames(message)}))
+        async_to_sync(push_events)(events)
+
+
+_buffer = None
+
+
+def get_post_activity_buffer():
+    """
+    Returns the process-wide post activity buffer, built from the `POST_ACTIVITY` setting.
+
+    Returns:
+        PostActivityBuffer: The configured buffer.
+    """
+    global _buffer
+    if _buffer is None:
+        config = {**DEFAULT_CONFIG, **getattr(settings, 'POST_ACTIVITY', {})}
+        _buffer = PostActivityBuffer(
+            build_store(config, 'blog:post_activity'),
+            max_size=config['MAX_SIZE'],
+            max_age=config['MAX_AGE'],
+            background=config['BACKGROUND'],
+        )
+    return _buffer
+
+
+@receiver(setting_changed)
+def reset_post_activity_buffer(setting, **kwargs):
+    """
+    Drops the cached buffer when `POST_ACTIVITY` is overridden, e.g. in tests.
+    """
+    global _buffer
+    if setting == 'POST_ACTIVITY':
+        _buffer = None
+
+
+def publish(*items):
+    """
+    Buffers activity items once the current transaction commits, so rolled back writes are never
+    streamed. Outside a transaction the items are buffered immediately.
+
+    Args:
+        *items: Activity items.
+    """
+    if items:
+        transaction.on_commit(lambda: get_post_activity_buffer().add(*items))
+
+
+def publish_counts(field, deltas):
+    """
+    Streams changes of a post counter to the posts' watchers.
+
+    Args:
+        field (str): One of `like_count`, `comment_count` or `view_count`.
+        deltas (dict): A mapping of post id to the change of the counter.
+    """
+    publish(*([field, post_id, delta] for post_id, delta in deltas.items() if delta))
+
+
+def publish_comment(comment):
+    """
+    Streams a new comment to the watchers of its post.
+
+    Args:
+        comment (Comment): The saved comment.
+    """
+    publish([COMMENT, comment.post_id, comment.pk, comment.author_id, comment.parent_id, comment.content,
+             comment.created_at.timestamp()])
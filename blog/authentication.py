@@ -0,0 +1,273 @@
+import copy
+import threading
+import time
+from django.contrib.auth import get_user_model
+from django.utils.functional import SimpleLazyObject
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from .blacklist import get_blacklist_filter
+
+USER_CLAIMS = ('username', 'is_staff', 'is_superuser')
+
+
+def set_user_claims(token, user):
+    """
+    Sets the user claims `ClaimsUser` answers from on an access token.
+
+    Args:
+        token (AccessToken): The token.
+        user (CustomUser): The user the token is issued to.
+    """
+    token['username'] = user.get_username()
+    token['is_staff'] = user.is_staff
+    token['is_superuser'] = user.is_superuser
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """
+    Refresh token issuing access tokens that carry the user claims `ClaimsUser` answers from, so
+    authenticated requests do not need to load the user.
+
+    The refresh token itself only identifies the user: simplejwt copies every claim of a refresh
+    token into the access tokens and rotated refresh tokens derived from it, so claims stored on it
+    would outlive a demotion or deactivation for as long as the token keeps being rotated. The
+    claims are instead set on each access token from the `user` it is issued to, the user logging
+    in or the user re-read when the token is refreshed (see `RefreshTokenSerializer`), and are
+    never copied from the refresh token.
+
+    Blacklist checks go through the worker's `BlacklistFilter` first, so only tokens the filter
+    may contain are looked up in the blacklist table.
+
+    Attributes:
+        user (CustomUser): The user access tokens are issued to, if known. Access tokens derived
+            without it carry no user claims, and authenticating them loads the user.
+
+    Methods:
+        for_user(user): Returns a refresh token for the user.
+        access_token: Returns an access token with the user claims set.
+        check_blacklist(): Raises TokenError if the token is blacklisted.
+        blacklist(): Blacklists the token.
+    """
+    no_copy_claims = (*RefreshToken.no_copy_claims, *USER_CLAIMS)
+    user = None
+
+    @classmethod
+    def for_user(cls, user):
+        """
+        Returns a refresh token for the user, issuing access tokens with the user's claims.
+
+        Args:
+            user (CustomUser): The authenticated user.
+
+        Returns:
+            ClaimsRefreshToken: The token.
+        """
+        token = super().for_user(user)
+        token.user = user
+        return token
+
+    @property
+    def access_token(self):
+        """
+        Returns an access token derived from this refresh token, with the claims of `user` set.
+
+        Returns:
+            AccessToken: The token.
+        """
+        access = super().access_token
+        if self.user is not None:
+            set_user_claims(access, self.user)
+        return access
+
+    def check_blacklist(self):
+        """
+        Raises TokenError if the token is blacklisted, querying the blacklist table only when the
+        blacklist filter may contain the token's JTI.
+
+        Raises:
+            TokenError: If the token is blacklisted.
+        """
+        if get_blacklist_filter().might_contain(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+    def blacklist(self):
+        """
+        Blacklists the token and adds its JTI to this worker's blacklist filter.
+
+        Returns:
+            tuple: The BlacklistedToken and whether it was created.
+        """
+        blacklisted = super().blacklist()
+        get_blacklist_filter().add(self.payload[api_settings.JTI_CLAIM])
+        return blacklisted
+
+
+class UserCache:
+    """
+    Small in-process TTL cache of full user instances for `ClaimsUser`.
+
+    Every lookup returns a shallow copy, so a request modifying its user never affects the cached
+    instance or another request. Entries are dropped when the user is saved or deleted in this
+    process (see `blog.signals`); other processes see changes once their entry expires.
+
+    Attributes:
+        timeout (float): Seconds a cached user is served.
+        maxsize (int): The maximum number of cached users; the oldest entries are evicted first.
+
+    Methods:
+        get(user_id): Returns the user, loading it on a miss.
+        invalidate(user_id): Drops a cached user.
+        clear(): Drops every cached user.
+    """
+
+    def __init__(self, timeout=30, maxsize=1024):
+        self.timeout = timeout
+        self.maxsize = maxsize
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """
+        Returns the user, loading it from the database if it is not cached or expired.
+
+        Args:
+            user_id (int): The primary key of the user.
+
+        Returns:
+            CustomUser: A copy of the cached user.
+
+        Raises:
+            AuthenticationFailed: If the user no longer exists.
+        """
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            User = get_user_model()
+            try:
+                user = User.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except User.DoesNotExist:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+            entry = (time.monotonic() + self.timeout, user)
+            with self._lock:
+                if len(self._entries) >= self.maxsize:
+                    self._entries.pop(next(iter(self._entries)))
+                self._entries[user_id] = entry
+        return copy.copy(entry[1])
+
+    def invalidate(self, user_id):
+        """
+        Drops a cached user.
+
+        Args:
+            user_id (int): The primary key of the user.
+        """
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        """
+        Drops every cached user.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+class ClaimsUser(SimpleLazyObject):
+    """
+    Authenticated user built from validated token claims, loading the full user only when needed.
+
+    `id`, `pk`, `username`, `is_staff`, `is_superuser`, `is_authenticated` and `is_anonymous`
+    are answered from the claims. Any other attribute, an `isinstance` check (e.g. assigning the
+    user to a foreign key) or a comparison loads the full user through `user_cache`, at most once
+    per request.
+
+    Methods:
+        get_username(): Returns the username claim.
+    """
+
+    def __init__(self, claims):
+        user_id = claims[api_settings.USER_ID_CLAIM]
+        super().__init__(lambda: user_cache.get(user_id))
+        self.__dict__['_claims'] = claims
+
+    @property
+    def id(self):
+        return self._claims[api_settings.USER_ID_CLAIM]
+
+    pk = id
+
+    @property
+    def username(self):
+        return self._claims['username']
+
+    @property
+    def is_staff(self):
+        return self._claims['is_staff']
+
+    @property
+    def is_superuser(self):
+        return self._claims['is_superuser']
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def get_username(self):
+        return self.username
+
+    def __bool__(self):
+        return True
+
+    def __repr__(self):
+        return f'<ClaimsUser: {self.username}>'
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that builds the request user from the token claims instead of loading it.
+
+    Tokens issued by `ClaimsRefreshToken` carry the user claims and are authenticated without any
+    query. Older tokens without them fall back to the database lookup of `JWTAuthentication`.
+    Because the user row is not read, a demoted or deactivated user keeps the claims of their
+    current access token until it expires (`ACCESS_TOKEN_LIFETIME`), and `CHECK_REVOKE_TOKEN` is
+    enforced only on the fallback. Access tokens never outlive that: the claims are not kept on
+    refresh tokens, and refreshing re-reads the user (see `ClaimsRefreshToken`).
+
+    Methods:
+        get_claims_user(validated_token): Returns a `ClaimsUser` if the token carries the user claims.
+        get_user(validated_token): Returns the user of a validated token.
+    """
+
+    def get_claims_user(self, validated_token):
+        """
+        Returns a `ClaimsUser` for tokens carrying the user claims, without any query.
+
+        Args:
+            validated_token (Token): The validated access token.
+
+        Returns:
+            ClaimsUser | None: The user, or None if the user must be loaded.
+        """
+        if api_settings.USER_ID_CLAIM not in validated_token or api_settings.CHECK_REVOKE_TOKEN:
+            return None
+        if any(claim not in validated_token for claim in USER_CLAIMS):
+            return None
+        return ClaimsUser(validated_token.payload)
+
+    def get_user(self, validated_token):
+        """
+        Returns a `ClaimsUser` for tokens carrying the user claims, or the loaded user otherwise.
+
+        Args:
+            validated_token (Token): The validated access token.
+
+        Returns:
+            ClaimsUser | CustomUser: The authenticated user.
+        """
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+        return self.get_claims_user(validated_token) or super().get_user(validated_token)
@@ -0,0 +1,239 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+DEFAULT_CONFIG = {
+    'CAPACITY': 100000,
+    'ERROR_RATE': 0.001,
+    'SYNC_INTERVAL': 1.0,
+    'REBUILD_INTERVAL': 300.0,
+    'SYNC_MARGIN': 60.0,
+}
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter of strings.
+
+    The bit array is sized for `capacity` members at the given false positive rate, and the bit
+    positions of a member come from double hashing one BLAKE2b digest. Membership tests can return
+    false positives but never false negatives.
+
+    Attributes:
+        capacity (int): The number of members the filter is sized for.
+        size (int): The number of bits.
+        hashes (int): The number of bit positions per member.
+        count (int): The number of members added.
+
+    Methods:
+        add(value): Adds a member.
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = max(capacity, 1)
+        self.size = max(int(math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)), 8)
+        self.hashes = max(int(round(self.size / self.capacity * math.log(2))), 1)
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, value):
+        """
+        Adds a member.
+
+        Args:
+            value (str): The member.
+        """
+        for position in self._positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class BlacklistFilter:
+    """
+    Per-worker Bloom filter of the JTIs of blacklisted, unexpired refresh tokens.
+
+    `ClaimsRefreshToken` consults it before the blacklist table: a JTI the filter has never seen is
+    not blacklisted, so refreshing or logging out with a valid token costs no blacklist query, and
+    only possible members (blacklisted tokens and rare false positives) are confirmed in the
+    database. The filter is rebuilt from the blacklist every `REBUILD_INTERVAL` seconds, which
+    drops expired tokens and resizes it, and picks up tokens blacklisted by other workers with one
+    primary key range query at most every `SYNC_INTERVAL` seconds. Tokens blacklisted by this
+    worker are added immediately, so the window in which another worker may accept a token
+    blacklisted elsewhere is bounded by `SYNC_INTERVAL`.
+
+    Ids are allocated when a row is inserted, not when it commits, so on PostgreSQL a lower id can
+    become visible after a higher one was read. The range query therefore starts below every row
+    blacklisted in the last `SYNC_MARGIN` seconds, re-reading the recent rows each time, so a
+    blacklist entry committed up to `SYNC_MARGIN` seconds after its insert is still picked up.
+
+    Attributes:
+        capacity (int): The minimum number of JTIs the filter is sized for.
+        error_rate (float): The target false positive rate.
+        sync_interval (float): Seconds between incremental updates.
+        rebuild_interval (float): Seconds between full rebuilds.
+        sync_margin (float): Seconds during which a blacklisted row is re-read by every update.
+
+    Methods:
+        might_contain(jti): Returns whether a JTI may be blacklisted.
+        add(jti): Adds a JTI blacklisted by this worker.
+        sync(): Brings the filter up to date when an update is due.
+        rebuild(): Rebuilds the filter from the blacklist table.
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.001, sync_interval=1.0, rebuild_interval=300.0,
+                 sync_margin=60.0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.rebuild_interval = rebuild_interval
+        self.sync_margin = sync_margin
+        self._bloom = None
+        self._last_id = 0
+        self._recent_ids = set()
+        self._synced_at = self._rebuilt_at = 0.0
+        self._lock = threading.Lock()
+
+    def might_contain(self, jti):
+        """
+        Returns whether a JTI may be blacklisted, updating the filter first when an update is due.
+
+        Args:
+            jti (str): The JTI of the token.
+
+        Returns:
+            bool: False if the token is certainly not blacklisted.
+        """
+        self.sync()
+        return jti in self._bloom
+
+    def add(self, jti):
+        """
+        Adds a JTI blacklisted by this worker.
+
+        Args:
+            jti (str): The JTI of the token.
+        """
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(jti)
+
+    def sync(self):
+        """
+        Brings the filter up to date: rebuilds it when it is missing, due for a rebuild or over
+        capacity, and otherwise adds the tokens blacklisted since the last update when one is due.
+        """
+        now = time.monotonic()
+        if (self._bloom is None or now - self._rebuilt_at >= self.rebuild_interval
+                or self._bloom.count > self._bloom.capacity):
+            self.rebuild()
+        elif now - self._synced_at >= self.sync_interval:
+            rows = list(BlacklistedToken.objects.filter(id__gt=self._last_id)
+                        .order_by('id').values_list('id', 'token__jti', 'blacklisted_at'))
+            with self._lock:
+                for row_id, jti, _ in rows:
+                    if row_id not in self._recent_ids:
+                        self._bloom.add(jti)
+                self._advance(rows)
+                self._synced_at = now
+
+    def rebuild(self):
+        """
+        Rebuilds the filter from the blacklisted tokens that have not expired, sized for twice
+        their number or `capacity`, whichever is larger.
+        """
+        now = time.monotonic()
+        rows = list(BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+                    .order_by('id').values_list('id', 'token__jti', 'blacklisted_at'))
+        bloom = BloomFilter(max(self.capacity, 2 * len(rows)), self.error_rate)
+        for _, jti, _ in rows:
+            bloom.add(jti)
+        with self._lock:
+            self._bloom, self._last_id, self._recent_ids = bloom, 0, set()
+            self._advance(rows)
+            self._synced_at = self._rebuilt_at = now
+
+    def _advance(self, rows):
+        # Move the cursor past the rows blacklisted before the margin, stopping at the first recent
+        # one: rows above it are read again by the next update, and lower ids committing late
+        # still fall in its range. The recent ids are remembered so they are not counted twice.
+        cutoff = timezone.now() - timedelta(seconds=self.sync_margin)
+        for index, (row_id, _, blacklisted_at) in enumerate(rows):
+            if blacklisted_at >= cutoff:
+                self._recent_ids = {row[0] for row in rows[index:]}
+                return
+            self._last_id = row_id
+        self._recent_ids = set()
+
+
+def prune_tokens(batch_size=1000, sleep=0.0):
+    """
+    Deletes expired outstanding tokens, and with them their blacklist entries, one batch at a time.
+
+    Expired tokens fail verification on their `exp` claim, so their rows are no longer needed.
+
+    Args:
+        batch_size (int): The number of outstanding tokens deleted per batch.
+        sleep (float): Seconds to pause between batches.
+
+    Returns:
+        tuple: The numbers of outstanding and blacklisted tokens deleted.
+    """
+    outstanding = blacklisted = 0
+    now = timezone.now()
+    while True:
+        pks = list(OutstandingToken.objects.filter(expires_at__lte=now).values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return outstanding, blacklisted
+        _, deleted = OutstandingToken.objects.filter(pk__in=pks).delete()
+        outstanding += deleted.get(OutstandingToken._meta.label, 0)
+        blacklisted += deleted.get(BlacklistedToken._meta.label, 0)
+        if sleep:
+            time.sleep(sleep)
+
+
+_filter = None
+
+
+def get_blacklist_filter():
+    """
+    Returns the process-wide blacklist filter, built from the `TOKEN_BLACKLIST_FILTER` setting.
+
+    Returns:
+        BlacklistFilter: The configured filter.
+    """
+    global _filter
+    if _filter is None:
+        config = {**DEFAULT_CONFIG, **getattr(settings, 'TOKEN_BLACKLIST_FILTER', {})}
+        _filter = BlacklistFilter(
+            capacity=config['CAPACITY'],
+            error_rate=config['ERROR_RATE'],
+            sync_interval=config['SYNC_INTERVAL'],
+            rebuild_interval=config['REBUILD_INTERVAL'],
+            sync_margin=config['SYNC_MARGIN'],
+        )
+    return _filter
+
+
+@receiver(setting_changed)
+def reset_blacklist_filter(setting, **kwargs):
+    """
+    Drops the cached filter when `TOKEN_BLACKLIST_FILTER` is overridden, e.g. in tests.
+    """
+    global _filter
+    if setting == 'TOKEN_BLACKLIST_FILTER':
+        _filter = None
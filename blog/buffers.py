@@ -0,0 +1,255 @@
+import json
+import logging
+import threading
+import time
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class LocalBufferStore:
+    """
+    In-process buffer store holding items in a list guarded by a lock.
+
+    Suitable for a single process and for tests. Items buffered in one worker are flushed by that
+    worker only.
+
+    Methods:
+        push(items): Appends items and returns the buffer size and the time of the oldest item.
+        drain(): Atomically removes and returns all buffered items.
+    """
+
+    def __init__(self):
+        self._items = []
+        self._first_at = None
+        self._lock = threading.Lock()
+
+    def push(self, items):
+        """
+        Appends items to the buffer.
+
+        Args:
+            items (list): JSON-serializable items.
+
+        Returns:
+            tuple: The number of buffered items and the timestamp of the oldest one.
+        """
+        with self._lock:
+            if not self._items:
+                self._first_at = time.time()
+            self._items.extend(items)
+            return len(self._items), self._first_at
+
+    def drain(self):
+        """
+        Removes and returns all buffered items.
+
+        Returns:
+            list: The buffered items, oldest first.
+        """
+        with self._lock:
+            items, self._items = self._items, []
+            self._first_at = None
+            return items
+
+
+class RedisBufferStore:
+    """
+    Buffer store backed by a Redis list, shared by every worker that points at the same key.
+
+    Items are appended with RPUSH and drained with LRANGE + DELETE inside a MULTI/EXEC block, so
+    each item is flushed by exactly one worker.
+
+    Attributes:
+        key (str): The Redis list holding the buffered items.
+
+    Methods:
+        push(items): Appends items and returns the buffer size and the time of the oldest item.
+        drain(): Atomically removes and returns all buffered items.
+    """
+
+    def __init__(self, key, url='redis://127.0.0.1:6379/0', client=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.key = key
+        self.first_at_key = f'{key}:first_at'
+
+    def push(self, items):
+        """
+        Appends items to the Redis list.
+
+        Args:
+            items (list): JSON-serializable items.
+
+        Returns:
+            tuple: The number of buffered items and the timestamp of the oldest one.
+        """
+        pipe = self.client.pipeline()
+        pipe.rpush(self.key, *(json.dumps(item) for item in items))
+        pipe.set(self.first_at_key, time.time(), nx=True)
+        pipe.get(self.first_at_key)
+        size, _, first_at = pipe.execute()
+        return size, float(first_at)
+
+    def drain(self):
+        """
+        Removes and returns all items from the Redis list.
+
+        Returns:
+            list: The buffered items, oldest first.
+        """
+        pipe = self.client.pipeline(transaction=True)
+        pipe.lrange(self.key, 0, -1)
+        pipe.delete(self.key, self.first_at_key)
+        raw, _ = pipe.execute()
+        return [json.loads(item) for item in raw]
+
+
+class FlushThread(threading.Thread):
+    """
+    Daemon thread flushing a write buffer every `interval` seconds, or as soon as it is woken.
+
+    Errors raised by a flush are logged and the thread keeps running; database connections are
+    recycled after every flush like at the end of a request.
+
+    Attributes:
+        buffer (WriteBuffer): The buffer to flush.
+        interval (float): Seconds between periodic flushes.
+
+    Methods:
+        wake(): Requests an immediate flush.
+        run(): Flushes the buffer until the process exits.
+    """
+
+    def __init__(self, buffer, interval):
+        super().__init__(name=f'{type(buffer).__name__}-flush', daemon=True)
+        self.buffer = buffer
+        self.interval = interval
+        self._wakeup = threading.Event()
+
+    def wake(self):
+        """
+        Requests an immediate flush.
+        """
+        self._wakeup.set()
+
+    def run(self):
+        """
+        Flushes the buffer periodically and on every wake-up until the process exits.
+        """
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.buffer.flush()
+            except Exception:
+                logger.exception('Flushing %s failed', type(self.buffer).__name__)
+            finally:
+                close_old_connections()
+
+
+class WriteBuffer:
+    """
+    Base class for write-behind buffers that are flushed in bulk on size and time thresholds.
+
+    Subclasses implement `write(items)` to persist a drained batch. The thresholds are checked on
+    every `add`, and `flush()` can be called from a periodic job or at shutdown to write whatever
+    is left. With `background=True` a reached threshold wakes a `FlushThread` instead of flushing in
+    the caller, which also flushes every `max_age` seconds, so writes never run on the request path.
+
+    Attributes:
+        store: The buffer store (`LocalBufferStore` or `RedisBufferStore`).
+        max_size (int): Flush once this many items are buffered.
+        max_age (float): Flush once the oldest buffered item is this many seconds old.
+        background (bool): Whether flushes run in a background thread.
+
+    Methods:
+        add(*items): Buffers items and flushes if a threshold is reached.
+        flush(): Drains the buffer and writes the items.
+        write(items): Persists a drained batch. Implemented by subclasses.
+    """
+
+    def __init__(self, store, max_size=500, max_age=5.0, background=False):
+        self.store = store
+        self.max_size = max_size
+        self.max_age = max_age
+        self.background = background
+        self._flusher = None
+        self._flusher_lock = threading.Lock()
+
+    def add(self, *items):
+        """
+        Buffers items and flushes the buffer if it is full or its oldest item is too old.
+
+        Args:
+            *items: JSON-serializable items.
+
+        Returns:
+            int: The number of items written by a triggered flush, or 0 if none was triggered or
+                it was handed to the background thread.
+        """
+        size, first_at = self.store.push(list(items))
+        if self.background:
+            flusher = self.get_flusher()
+            if size >= self.max_size:
+                flusher.wake()
+            return 0
+        if size >= self.max_size or time.time() - first_at >= self.max_age:
+            return self.flush()
+        return 0
+
+    def get_flusher(self):
+        """
+        Returns the background flush thread, starting it on first use.
+
+        Returns:
+            FlushThread: The running thread.
+        """
+        if self._flusher is None:
+            with self._flusher_lock:
+                if self._flusher is None:
+                    self._flusher = FlushThread(self, self.max_age)
+                    self._flusher.start()
+        return self._flusher
+
+    def flush(self):
+        """
+        Drains the buffer and writes the items.
+
+        Returns:
+            int: The number of items drained.
+        """
+        items = self.store.drain()
+        if items:
+            self.write(items)
+        return len(items)
+
+    def write(self, items):
+        """
+        Persists a drained batch of items.
+
+        Args:
+            items (list): The drained items, oldest first.
+        """
+        raise NotImplementedError
+
+
+def build_store(config, key):
+    """
+    Builds the buffer store described by a buffer settings dict.
+
+    Args:
+        config (dict): Settings with `BACKEND` (`'local'` or `'redis'`) and, for Redis, `URL`.
+        key (str): The Redis key used by the Redis backend.
+
+    Returns:
+        LocalBufferStore | RedisBufferStore: The configured store.
+    """
+    backend = config.get('BACKEND', 'local')
+    if backend == 'local':
+        return LocalBufferStore()
+    if backend == 'redis':
+        return RedisBufferStore(key, url=config.get('URL', 'redis://127.0.0.1:6379/0'))
+    raise ValueError(f'Unknown buffer backend: {backend}')
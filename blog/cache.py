@@ -0,0 +1,155 @@
+import hashlib
+import json
+import time
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.utils.encoders import JSONEncoder
+
+GENERATION_KEY = 'blog:generation'
+
+
+def get_generation():
+    """
+    Returns the current content generation.
+
+    The generation is a counter shared through the cache backend. Every cached page and fragment
+    records the generation it was built from, so bumping the counter invalidates all of them at once
+    without deleting any keys. If the counter was evicted it is re-seeded from the clock, which is
+    always ahead of any value handed out earlier.
+
+    Returns:
+        int: The current generation.
+    """
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, int(time.time() * 1000), timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_generation():
+    """
+    Advances the content generation, marking every cached page and fragment as stale.
+
+    Returns:
+        int: The new generation.
+    """
+    try:
+        return cache.incr(GENERATION_KEY)
+    except ValueError:
+        get_generation()
+        return cache.incr(GENERATION_KEY)
+
+
+class VersionedCache:
+    """
+    Generation-versioned cache of serialized JSON documents with stampede protection.
+
+    Each entry stores the JSON body together with the generation it was built from and a soft
+    expiry. An entry is fresh while its generation is current and its soft expiry has not passed.
+    When an entry is stale, a single worker acquires a short lock with `cache.add` and rebuilds it,
+    while every other worker keeps serving the stale body. Only a cold miss without any stale body
+    waits briefly for the rebuilding worker before building the document itself.
+
+    Attributes:
+        namespace (str): Prefix for the cache keys of this cache.
+        fresh_timeout (int): Seconds an entry is served without being rebuilt.
+        stale_timeout (int): Seconds an entry is kept in the backend to be served while stale.
+        lock_timeout (int): Seconds after which an abandoned rebuild lock expires.
+        wait_timeout (float): Seconds a cold miss waits for another worker's rebuild.
+        poll_interval (float): Seconds between polls while waiting for a rebuild.
+
+    Methods:
+        make_key(parts): Builds the cache key for a mapping of key parts.
+        get_or_build(parts, builder): Returns the cached document, rebuilding it if necessary.
+    """
+
+    def __init__(self, namespace, fresh_timeout=60, stale_timeout=60 * 15, lock_timeout=10,
+                 wait_timeout=0.5, poll_interval=0.025):
+        self.namespace = namespace
+        self.fresh_timeout = fresh_timeout
+        self.stale_timeout = stale_timeout
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+
+    def make_key(self, parts):
+        """
+        Builds a cache key from a mapping of key parts, independent of their order.
+
+        Args:
+            parts (dict): The values identifying the document, e.g. page, page size and filters.
+
+        Returns:
+            str: The cache key.
+        """
+        canonical = json.dumps(sorted((str(k), str(v)) for k, v in parts.items()))
+        digest = hashlib.sha1(canonical.encode()).hexdigest()
+        return f'{self.namespace}:{digest}'
+
+    def get_or_build(self, parts, builder):
+        """
+        Returns the document identified by `parts`, calling `builder` to produce it when needed.
+
+        Args:
+            parts (dict): The values identifying the document.
+            builder (callable): A function returning the JSON-serializable document.
+
+        Returns:
+            The document, decoded from its cached JSON body or freshly built.
+        """
+        key = self.make_key(parts)
+        generation = get_generation()
+        entry = cache.get(key)
+        if entry and entry['generation'] == generation and entry['fresh_until'] > time.time():
+            return json.loads(entry['body'])
+
+        lock_key = f'{key}:lock'
+        if cache.add(lock_key, 1, timeout=self.lock_timeout):
+            try:
+                return self._build(key, generation, builder)
+            finally:
+                cache.delete(lock_key)
+
+        if entry:
+            return json.loads(entry['body'])
+
+        deadline = time.time() + self.wait_timeout
+        while time.time() < deadline:
+            time.sleep(self.poll_interval)
+            entry = cache.get(key)
+            if entry and entry['generation'] == generation:
+                return json.loads(entry['body'])
+        return builder()
+
+    def _build(self, key, generation, builder):
+        """
+        Builds the document and stores its JSON body tagged with the generation it was built from.
+
+        Args:
+            key (str): The cache key of the document.
+            generation (int): The generation observed before building.
+            builder (callable): A function returning the JSON-serializable document.
+
+        Returns:
+            The freshly built document.
+        """
+        data = builder()
+        cache.set(key, {
+            'generation': generation,
+            'fresh_until': time.time() + self.fresh_timeout,
+            'body': json.dumps(data, cls=JSONEncoder),
+        }, timeout=self.stale_timeout)
+        return data
+
+
+post_page_cache = VersionedCache(
+    'blog:posts:page',
+    fresh_timeout=getattr(settings, 'POST_CACHE_FRESH_TIMEOUT', 60),
+    stale_timeout=getattr(settings, 'POST_CACHE_STALE_TIMEOUT', 60 * 15),
+)
+post_detail_cache = VersionedCache(
+    'blog:posts:detail',
+    fresh_timeout=getattr(settings, 'POST_CACHE_FRESH_TIMEOUT', 60),
+    stale_timeout=getattr(settings, 'POST_CACHE_STALE_TIMEOUT', 60 * 15),
+)
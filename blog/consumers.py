@@ -1,16 +1,157 @@
-import json
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.core.cache import cache
+from django.utils import timezone
+from .activity import COUNTERS, post_group
+from .counters import get_unread_counts
+from .frames import JSON, decode_message, encode_message, negotiate
+from .models import BlogPost, Notification
+from .outbox import notification_group, notification_payload
 
-class NotificationConsumer(AsyncWebsocketConsumer):
+
+def cursor_key(user_id):
+    """
+    Returns the cache key of the last notification id a user's sockets acknowledged.
+
+    Args:
+        user_id (int): The primary key of the user.
+
+    Returns:
+        str: The cache key.
+    """
+    return f'notifications:cursor:{user_id}'
+
+
+class SocketConsumer(AsyncWebsocketConsumer):
+    """
+    Base class of the WebSocket consumers, implementing the message framing they share.
+
+    Messages are JSON text frames, or msgpack binary frames when the client offers the `msgpack`
+    subprotocol (e.g. `new WebSocket(url, ['msgpack', 'bearer', token])`). Pushed messages arrive
+    pre-encoded in every encoding in the channel layer event (see `blog.frames`), so a push
+    reaching many sockets is serialized once, not once per socket. Every socket answers
+    `{"type": "ping"}` heartbeats with `{"type": "pong"}`, echoing any `ts`.
+
+    Attributes:
+        message_types (tuple): The types of the messages clients may send.
+
+    Methods:
+        accept_socket(): Accepts the connection with the negotiated subprotocol.
+        receive(text_data, bytes_data): Handles incoming protocol messages from the WebSocket.
+        handle_ping(message): Answers a heartbeat.
+        send_message(message): Encodes and sends a protocol message to the WebSocket client.
+        send_frame(frame): Sends an encoded message to the WebSocket client.
+        send_event(event): Sends the pre-encoded message of a channel layer event.
+    """
+    message_types = ('ping',)
+
+    async def accept_socket(self):
+        """
+        Accepts the connection. The `json` or `msgpack` subprotocol is accepted when offered, and
+        otherwise the `bearer` subprotocol when the access token was offered as one.
+        """
+        self.encoding, subprotocol = negotiate(self.scope.get('subprotocols'))
+        await self.accept(subprotocol=subprotocol or self.scope.get('auth_subprotocol'))
+
+    async def receive(self, text_data=None, bytes_data=None):
+        """
+        Dispatches a message from the WebSocket client to the `handle_<type>` method of its type,
+        answering malformed messages and types not in `message_types` with an `error` message.
+        Text frames are JSON and binary frames are in the socket's encoding.
+
+        Args:
+            text_data (str): The received text data.
+            bytes_data (bytes): The received binary data.
+        """
+        try:
+            if text_data is not None:
+                message = decode_message(text_data, JSON)
+            else:
+                message = decode_message(bytes_data, self.encoding)
+        except ValueError:
+            await self.send_message({'type': 'error', 'detail': f'Messages must be {self.encoding} objects.'})
+            return
+        message_type = message.get('type') if isinstance(message, dict) else None
+        if message_type not in self.message_types:
+            await self.send_message({'type': 'error', 'detail': 'Unknown message type.'})
+            return
+        await getattr(self, f'handle_{message_type}')(message)
+
+    async def handle_ping(self, message):
+        """
+        Answers a heartbeat.
+
+        Args:
+            message (dict): The `ping` message, optionally with a `ts` to echo.
+        """
+        await self.send_message({'type': 'pong', **({'ts': message['ts']} if 'ts' in message else {})})
+
+    async def send_message(self, message):
+        """
+        Encodes a protocol message in the socket's encoding and sends it to the WebSocket client.
+
+        Args:
+            message (dict): The message, with its `type`.
+        """
+        await self.send_frame(encode_message(message, self.encoding))
+
+    async def send_frame(self, frame):
+        """
+        Sends an encoded message to the WebSocket client, as a text frame for JSON and a binary
+        frame for msgpack.
+
+        Args:
+            frame (str | bytes): The encoded message.
+        """
+        if isinstance(frame, str):
+            await self.send(text_data=frame)
+        else:
+            await self.send(bytes_data=frame)
+
+    async def send_event(self, event):
+        """
+        Sends the frame of the socket's encoding from a channel layer event.
+
+        Args:
+            event (dict): The event data containing the pre-encoded `frames`.
+        """
+        await self.send_frame(event['frames'][self.encoding])
+
+
+class NotificationConsumer(SocketConsumer):
     """
     WebSocket consumer to handle real-time notifications for authenticated users.
 
+    Besides the pushed `notification` and `unread_count` messages and the heartbeats of
+    `SocketConsumer`, clients can send messages of these types:
+
+    - `{"type": "ack", "id": <id>}`: acknowledges every notification up to `id`. The highest
+      acknowledged id is kept in the cache as the user's cursor, so a client that lost its own
+      state can still resume.
+    - `{"type": "resume", "after": <id>}`: replays the notifications created after `id` (or after
+      the acknowledged cursor when `after` is omitted) in one `replay` message, read with one
+      query, along with the current unread count. At most `replay_limit` notifications are
+      replayed; `complete` is false when more were missed (or no cursor is known), and the client
+      should then resume again from the returned `cursor` or fall back to the REST list.
+
+    Notification ids increase, so a notification pushed while a replay is being read may arrive
+    twice; clients drop ids at or below their cursor.
+
+    Attributes:
+        message_types (tuple): `ping`, `ack` and `resume`.
+        replay_limit (int): The maximum number of notifications replayed per `resume`.
+
     Methods:
         connect(): Handles a new WebSocket connection. Authenticated users are added to a notification group.
         disconnect(close_code): Handles WebSocket disconnection. Removes the user from the notification group.
-        receive(text_data): Handles incoming messages from the WebSocket. (Not implemented here.)
+        handle_ack(message): Advances the user's acknowledged cursor.
+        handle_resume(message): Replays the notifications the client missed.
+        fetch_missed(after): Reads the notifications created after a cursor and the unread count.
         send_notification(event): Sends a notification message to the WebSocket client.
+        unread_count(event): Sends a change of the user's unread notification count to the WebSocket client.
     """
+    message_types = ('ping', 'ack', 'resume')
+    replay_limit = 100
 
     async def connect(self):
         """
@@ -21,14 +162,15 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         - Accepts the WebSocket connection if the user is authenticated, otherwise closes it.
         """
         self.user = self.scope['user']
+        self.acked = 0
         if self.user.is_anonymous:
             await self.close()
         else:
             await self.channel_layer.group_add(
-                f'notifications_{self.user.id}',
+                notification_group(self.user.id),
                 self.channel_name
             )
-            await self.accept()
+            await self.accept_socket()
 
     async def disconnect(self, close_code):
         """
@@ -40,24 +182,163 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             close_code (int): The WebSocket close code.
         """
         await self.channel_layer.group_discard(
-            f'notifications_{self.user.id}',
+            notification_group(self.user.id),
             self.channel_name
         )
 
-    async def receive(self, text_data):
+    async def handle_ack(self, message):
         """
-        Handles incoming messages from the WebSocket client. (Currently not implemented.)
+        Advances the user's acknowledged cursor.
 
         Args:
-            text_data (str): The received text data.
+            message (dict): The `ack` message with the highest notification `id` received.
+        """
+        ack = message.get('id')
+        if not isinstance(ack, int) or isinstance(ack, bool):
+            await self.send_message({'type': 'error', 'detail': '`id` must be an integer.'})
+            return
+        if ack > self.acked:
+            self.acked = ack
+            key = cursor_key(self.user.id)
+            if ack > (await cache.aget(key) or 0):
+                await cache.aset(key, ack, timeout=None)
+
+    async def handle_resume(self, message):
+        """
+        Replays the notifications the client missed.
+
+        Args:
+            message (dict): The `resume` message, optionally with the last notification id received
+                as `after`.
+        """
+        after = message.get('after')
+        if after is None:
+            after = await cache.aget(cursor_key(self.user.id))
+        elif not isinstance(after, int) or isinstance(after, bool):
+            await self.send_message({'type': 'error', 'detail': '`after` must be an integer.'})
+            return
+        if after is None:
+            await self.send_message({'type': 'replay', 'notifications': [], 'cursor': None, 'complete': False})
+            return
+        notifications, unread = await self.fetch_missed(after)
+        complete = len(notifications) <= self.replay_limit
+        notifications = notifications[:self.replay_limit]
+        await self.send_message({
+            'type': 'replay',
+            'notifications': [notification_payload(notification) for notification in notifications],
+            'cursor': notifications[-1].id if notifications else after,
+            'complete': complete,
+            'unread': unread,
+        })
+
+    @database_sync_to_async
+    def fetch_missed(self, after):
+        """
+        Reads the user's notifications created after a cursor, oldest first, and the unread count.
+
+        Args:
+            after (int): The last notification id the client received.
+
+        Returns:
+            tuple: Up to `replay_limit + 1` notifications, and the unread count.
         """
-        pass
+        notifications = list(
+            Notification.objects.filter(user_id=self.user.id, id__gt=after).order_by('id')[:self.replay_limit + 1]
+        )
+        return notifications, get_unread_counts([self.user.id])[self.user.id]
 
     async def send_notification(self, event):
         """
         Sends a notification message to the WebSocket client.
 
         Args:
-            event (dict): The event data containing the notification.
+            event (dict): The event data containing the pre-encoded `frames`, or the `notification`
+                to encode.
+        """
+        if 'frames' in event:
+            await self.send_event(event)
+        else:
+            await self.send_message({'type': 'notification', **event['notification']})
+
+    async def unread_count(self, event):
+        """
+        Sends a change of the user's unread notification count to the WebSocket client.
+
+        Args:
+            event (dict): The event data containing the pre-encoded `frames`, or the `delta` and the
+                resulting `unread` count to encode.
+        """
+        if 'frames' in event:
+            await self.send_event(event)
+        else:
+            await self.send_message({
+                'type': 'unread_count',
+                'delta': event['delta'],
+                'unread': event['unread'],
+            })
+
+
+class PostActivityConsumer(SocketConsumer):
+    """
+    WebSocket consumer streaming the activity of one blog post to its readers, in place of polling
+    the post and its comments.
+
+    On connect the socket receives a `snapshot` message with the post's `like_count`,
+    `comment_count` and `view_count` and the time `at` they were read, then `activity` messages
+    with the new comments, the changes of the counters (`deltas`) and the absolute `counts`, at
+    most one per second per post (see `blog.activity.PostActivityBuffer`). The snapshot may already
+    include the deltas of the first activity messages, so clients set their counters from `counts`
+    whenever its `at` is not older than the snapshot's, instead of adding `deltas`. Posts are
+    public, so anonymous readers may watch them.
+
+    Methods:
+        connect(): Joins the post's group and sends the snapshot, or rejects unknown posts.
+        disconnect(close_code): Leaves the post's group.
+        fetch_snapshot(): Reads the post's counters.
+        post_activity(event): Sends a batch of the post's activity to the WebSocket client.
+    """
+
+    async def connect(self):
+        """
+        Handles a new WebSocket connection: rejects it if the post does not exist, and otherwise
+        adds it to the `post_<post_id>` group and sends the post's current counters.
+        """
+        self.post_id = self.scope['url_route']['kwargs']['pk']
+        snapshot = await self.fetch_snapshot()
+        if snapshot is None:
+            await self.close(code=4404)
+            return
+        await self.channel_layer.group_add(post_group(self.post_id), self.channel_name)
+        await self.accept_socket()
+        await self.send_message({'type': 'snapshot', 'post': self.post_id, **snapshot})
+
+    async def disconnect(self, close_code):
+        """
+        Handles WebSocket disconnection by leaving the post's group.
+
+        Args:
+            close_code (int): The WebSocket close code.
+        """
+        await self.channel_layer.group_discard(post_group(self.post_id), self.channel_name)
+
+    @database_sync_to_async
+    def fetch_snapshot(self):
+        """
+        Reads the post's counters with a primary key lookup.
+
+        Returns:
+            dict | None: The `like_count`, `comment_count` and `view_count` and the time `at` they
+                were read, or None if the post does not exist.
+        """
+        read_at = timezone.now()
+        counts = BlogPost.objects.filter(pk=self.post_id).values(*COUNTERS).first()
+        return None if counts is None else {**counts, 'at': read_at}
+
+    async def post_activity(self, event):
+        """
+        Sends a batch of the post's activity to the WebSocket client.
+
+        Args:
+            event (dict): The event data containing the pre-encoded `frames`.
         """
-        await self.send(text_data=json.dumps(event['notification']))
+        await self.send_event(event)
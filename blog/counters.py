@@ -0,0 +1,201 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from .activity import publish_counts
+from .cache import bump_generation
+from .ingest import get_post_view_buffer, increment_by
+from .models import BlogPost, Comment, Like, Notification, NotificationCounter, PostView
+
+COUNTER_FIELDS = ('like_count', 'comment_count', 'view_count')
+
+
+def adjust_counter(post_id, field, delta=1):
+    """
+    Atomically adjusts one of the denormalized counters stored on a BlogPost.
+
+    The update is issued as a single `UPDATE ... SET field = field + delta` statement, so concurrent
+    writers never lose increments. The content generation is bumped so cached post pages and
+    fragments pick up the new count on their next rebuild, and the change is streamed to the post's
+    watchers (see `blog.activity`). Decrements are clamped at zero so a counter that drifted
+    below the true value can never violate the column's non-negative constraint; the
+    `reconcile_post_counters` command repairs such drift.
+
+    Args:
+        post_id (int): The primary key of the blog post.
+        field (str): One of `like_count`, `comment_count` or `view_count`.
+        delta (int): The amount to add to the counter. Negative values decrement it.
+
+    Returns:
+        int: The number of rows updated (0 if the post no longer exists).
+    """
+    return adjust_counters([post_id], field, delta)
+
+
+def adjust_counters(post_ids, field, delta=1):
+    """
+    Atomically adjusts the same counter of several blog posts by the same amount with one UPDATE.
+
+    Args:
+        post_ids (iterable): The primary keys of the blog posts.
+        field (str): One of `like_count`, `comment_count` or `view_count`.
+        delta (int): The amount to add to each counter. Negative values decrement it, clamped at zero.
+
+    Returns:
+        int: The number of rows updated.
+    """
+    if field not in COUNTER_FIELDS:
+        raise ValueError(f'Unknown counter field: {field}')
+    post_ids = list(post_ids)
+    if not delta or not post_ids:
+        return 0
+    value = F(field) + delta if delta > 0 else Greatest(F(field) + delta, Value(0))
+    updated = BlogPost.objects.filter(pk__in=post_ids).update(**{field: value})
+    bump_generation()
+    publish_counts(field, dict.fromkeys(post_ids, delta))
+    return updated
+
+
+def record_view(post_id, user):
+    """
+    Records a view of a blog post by a user.
+
+    The view is appended to the post view buffer and written in bulk, together with the post's
+    view counter and daily rollup, when the buffer is flushed. Views do not bump the content
+    generation; cached pages show the new count once they expire.
+
+    Args:
+        post_id (int): The primary key of the blog post that was viewed.
+        user (CustomUser): The user who viewed the post.
+    """
+    get_post_view_buffer().record(post_id, user.pk)
+
+
+def adjust_unread(deltas):
+    """
+    Atomically adjusts the unread notification counters of several users with a single UPDATE.
+
+    Missing counter rows are created first when a delta is positive. Decrements are clamped at zero
+    like the post counters.
+
+    Args:
+        deltas (dict): A mapping of user id to the change in unread notifications.
+    """
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    created = [user_id for user_id, delta in deltas.items() if delta > 0]
+    if created:
+        NotificationCounter.objects.bulk_create(
+            [NotificationCounter(user_id=user_id) for user_id in created], ignore_conflicts=True,
+        )
+    NotificationCounter.objects.filter(user_id__in=deltas).update(
+        unread=Greatest(F('unread') + increment_by('user_id', deltas), Value(0))
+    )
+
+
+def get_unread_count(user_id):
+    """
+    Returns a user's number of unread notifications with a primary key lookup.
+
+    A user without a counter row, e.g. one whose notifications predate the counter or were
+    inserted outside the API, gets it initialized from a single COUNT.
+
+    Args:
+        user_id (int): The primary key of the user.
+
+    Returns:
+        int: The number of unread notifications.
+    """
+    unread = NotificationCounter.objects.filter(user_id=user_id).values_list('unread', flat=True).first()
+    if unread is None:
+        unread = Notification.objects.filter(user_id=user_id, is_read=False).count()
+        NotificationCounter.objects.bulk_create([NotificationCounter(user_id=user_id, unread=unread)],
+                                                ignore_conflicts=True)
+    return unread
+
+
+def get_unread_counts(user_ids):
+    """
+    Returns the unread notification counters of several users with one query.
+
+    Args:
+        user_ids (iterable): The primary keys of the users.
+
+    Returns:
+        dict: A mapping of user id to unread count, 0 for users without a counter row.
+    """
+    counts = dict.fromkeys(user_ids, 0)
+    counts.update(NotificationCounter.objects.filter(user_id__in=counts).values_list('user_id', 'unread'))
+    return counts
+
+
+def _count_subquery(model):
+    """
+    Builds a correlated subquery counting the rows of `model` that reference the outer blog post.
+
+    Args:
+        model (Model): A model with a `post` foreign key to BlogPost.
+
+    Returns:
+        Coalesce: An expression evaluating to the row count, or 0 when there are no rows.
+    """
+    counts = (model.objects.filter(post=OuterRef('pk'))
+              .order_by()
+              .values('post')
+              .annotate(total=Count('pk'))
+              .values('total'))
+    return Coalesce(Subquery(counts), Value(0))
+
+
+def live_counts():
+    """
+    Returns the expressions that compute every denormalized counter from the underlying tables.
+
+    Returns:
+        dict: A mapping of counter field name to a correlated COUNT subquery.
+    """
+    return {
+        'like_count': _count_subquery(Like),
+        'comment_count': _count_subquery(Comment),
+        'view_count': _count_subquery(PostView),
+    }
+
+
+def reconcile_counters(batch_size=1000, dry_run=False):
+    """
+    Recomputes the denormalized counters for all blog posts and repairs the ones that drifted.
+
+    Posts are processed in primary-key ranges of `batch_size`. Each batch issues one SELECT to find
+    drifted rows and one UPDATE with correlated subqueries to repair them, so no long-running lock is
+    held over the whole table.
+
+    Args:
+        batch_size (int): The number of posts examined per batch.
+        dry_run (bool): If True, drifted posts are reported but not updated.
+
+    Returns:
+        dict: `checked` (posts examined) and `repaired` (posts whose counters were out of date).
+    """
+    checked = repaired = 0
+    last_pk = 0
+    while True:
+        batch = list(BlogPost.objects.filter(pk__gt=last_pk)
+                     .order_by('pk')
+                     .values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1]
+        checked += len(batch)
+
+        annotated = BlogPost.objects.filter(pk__in=batch).annotate(
+            **{f'live_{field}': expr for field, expr in live_counts().items()}
+        )
+        drifted = [
+            row['pk'] for row in annotated.values('pk', *COUNTER_FIELDS, *(f'live_{f}' for f in COUNTER_FIELDS))
+            if any(row[field] != row[f'live_{field}'] for field in COUNTER_FIELDS)
+        ]
+        repaired += len(drifted)
+        if drifted and not dry_run:
+            BlogPost.objects.filter(pk__in=drifted).update(**live_counts())
+    if repaired and not dry_run:
+        bump_generation()
+    return {'checked': checked, 'repaired': repaired}
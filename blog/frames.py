@@ -0,0 +1,94 @@
+import asyncio
+import json
+import msgpack
+from channels.layers import get_channel_layer
+from django.core.serializers.json import DjangoJSONEncoder
+
+JSON = 'json'
+MSGPACK = 'msgpack'
+ENCODINGS = (JSON, MSGPACK)
+
+
+def encode_message(message, encoding=JSON):
+    """
+    Encodes a notification socket message as the payload of one WebSocket frame.
+
+    JSON is compact, with datetimes as ISO 8601 strings as in the REST API. msgpack frames are
+    smaller and cheaper to decode, and carry datetimes as msgpack timestamps.
+
+    Args:
+        message (dict): The message, with its `type`.
+        encoding (str): `'json'` or `'msgpack'`.
+
+    Returns:
+        str | bytes: The text of a JSON frame, or the bytes of a msgpack binary frame.
+    """
+    if encoding == MSGPACK:
+        return msgpack.packb(message, use_bin_type=True, datetime=True)
+    return json.dumps(message, separators=(',', ':'), cls=DjangoJSONEncoder)
+
+
+def encode_frames(message):
+    """
+    Encodes a message once in every encoding, for a channel layer event shared by all the sockets
+    it reaches, so no consumer has to serialize it again.
+
+    Args:
+        message (dict): The message, with its `type`.
+
+    Returns:
+        dict: A mapping of encoding to the encoded frame.
+    """
+    return {encoding: encode_message(message, encoding) for encoding in ENCODINGS}
+
+
+def decode_message(data, encoding=JSON):
+    """
+    Decodes a message received from a client.
+
+    Args:
+        data (str | bytes): The frame payload.
+        encoding (str): `'json'` or `'msgpack'`.
+
+    Returns:
+        object: The decoded message.
+
+    Raises:
+        ValueError: If the payload is not valid in the encoding.
+    """
+    if encoding == MSGPACK:
+        try:
+            return msgpack.unpackb(data, raw=False, timestamp=3)
+        except (ValueError, TypeError, msgpack.UnpackException) as exc:
+            raise ValueError(str(exc)) from exc
+    return json.loads(data)
+
+
+def negotiate(subprotocols):
+    """
+    Picks the message encoding of a socket from the subprotocols its client offered: the first of
+    `json` and `msgpack` offered, or JSON without a subprotocol when neither was.
+
+    Args:
+        subprotocols (list): The subprotocols offered in the handshake.
+
+    Returns:
+        tuple: The encoding, and the subprotocol to accept or None.
+    """
+    for subprotocol in subprotocols or ():
+        if subprotocol in ENCODINGS:
+            return subprotocol, subprotocol
+    return JSON, None
+
+
+async def push_events(events):
+    """
+    Sends channel layer events to their groups concurrently.
+
+    Args:
+        events (list): `(group, event)` pairs.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None or not events:
+        return
+    await asyncio.gather(*(channel_layer.group_send(group, event) for group, event in events))
@@ -0,0 +1,226 @@
+import asyncio
+import inspect
+import os
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model, load_backend
+from django.contrib.auth.signals import user_login_failed
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import ScryptPasswordHasher as BaseScryptPasswordHasher
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.exceptions import PermissionDenied
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+DEFAULT_CONFIG = {
+    'SCRYPT_WORK_FACTOR': 2 ** 14,
+    'SCRYPT_BLOCK_SIZE': 8,
+    'SCRYPT_PARALLELISM': 1,
+    'WORKERS': min(4, os.cpu_count() or 1),
+}
+
+
+def get_config():
+    """
+    Returns the `PASSWORD_HASHING` setting merged over the defaults.
+
+    Returns:
+        dict: The configuration.
+    """
+    return {**DEFAULT_CONFIG, **getattr(settings, 'PASSWORD_HASHING', {})}
+
+
+class ScryptPasswordHasher(BaseScryptPasswordHasher):
+    """
+    Scrypt password hasher with its cost read from the `PASSWORD_HASHING` setting.
+
+    Hashes use the same `scrypt$` format as Django's hasher. Django's default parallelism of 5
+    multiplies the CPU cost of every login; the default here is 1, so a login costs a fraction of
+    a PBKDF2 check while the memory cost stays at `128 * work_factor * block_size` bytes. Changing
+    the cost makes `must_update` true for existing hashes, so they are rehashed on the next
+    successful login.
+    """
+
+    @property
+    def work_factor(self):
+        return get_config()['SCRYPT_WORK_FACTOR']
+
+    @property
+    def block_size(self):
+        return get_config()['SCRYPT_BLOCK_SIZE']
+
+    @property
+    def parallelism(self):
+        return get_config()['SCRYPT_PARALLELISM']
+
+    @property
+    def maxmem(self):
+        # Also bounds verification of hashes made at an earlier, higher cost.
+        return max(64 * 1024 * 1024, 2 * 128 * self.work_factor * self.block_size * self.parallelism)
+
+
+_pool = None
+
+
+def get_hashing_pool():
+    """
+    Returns the process-wide thread pool running password hashes.
+
+    `hashlib` releases the GIL while hashing, so up to `WORKERS` hashes run in parallel on
+    separate cores, and logins beyond that queue instead of competing for CPU with other requests.
+
+    Returns:
+        ThreadPoolExecutor: The pool.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=get_config()['WORKERS'], thread_name_prefix='password-hashing')
+    return _pool
+
+
+def verify(password, encoded):
+    """
+    Checks a password against its hash, rehashing it when the hasher or its cost has changed.
+
+    Args:
+        password (str): The raw password.
+        encoded (str): The stored hash.
+
+    Returns:
+        tuple: Whether the password is correct, and the new hash to store or None.
+    """
+    rehashed = []
+    is_correct = check_password(password, encoded, setter=lambda raw: rehashed.append(make_password(raw)))
+    return is_correct, rehashed[0] if rehashed else None
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    Authentication backend that checks passwords in the hashing pool.
+
+    The user is looked up in the calling thread, so the query runs on the request's connection,
+    and only the hash runs in `get_hashing_pool()`. A hash upgraded on login is saved by the
+    calling thread with an UPDATE of the password column. Unknown usernames still pay for one hash,
+    as in `ModelBackend`, so response times do not reveal which accounts exist.
+
+    `authenticate` blocks its thread until the hash is done. `aauthenticate`, used by this
+    module's `aauthenticate` and so by the async `LoginView`, awaits the pool's future instead, so under ASGI a login waiting for its hash holds neither the event loop nor the
+    thread that runs the sync views.
+
+    Methods:
+        authenticate(request, username, password): Returns the user if the credentials are valid.
+        aauthenticate(request, username, password): Async version of `authenticate`.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        """
+        Returns the user if the credentials are valid and the user may log in.
+
+        Args:
+            request (HttpRequest): The request, if any.
+            username (str): The username.
+            password (str): The raw password.
+
+        Returns:
+            CustomUser | None: The authenticated user.
+        """
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        pool = get_hashing_pool()
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            pool.submit(make_password, password).result()
+            return None
+        is_correct, rehashed = pool.submit(verify, password, user.password).result()
+        if is_correct and rehashed:
+            user.password = rehashed
+            user.save(update_fields=['password'])
+        if is_correct and self.user_can_authenticate(user):
+            return user
+        return None
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        """
+        Returns the user if the credentials are valid and the user may log in, awaiting the hash.
+
+        Args:
+            request (HttpRequest): The request, if any.
+            username (str): The username.
+            password (str): The raw password.
+
+        Returns:
+            CustomUser | None: The authenticated user.
+        """
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        pool = get_hashing_pool()
+        try:
+            user = await sync_to_async(UserModel._default_manager.get_by_natural_key)(username)
+        except UserModel.DoesNotExist:
+            await asyncio.wrap_future(pool.submit(make_password, password))
+            return None
+        is_correct, rehashed = await asyncio.wrap_future(pool.submit(verify, password, user.password))
+        if is_correct and rehashed:
+            user.password = rehashed
+            await user.asave(update_fields=['password'])
+        if is_correct and self.user_can_authenticate(user):
+            return user
+        return None
+
+
+async def aauthenticate(request=None, **credentials):
+    """
+    Async `django.contrib.auth.authenticate` that awaits the backends' `aauthenticate`.
+
+    Django 5.1's `aauthenticate` runs the sync `authenticate` in a thread, so a login would still
+    hold a thread for the whole hash. Here backends with an async `aauthenticate`, such as
+    `PooledModelBackend`, are awaited, and the others run in a thread. As in `authenticate`,
+    backends that do not accept the credentials are skipped, `PermissionDenied` stops the search,
+    and `user_login_failed` is sent when no backend accepts them.
+
+    Args:
+        request (HttpRequest): The request, if any.
+        **credentials: The credentials, e.g. `username` and `password`.
+
+    Returns:
+        CustomUser | None: The authenticated user, annotated with its backend's path.
+    """
+    for backend_path in settings.AUTHENTICATION_BACKENDS:
+        backend = load_backend(backend_path)
+        try:
+            inspect.signature(backend.authenticate).bind(request, **credentials)
+        except TypeError:
+            continue
+        try:
+            if iscoroutinefunction(getattr(backend, 'aauthenticate', None)):
+                user = await backend.aauthenticate(request, **credentials)
+            else:
+                user = await sync_to_async(backend.authenticate)(request, **credentials)
+        except PermissionDenied:
+            break
+        if user is None:
+            continue
+        user.backend = backend_path
+        return user
+    cleaned = {key: '********' if key == 'password' else value for key, value in credentials.items()}
+    await user_login_failed.asend(sender=__name__, credentials=cleaned, request=request)
+    return None
+
+
+@receiver(setting_changed)
+def reset_hashing_pool(setting, **kwargs):
+    """
+    Drops the cached pool when `PASSWORD_HASHING` is overridden, e.g. in tests.
+    """
+    global _pool
+    if setting == 'PASSWORD_HASHING' and _pool is not None:
+        _pool.shutdown(wait=False)
+        _pool = None
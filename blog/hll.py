@@ -0,0 +1,121 @@
+import hashlib
+import math
+import zlib
+
+
+class HyperLogLog:
+    """
+    HyperLogLog sketch estimating the number of distinct values added to it.
+
+    With the default precision of 12 the sketch has 4096 one-byte registers (4 KB, usually far
+    less once compressed) and a standard error of about 1.04 / sqrt(4096) = 1.6%. Sketches with the
+    same precision can be merged by taking the register-wise maximum, which yields the sketch of the
+    union of both inputs, so per-day sketches can be combined into any date range.
+
+    Attributes:
+        precision (int): The number of hash bits used to select a register.
+        registers (bytearray): The register values.
+
+    Methods:
+        add(value): Adds a value to the sketch.
+        update(values): Adds several values to the sketch.
+        merge(other): Merges another sketch into this one.
+        count(): Returns the estimated number of distinct values.
+        to_bytes(): Serializes the sketch.
+        from_bytes(data): Deserializes a sketch.
+    """
+
+    def __init__(self, precision=12, registers=None):
+        if not 4 <= precision <= 16:
+            raise ValueError('precision must be between 4 and 16')
+        self.precision = precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(1 << precision)
+
+    @property
+    def size(self):
+        """
+        Returns:
+            int: The number of registers.
+        """
+        return len(self.registers)
+
+    def add(self, value):
+        """
+        Adds a value to the sketch.
+
+        Args:
+            value: Any value; it is hashed through its string representation.
+        """
+        digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        index = hashed >> (64 - self.precision)
+        remainder = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values):
+        """
+        Adds several values to the sketch.
+
+        Args:
+            values (iterable): The values to add.
+        """
+        for value in values:
+            self.add(value)
+
+    def merge(self, other):
+        """
+        Merges another sketch into this one, producing the sketch of the union of both.
+
+        Args:
+            other (HyperLogLog): A sketch with the same precision.
+
+        Returns:
+            HyperLogLog: This sketch.
+        """
+        if other.precision != self.precision:
+            raise ValueError('Cannot merge sketches with different precisions')
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        """
+        Returns the estimated number of distinct values added to the sketch.
+
+        Small cardinalities use linear counting over the empty registers, which is exact-ish where
+        the raw HyperLogLog estimate is biased.
+
+        Returns:
+            int: The estimate.
+        """
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self):
+        """
+        Serializes the sketch as its precision followed by the compressed registers.
+
+        Returns:
+            bytes: The serialized sketch.
+        """
+        return bytes([self.precision]) + zlib.compress(bytes(self.registers))
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Deserializes a sketch produced by `to_bytes`.
+
+        Args:
+            data (bytes): The serialized sketch.
+
+        Returns:
+            HyperLogLog: The sketch.
+        """
+        data = bytes(data)
+        return cls(precision=data[0], registers=zlib.decompress(data[1:]))
@@ -0,0 +1,142 @@
+import time
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, When
+from django.dispatch import receiver
+from .activity import publish_counts
+from .buffers import WriteBuffer, build_store
+from .models import BlogPost, PostView, PostViewDaily
+from .rollups import record_events
+from .sketches import update_viewer_sketches
+
+DEFAULT_CONFIG = {
+    'BACKEND': 'local',
+    'MAX_SIZE': 500,
+    'MAX_AGE': 5.0,
+    'BACKGROUND': True,
+}
+
+
+def increment_by(key_field, deltas):
+    """
+    Builds an expression adding a per-row amount, for a single UPDATE across many rows.
+
+    Args:
+        key_field (str): The field identifying each row.
+        deltas (dict): A mapping of key to the amount added to that row.
+
+    Returns:
+        Case: An expression evaluating to the amount for the row being updated.
+    """
+    return Case(*(When(**{key_field: key}, then=delta) for key, delta in deltas.items()),
+                default=0, output_field=IntegerField())
+
+
+class PostViewBuffer(WriteBuffer):
+    """
+    Write-behind buffer for post views.
+
+    Views are buffered as `[post_id, user_id, timestamp]` items and written in bulk: the raw rows
+    with `bulk_create`, then the per-day totals in `PostViewDaily` and the `view_count` column of
+    the posts with one UPDATE per table, the viewers are added to the daily unique-viewer
+    sketches and the views to the analytics rollups, all in a single transaction. The new view
+    counts are streamed to the posts' watchers once it commits.
+
+    With `BACKGROUND` set, a `FlushThread` writes the buffered views every `MAX_AGE` seconds even
+    when no further view arrives, so a worker that goes quiet does not hold views indefinitely.
+    With the local backend, views still buffered when a process exits are lost; the Redis backend
+    keeps them until the next flush by any worker, e.g. the `flush_post_views` command.
+
+    Methods:
+        record(post_id, user_id): Buffers a view.
+        write(items): Persists a drained batch of views.
+    """
+
+    def record(self, post_id, user_id):
+        """
+        Buffers a view of a blog post.
+
+        Args:
+            post_id (int): The primary key of the blog post.
+            user_id (int): The primary key of the viewing user.
+
+        Returns:
+            int: The number of views written by a triggered flush, or 0.
+        """
+        return self.add([post_id, user_id, time.time()])
+
+    def write(self, items):
+        """
+        Writes a batch of buffered views and rolls them up.
+
+        Views of posts or by users deleted since they were buffered are dropped.
+
+        Args:
+            items (list): The drained `[post_id, user_id, timestamp]` items.
+        """
+        post_ids = set(BlogPost.objects.filter(pk__in={item[0] for item in items}).values_list('pk', flat=True))
+        user_ids = set(get_user_model().objects.filter(pk__in={item[1] for item in items}).values_list('pk', flat=True))
+        views = [
+            PostView(post_id=post_id, user_id=user_id, created_at=datetime.fromtimestamp(ts, tz=dt_timezone.utc))
+            for post_id, user_id, ts in items
+            if post_id in post_ids and user_id in user_ids
+        ]
+        if not views:
+            return
+        per_post = Counter(view.post_id for view in views)
+        per_day = Counter((view.post_id, view.created_at.date()) for view in views)
+
+        with transaction.atomic():
+            PostView.objects.bulk_create(views, batch_size=1000)
+            PostViewDaily.objects.bulk_create(
+                [PostViewDaily(post_id=post_id, day=day) for post_id, day in per_day],
+                ignore_conflicts=True,
+            )
+            rows = Q()
+            for post_id, day in per_day:
+                rows |= Q(post_id=post_id, day=day)
+            PostViewDaily.objects.filter(rows).update(views=F('views') + Case(
+                *(When(post_id=post_id, day=day, then=count) for (post_id, day), count in per_day.items()),
+                default=0, output_field=IntegerField(),
+            ))
+            BlogPost.objects.filter(pk__in=per_post).update(view_count=F('view_count') + increment_by('pk', per_post))
+            publish_counts('view_count', per_post)
+            update_viewer_sketches((view.post_id, view.user_id, view.created_at.date()) for view in views)
+            record_events('views', (view.created_at for view in views))
+
+
+_buffer = None
+
+
+def get_post_view_buffer():
+    """
+    Returns the process-wide post view buffer, built from the `POST_VIEW_BUFFER` setting.
+
+    Returns:
+        PostViewBuffer: The configured buffer.
+    """
+    global _buffer
+    if _buffer is None:
+        config = {**DEFAULT_CONFIG, **getattr(settings, 'POST_VIEW_BUFFER', {})}
+        _buffer = PostViewBuffer(
+            build_store(config, 'blog:post_views'),
+            max_size=config['MAX_SIZE'],
+            max_age=config['MAX_AGE'],
+            background=config['BACKGROUND'],
+        )
+    return _buffer
+
+
+@receiver(setting_changed)
+def reset_post_view_buffer(setting, **kwargs):
+    """
+    Drops the cached buffer when `POST_VIEW_BUFFER` is overridden, e.g. in tests.
+    """
+    global _buffer
+    if setting == 'POST_VIEW_BUFFER':
+        _buffer = None
+
@@ -0,0 +1,228 @@
+import asyncio
+import bisect
+import hashlib
+import time
+from copy import deepcopy
+from channels.layers import InMemoryChannelLayer
+from channels_redis.core import RedisChannelLayer
+
+
+class LocalChannelLayer(InMemoryChannelLayer):
+    """
+    In-process channel layer for single-node deployments and tests, where every consumer and
+    every sender runs in one process and a group send need not cross the network.
+
+    Unlike channels' `InMemoryChannelLayer`, which scans every channel and group for expired
+    entries on each send and receive, creates one task per group member and copies the message
+    once per member, a group send here copies the message once and puts it straight on each
+    member's queue; members share the copy, so consumers must not modify received messages.
+    Expired messages and memberships are cleaned up at most once per `clean_interval` seconds.
+
+    Sends from another thread, such as the background flush threads of the write buffers (see
+    `blog.buffers`), are handed to the event loop the consumers receive on, since asyncio queues
+    are not thread-safe. A message sent to a full channel is dropped, as with the other layers.
+
+    Attributes:
+        clean_interval (float): The minimum number of seconds between two expiry cleanups.
+        loop (asyncio.AbstractEventLoop): The event loop the consumers last received on.
+
+    Methods:
+        send(channel, message): Sends a message to a channel.
+        receive(channel): Returns the next message of a channel.
+        group_send(group, message): Sends a message to every channel of a group.
+        flush(): Drops every channel and group.
+    """
+
+    def __init__(self, clean_interval=1.0, **kwargs):
+        super().__init__(**kwargs)
+        self.clean_interval = clean_interval
+        self.cleaned_at = 0.0
+        self.loop = None
+
+    async def send(self, channel, message):
+        """
+        Sends a message to a channel.
+
+        Args:
+            channel (str): The channel name.
+            message (dict): The message.
+        """
+        assert isinstance(message, dict), 'message is not a dict'
+        assert self.valid_channel_name(channel), 'Channel name not valid'
+        self._dispatch(self._deliver, [channel], (time.time() + self.expiry, deepcopy(message)))
+
+    async def receive(self, channel):
+        """
+        Returns the next message of a channel, waiting for one if it is empty.
+
+        Args:
+            channel (str): The channel name.
+
+        Returns:
+            dict: The message.
+        """
+        assert self.valid_channel_name(channel)
+        self.loop = asyncio.get_running_loop()
+        self._clean_expired()
+        queue = self._queue(channel)
+        try:
+            _, message = await queue.get()
+        finally:
+            if queue.empty():
+                self.channels.pop(channel, None)
+        return message
+
+    async def group_send(self, group, message):
+        """
+        Sends a message to every channel of a group, without creating tasks or waiting.
+
+        Args:
+            group (str): The group name.
+            message (dict): The message.
+        """
+        assert isinstance(message, dict), 'Message is not a dict'
+        assert self.valid_group_name(group), 'Invalid group name'
+        if group in self.groups:
+            self._dispatch(self._deliver_group, group, (time.time() + self.expiry, deepcopy(message)))
+
+    async def flush(self):
+        await super().flush()
+        self.loop = None
+
+    def _dispatch(self, deliver, target, item):
+        # Deliver on the receiving loop: directly when already on it (or when nothing receives),
+        # otherwise through the loop's thread-safe callback queue.
+        loop = self.loop
+        if loop is None or loop.is_closed() or loop is asyncio.get_running_loop():
+            deliver(target, item)
+        else:
+            loop.call_soon_threadsafe(deliver, target, item)
+
+    def _deliver_group(self, group, item):
+        self._clean_expired()
+        self._deliver(list(self.groups.get(group, ())), item)
+
+    def _deliver(self, channels, item):
+        for channel in channels:
+            try:
+                self._queue(channel).put_nowait(item)
+            except asyncio.QueueFull:
+                pass
+
+    def _queue(self, channel):
+        queue = self.channels.get(channel)
+        if queue is None:
+            queue = self.channels[channel] = asyncio.Queue(maxsize=self.get_capacity(channel))
+        return queue
+
+    def _clean_expired(self):
+        now = time.monotonic()
+        if now - self.cleaned_at >= self.clean_interval:
+            self.cleaned_at = now
+            super()._clean_expired()
+
+
+class HashRing:
+    """
+    Consistent hash ring mapping keys to nodes.
+
+    Each node is placed on the ring at `replicas` points derived from its name, and a key maps to
+    the node of the first point at or after the key's hash. Adding or removing one of N nodes
+    therefore moves only about 1/N of the keys, and keys spread evenly over the nodes.
+
+    Attributes:
+        points (list): The sorted hashes of the nodes' points.
+        nodes (list): The node index of each point.
+
+    Methods:
+        node(key): Returns the index of the node a key maps to.
+    """
+
+    def __init__(self, names, replicas=160):
+        ring = sorted(
+            (self.hash(f'{name}#{replica}'), index)
+            for index, name in enumerate(names)
+            for replica in range(replicas)
+        )
+        self.points = [point for point, _ in ring]
+        self.nodes = [index for _, index in ring]
+
+    @staticmethod
+    def hash(key):
+        """
+        Returns the 64-bit ring position of a key.
+
+        Args:
+            key (str | bytes): The key.
+
+        Returns:
+            int: The position.
+        """
+        if isinstance(key, str):
+            key = key.encode('utf8')
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'big')
+
+    def node(self, key):
+        """
+        Returns the index of the node a key maps to.
+
+        Args:
+            key (str | bytes): The key.
+
+        Returns:
+            int: The index of the node in the names the ring was built from.
+        """
+        position = bisect.bisect_left(self.points, self.hash(key))
+        return self.nodes[position % len(self.points)]
+
+
+def host_name(host):
+    """
+    Returns the identity of a Redis host on the hash ring, independent of its position in the
+    `hosts` list.
+
+    Args:
+        host (dict): A host as decoded by channels_redis, with an `address` or a `host` and `port`.
+
+    Returns:
+        str: The host's name.
+    """
+    if 'address' in host:
+        return host['address']
+    if 'master_name' in host:
+        return host['master_name']
+    return f"{host.get('host', 'localhost')}:{host.get('port', 6379)}"
+
+
+class ShardedRedisChannelLayer(RedisChannelLayer):
+    """
+    Redis channel layer spreading groups and channels over several Redis servers with a
+    consistent hash ring.
+
+    channels_redis shards by `crc32(key) % len(hosts)`, which remaps almost every group when a
+    server is added or removed, stranding the memberships of connected sockets on servers that
+    are no longer asked for them. Here each group and channel maps to a server through a
+    `HashRing` of the hosts' names, so scaling from N to N + 1 servers moves only about
+    1/(N + 1) of them, and the load spreads evenly. Every worker must list the same hosts.
+
+    Attributes:
+        ring (HashRing): The ring of the configured hosts.
+    """
+
+    def __init__(self, hosts=None, replicas=160, **kwargs):
+        super().__init__(hosts=hosts, **kwargs)
+        self.ring = HashRing([host_name(host) for host in self.hosts], replicas)
+
+    def consistent_hash(self, value):
+        """
+        Returns the index of the host a group or channel name maps to.
+
+        Args:
+            value (str | bytes): The group or channel name.
+
+        Returns:
+            int: The host index.
+        """
+        if self.ring_size == 1:
+            return 0
+        return self.ring.node(value)
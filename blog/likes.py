@@ -0,0 +1,595 @@
+import math
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.signals import setting_changed
+from django.db import connection, transaction
+from django.db.models import Exists, F, OuterRef, Value
+from django.db.models.functions import Greatest
+from django.dispatch import receiver
+from django.utils import timezone
+from .activity import publish_counts
+from .buffers import WriteBuffer, build_store
+from .cache import bump_generation
+from .counters import adjust_counters
+from .ingest import increment_by
+from .models import BlogPost, Like
+from .rollups import adjust_total, record_events
+
+DEFAULT_CONFIG = {
+    'ENABLED': False,
+    'BACKEND': 'local',
+    'MAX_SIZE': 500,
+    'MAX_AGE': 1.0,
+    'BACKGROUND': True,
+}
+
+LIKE = 'like'
+UNLIKE = 'unlike'
+ACTIONS = (LIKE, UNLIKE)
+
+
+def insert_likes(user_id, post_ids):
+    """
+    Inserts a user's likes of several posts with one `INSERT ... SELECT ... ON CONFLICT DO NOTHING
+    RETURNING` statement.
+
+    Only posts that exist are selected, and likes that already exist are skipped by the unique
+    `(user, post)` constraint instead of raising IntegrityError, so concurrent double taps insert
+    exactly one row. Requires PostgreSQL or SQLite 3.35+.
+
+    Args:
+        user_id (int): The primary key of the user.
+        post_ids (iterable): The primary keys of the posts.
+
+    Returns:
+        set: The ids of the posts that were newly liked.
+    """
+    post_ids = list(post_ids)
+    if not post_ids:
+        return set()
+    quote = connection.ops.quote_name
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    sql = (
+        f'INSERT INTO {quote(Like._meta.db_table)} ({quote("user_id")}, {quote("post_id")}, {quote("created_at")}) '
+        f'SELECT %s, {quote("id")}, %s FROM {quote(BlogPost._meta.db_table)} '
+        f'WHERE {quote("id")} IN ({", ".join(["%s"] * len(post_ids))}) '
+        f'ON CONFLICT ({quote("user_id")}, {quote("post_id")}) DO NOTHING '
+        f'RETURNING {quote("post_id")}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user_id, now, *post_ids])
+        return {row[0] for row in cursor.fetchall()}
+
+
+def delete_likes(user_id, post_ids):
+    """
+    Deletes a user's likes of several posts with one `DELETE ... RETURNING` statement.
+
+    Args:
+        user_id (int): The primary key of the user.
+        post_ids (iterable): The primary keys of the posts.
+
+    Returns:
+        set: The ids of the posts whose like was removed.
+    """
+    post_ids = list(post_ids)
+    if not post_ids:
+        return set()
+    quote = connection.ops.quote_name
+    sql = (
+        f'DELETE FROM {quote(Like._meta.db_table)} '
+        f'WHERE {quote("user_id")} = %s AND {quote("post_id")} IN ({", ".join(["%s"] * len(post_ids))}) '
+        f'RETURNING {quote("post_id")}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user_id, *post_ids])
+        return {row[0] for row in cursor.fetchall()}
+
+
+def apply_likes(user_id, liked=(), unliked=()):
+    """
+    Likes and unlikes posts for a user in one transaction, keeping counters and analytics in step.
+
+    The rows changed are reported by the statements themselves, so the `like_count` of exactly
+    those posts is adjusted (one UPDATE per direction), the likes total and buckets are updated,
+    and cached post pages are invalidated once. Repeating an operation changes nothing, so clients
+    can safely retry.
+
+    Args:
+        user_id (int): The primary key of the user.
+        liked (iterable): The ids of the posts to like.
+        unliked (iterable): The ids of the posts to unlike.
+
+    Returns:
+        tuple: The sets of post ids newly liked and actually unliked.
+    """
+    with transaction.atomic():
+        added = insert_likes(user_id, liked)
+        removed = delete_likes(user_id, unliked)
+        adjust_counters(added, 'like_count', 1)
+        adjust_counters(removed, 'like_count', -1)
+        if added:
+            record_events('likes', [timezone.now()] * len(added))
+        if removed:
+            adjust_total('likes', -len(removed))
+    return added, removed
+
+
+def insert_like_pairs(pairs, created_at, chunk_size=500):
+    """
+    Inserts likes of many users with multi-row `INSERT ... ON CONFLICT DO NOTHING RETURNING`
+    statements, skipping likes that already exist.
+
+    Args:
+        pairs (list): `(user_id, post_id)` pairs of existing users and posts.
+        created_at (datetime): The creation time of the likes.
+        chunk_size (int): The number of rows per statement.
+
+    Returns:
+        list: The `(user_id, post_id)` pairs inserted.
+    """
+    quote = connection.ops.quote_name
+    created_at = connection.ops.adapt_datetimefield_value(created_at)
+    inserted = []
+    with connection.cursor() as cursor:
+        for start in range(0, len(pairs), chunk_size):
+            chunk = pairs[start:start + chunk_size]
+            cursor.execute(
+                f'INSERT INTO {quote(Like._meta.db_table)} ({quote("user_id")}, {quote("post_id")}, {quote("created_at")}) '
+                f'VALUES {", ".join(["(%s, %s, %s)"] * len(chunk))} '
+                f'ON CONFLICT ({quote("user_id")}, {quote("post_id")}) DO NOTHING '
+                f'RETURNING {quote("user_id")}, {quote("post_id")}',
+                [value for user_id, post_id in chunk for value in (user_id, post_id, created_at)],
+            )
+            inserted.extend(tuple(row) for row in cursor.fetchall())
+    return inserted
+
+
+def delete_like_pairs(pairs, chunk_size=500):
+    """
+    Deletes likes of many users with `DELETE ... RETURNING` statements.
+
+    Args:
+        pairs (list): `(user_id, post_id)` pairs.
+        chunk_size (int): The number of pairs per statement.
+
+    Returns:
+        list: The `(user_id, post_id)` pairs deleted.
+    """
+    quote = connection.ops.quote_name
+    condition = f'({quote("user_id")} = %s AND {quote("post_id")} = %s)'
+    deleted = []
+    with connection.cursor() as cursor:
+        for start in range(0, len(pairs), chunk_size):
+            chunk = pairs[start:start + chunk_size]
+            cursor.execute(
+                f'DELETE FROM {quote(Like._meta.db_table)} WHERE {" OR ".join([condition] * len(chunk))} '
+                f'RETURNING {quote("user_id")}, {quote("post_id")}',
+                [value for pair in chunk for value in pair],
+            )
+            deleted.extend(tuple(row) for row in cursor.fetchall())
+    return deleted
+
+
+class LocalPendingStore:
+    """
+    In-process store of the like states a `LikeBuffer` accepted and has not written yet, for the
+    local backend, whose buffered likes are also held by the accepting worker only.
+
+    Entries are `(liked, baseline, recorded_at)` tuples per user and post, `baseline` being the
+    state in the database when the change was accepted.
+
+    Methods:
+        get(user_id): Returns the user's pending entries.
+        set(user_id, entries, ttl): Stores pending entries of a user.
+        settle(final): Forgets the entries a flush has written.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """
+        Returns the user's pending entries.
+
+        Args:
+            user_id (int): The primary key of the user.
+
+        Returns:
+            dict: A mapping of post id to `(liked, baseline, recorded_at)`.
+        """
+        with self._lock:
+            return dict(self._entries.get(user_id, {}))
+
+    def set(self, user_id, entries, ttl):
+        """
+        Stores pending entries of a user, replacing those of the same posts.
+
+        Args:
+            user_id (int): The primary key of the user.
+            entries (dict): A mapping of post id to `(liked, baseline, recorded_at)`.
+            ttl (float): Seconds the entries are kept; expired entries are ignored by the buffer.
+        """
+        with self._lock:
+            self._entries.setdefault(user_id, {}).update(entries)
+
+    def settle(self, final):
+        """
+        Forgets the entries a flush has written. An entry changed again after the drain stays
+        pending, relative to the state just written.
+
+        Args:
+            final (dict): A mapping of `(user_id, post_id)` to the `(liked, recorded_at)` written.
+        """
+        with self._lock:
+            for (user_id, post_id), (state, recorded_at) in final.items():
+                pending = self._entries.get(user_id, {})
+                entry = pending.get(post_id)
+                if entry is None:
+                    continue
+                if entry[2] <= recorded_at:
+                    del pending[post_id]
+                else:
+                    pending[post_id] = (entry[0], state, entry[2])
+                if not pending:
+                    self._entries.pop(user_id, None)
+
+
+class RedisPendingStore:
+    """
+    Store of pending like states shared by every worker through Redis, for the Redis backend: a
+    like accepted by one worker is seen as pending by the user's next request on any worker, and
+    is settled by whichever worker flushes it.
+
+    Each user's entries are a hash of post id to `liked:baseline:recorded_at`, expiring `ttl`
+    seconds after the user's last change. Entries are settled with a Lua script, so a change
+    accepted while a flush runs is never dropped.
+
+    Attributes:
+        key (str): The prefix of the per-user hashes.
+
+    Methods:
+        get(user_id): Returns the user's pending entries.
+        set(user_id, entries, ttl): Stores pending entries of a user.
+        settle(final): Forgets the entries a flush has written.
+    """
+
+    SETTLE_SCRIPT = """
+        local entry = redis.call('HGET', KEYS[1], ARGV[1])
+        if not entry then
+            return 0
+        end
+        local liked, baseline, recorded_at = string.match(entry, '^(%d):(%d):(.+)$')
+        if tonumber(recorded_at) <= tonumber(ARGV[3]) then
+            redis.call('HDEL', KEYS[1], ARGV[1])
+        else
+            redis.call('HSET', KEYS[1], ARGV[1], liked .. ':' .. ARGV[2] .. ':' .. recorded_at)
+        end
+        return 1
+    """
+
+    def __init__(self, key, url='redis://127.0.0.1:6379/0', client=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.key = key
+        self._settle = client.register_script(self.SETTLE_SCRIPT)
+
+    def _user_key(self, user_id):
+        return f'{self.key}:{user_id}'
+
+    def get(self, user_id):
+        """
+        Returns the user's pending entries.
+
+        Args:
+            user_id (int): The primary key of the user.
+
+        Returns:
+            dict: A mapping of post id to `(liked, baseline, recorded_at)`.
+        """
+        entries = {}
+        for post_id, value in self.client.hgetall(self._user_key(user_id)).items():
+            liked, baseline, recorded_at = value.decode().split(':')
+            entries[int(post_id)] = (liked == '1', baseline == '1', float(recorded_at))
+        return entries
+
+    def set(self, user_id, entries, ttl):
+        """
+        Stores pending entries of a user, replacing those of the same posts.
+
+        Args:
+            user_id (int): The primary key of the user.
+            entries (dict): A mapping of post id to `(liked, baseline, recorded_at)`.
+            ttl (float): Seconds the user's entries are kept after this change.
+        """
+        key = self._user_key(user_id)
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping={
+            post_id: f'{int(liked)}:{int(baseline)}:{recorded_at!r}'
+            for post_id, (liked, baseline, recorded_at) in entries.items()
+        })
+        pipe.expire(key, max(math.ceil(ttl), 1))
+        pipe.execute()
+
+    def settle(self, final):
+        """
+        Forgets the entries a flush has written. An entry changed again after the drain stays
+        pending, relative to the state just written.
+
+        Args:
+            final (dict): A mapping of `(user_id, post_id)` to the `(liked, recorded_at)` written.
+        """
+        pipe = self.client.pipeline()
+        for (user_id, post_id), (state, recorded_at) in final.items():
+            self._settle(keys=[self._user_key(user_id)], args=[post_id, int(state), repr(recorded_at)], client=pipe)
+        pipe.execute()
+
+
+def build_pending_store(config, key):
+    """
+    Builds the pending like store matching the backend of the `LIKE_BUFFER` setting.
+
+    Args:
+        config (dict): The `LIKE_BUFFER` settings.
+        key (str): The prefix of the Redis keys used by the Redis backend.
+
+    Returns:
+        LocalPendingStore | RedisPendingStore: The configured store.
+    """
+    if config.get('BACKEND', 'local') == 'redis':
+        return RedisPendingStore(key, url=config.get('URL', 'redis://127.0.0.1:6379/0'))
+    return LocalPendingStore()
+
+
+class LikeBuffer(WriteBuffer):
+    """
+    Write-behind buffer for likes and unlikes, for posts receiving likes faster than rows can be
+    inserted one request at a time.
+
+    A like or unlike is checked against the user's pending state or one query, then buffered as a
+    `[user_id, post_id, liked, timestamp]` item instead of written. Each flush collapses the batch
+    to the last state of every `(user, post)` pair and applies it with one multi-row insert and one
+    delete, adjusts `like_count` of every touched post with one UPDATE, bumps the cache generation
+    once and updates the analytics rollups, in a single transaction. The like counts served to
+    other users therefore lag by at most one flush interval (`MAX_AGE`).
+
+    Read-your-own-writes: accepted changes are kept as pending in the `pending` store until the
+    flush that writes them, so the same user liking twice still gets "already liked", and
+    `overlay_pending_likes` shows the user their own pending likes in post payloads. With the Redis
+    backend the pending states are shared by all workers, so this holds whichever worker serves
+    the user's next request. With the local backend both the buffered likes and the pending
+    states stay in the accepting worker, so it only holds for a single worker or with sticky
+    routing of each user to one worker. Pending states expire after three flush intervals, in
+    case their flush is lost.
+
+    Attributes:
+        pending (LocalPendingStore | RedisPendingStore): The store of pending like states.
+        pending_ttl (float): Seconds a pending state is trusted.
+
+    Methods:
+        apply(user_id, liked, unliked): Buffers the state changes among a user's likes and unlikes.
+        pending_for_user(user_id): Returns the user's pending like states.
+        write(items): Persists a drained batch of likes and unlikes.
+    """
+
+    def __init__(self, store, pending=None, **kwargs):
+        super().__init__(store, **kwargs)
+        self.pending = pending if pending is not None else LocalPendingStore()
+        self.pending_ttl = 3 * self.max_age
+
+    def _pending_entries(self, user_id, now):
+        return {
+            post_id: entry for post_id, entry in self.pending.get(user_id).items()
+            if now - entry[2] < self.pending_ttl
+        }
+
+    def apply(self, user_id, liked=(), unliked=()):
+        """
+        Buffers the likes and unlikes that change the user's state. The current state comes from
+        the user's pending changes, or else from one query that also skips missing posts.
+
+        Args:
+            user_id (int): The primary key of the user.
+            liked (iterable): The ids of the posts to like.
+            unliked (iterable): The ids of the posts to unlike.
+
+        Returns:
+            tuple: The sets of post ids newly liked and unliked.
+        """
+        wanted = {**{post_id: False for post_id in unliked}, **{post_id: True for post_id in liked}}
+        now = time.time()
+        pending = self._pending_entries(user_id, now)
+        current = {post_id: pending[post_id][0] if post_id in pending else None for post_id in wanted}
+        unknown = [post_id for post_id, state in current.items() if state is None]
+        if unknown:
+            current.update(
+                BlogPost.objects.filter(pk__in=unknown)
+                .annotate(liked=Exists(Like.objects.filter(user_id=user_id, post_id=OuterRef('pk'))))
+                .values_list('pk', 'liked')
+            )
+        changes = {
+            post_id: state for post_id, state in wanted.items()
+            if current.get(post_id) is not None and current[post_id] != state
+        }
+        if changes:
+            self.pending.set(user_id, {
+                post_id: (state, pending[post_id][1] if post_id in pending else not state, now)
+                for post_id, state in changes.items()
+            }, self.pending_ttl)
+            self.add(*([user_id, post_id, state, now] for post_id, state in changes.items()))
+        return ({post_id for post_id, state in changes.items() if state},
+                {post_id for post_id, state in changes.items() if not state})
+
+    def pending_for_user(self, user_id):
+        """
+        Returns the user's like states accepted and not yet flushed.
+
+        Args:
+            user_id (int): The primary key of the user.
+
+        Returns:
+            dict: A mapping of post id to whether the post is liked and the pending change of its
+                like count (-1, 0 or 1).
+        """
+        return {
+            post_id: (state, int(state) - int(baseline))
+            for post_id, (state, baseline, _) in self._pending_entries(user_id, time.time()).items()
+        }
+
+    def write(self, items):
+        """
+        Applies the last state of every `(user, post)` pair in the batch. Pairs of posts or users
+        deleted since they were buffered are dropped.
+
+        Args:
+            items (list): The drained `[user_id, post_id, liked, timestamp]` items.
+        """
+        final = {}
+        for user_id, post_id, state, recorded_at in items:
+            final[user_id, post_id] = (state, recorded_at)
+        post_ids = set(BlogPost.objects.filter(pk__in={post_id for _, post_id in final}).values_list('pk', flat=True))
+        user_ids = set(get_user_model().objects.filter(pk__in={user_id for user_id, _ in final})
+                       .values_list('pk', flat=True))
+        pairs = {pair: state for pair, (state, _) in final.items() if pair[0] in user_ids and pair[1] in post_ids}
+        with transaction.atomic():
+            added = insert_like_pairs([pair for pair, state in pairs.items() if state], timezone.now())
+            removed = delete_like_pairs([pair for pair, state in pairs.items() if not state])
+            deltas = Counter(post_id for _, post_id in added)
+            deltas.subtract(post_id for _, post_id in removed)
+            deltas = {post_id: delta for post_id, delta in deltas.items() if delta}
+            if deltas:
+                BlogPost.objects.filter(pk__in=deltas).update(
+                    like_count=Greatest(F('like_count') + increment_by('pk', deltas), Value(0)),
+                )
+                publish_counts('like_count', deltas)
+            if added or removed:
+                # Cached post payloads list the likers, which change even when the counts do not.
+                bump_generation()
+            if added:
+                record_events('likes', [datetime.fromtimestamp(final[pair][1], tz=dt_timezone.utc) for pair in added])
+            if removed:
+                adjust_total('likes', -len(removed))
+        self.pending.settle(final)
+
+
+_buffer = None
+
+
+def get_like_buffer():
+    """
+    Returns the process-wide like buffer, built from the `LIKE_BUFFER` setting, or None when
+    write-behind likes are disabled.
+
+    Returns:
+        LikeBuffer | None: The configured buffer.
+    """
+    global _buffer
+    config = {**DEFAULT_CONFIG, **getattr(settings, 'LIKE_BUFFER', {})}
+    if not config['ENABLED']:
+        return None
+    if _buffer is None:
+        _buffer = LikeBuffer(
+            build_store(config, 'blog:likes'),
+            pending=build_pending_store(config, 'blog:likes:pending'),
+            max_size=config['MAX_SIZE'],
+            max_age=config['MAX_AGE'],
+            background=config['BACKGROUND'],
+        )
+    return _buffer
+
+
+@receiver(setting_changed)
+def reset_like_buffer(setting, **kwargs):
+    """
+    Drops the cached buffer when `LIKE_BUFFER` is overridden, e.g. in tests.
+    """
+    global _buffer
+    if setting == 'LIKE_BUFFER':
+        _buffer = None
+
+
+def write_likes(user_id, liked=(), unliked=()):
+    """
+    Likes and unlikes posts for a user, through the like buffer when write-behind likes are
+    enabled and directly otherwise.
+
+    Args:
+        user_id (int): The primary key of the user.
+        liked (iterable): The ids of the posts to like.
+        unliked (iterable): The ids of the posts to unlike.
+
+    Returns:
+        tuple: The sets of post ids newly liked and unliked.
+    """
+    buffer = get_like_buffer()
+    if buffer is None:
+        return apply_likes(user_id, liked=liked, unliked=unliked)
+    return buffer.apply(user_id, liked=liked, unliked=unliked)
+
+
+def overlay_pending_likes(posts, user_id):
+    """
+    Applies a user's pending likes to serialized posts, so the user sees their own likes before
+    the buffer is flushed. Does nothing when write-behind likes are disabled.
+
+    Args:
+        posts (list): Serialized posts with `id`, `like_count` and `likes`. Updated in place.
+        user_id (int): The primary key of the user.
+
+    Returns:
+        list: The posts.
+    """
+    buffer = get_like_buffer()
+    pending = buffer.pending_for_user(user_id) if buffer is not None else None
+    if not pending:
+        return posts
+    for post in posts:
+        if post['id'] not in pending:
+            continue
+        state, delta = pending[post['id']]
+        post['like_count'] = max(post['like_count'] + delta, 0)
+        likes = [liker for liker in post.get('likes', []) if liker != user_id]
+        post['likes'] = likes + [user_id] if state else likes
+    return posts
+
+
+def apply_like_operations(user_id, operations):
+    """
+    Applies a batch of like and unlike operations, e.g. queued by an offline mobile client.
+
+    Operations on the same post collapse to the last one, which is the state the client ended in.
+
+    Args:
+        user_id (int): The primary key of the user.
+        operations (list): Dicts with a `post` id and an `action` of `'like'` or `'unlike'`, oldest first.
+
+    Returns:
+        list: One dict per distinct post, in order of first appearance, with the `post`, the
+            applied `action`, whether it `changed` anything and whether the post was `found`.
+    """
+    final = {}
+    for operation in operations:
+        final[operation['post']] = operation['action']
+    added, removed = write_likes(
+        user_id,
+        liked=[post_id for post_id, action in final.items() if action == LIKE],
+        unliked=[post_id for post_id, action in final.items() if action == UNLIKE],
+    )
+    unchanged = [post_id for post_id in final if post_id not in added and post_id not in removed]
+    existing = set(BlogPost.objects.filter(pk__in=unchanged).values_list('pk', flat=True)) if unchanged else set()
+    return [
+        {
+            'post': post_id,
+            'action': action,
+            'changed': post_id in added or post_id in removed,
+            'found': post_id in added or post_id in removed or post_id in existing,
+        }
+        for post_id, action in final.items()
+    ]
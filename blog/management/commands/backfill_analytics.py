@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from blog.rollups import METRICS, rebuild
+
+
+class Command(BaseCommand):
+    """
+    Management command that rebuilds the analytics totals and hourly/daily buckets from the raw tables.
+
+    Usage:
+        python manage.py backfill_analytics [--metric NAME ...]
+    """
+    help = 'Rebuilds the analytics rollups (running totals and hourly/daily buckets) from the raw tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--metric', action='append', choices=METRICS, dest='metrics',
+                            help='Metric to rebuild; may be repeated. Defaults to every metric.')
+
+    def handle(self, *args, **options):
+        totals = rebuild(options['metrics'] or METRICS)
+        for metric, total in totals.items():
+            self.stdout.write(f'{metric}: {total}')
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(totals)} metrics.'))
@@ -0,0 +1,34 @@
+import time
+from django.core.management.base import BaseCommand
+from blog.outbox import get_notification_outbox, get_unread_count_buffer
+
+
+class Command(BaseCommand):
+    """
+    Management command that writes and pushes the notifications waiting in the outbox, and pushes
+    the buffered unread count deltas.
+
+    Runs once by default; with `--interval` it keeps draining the outbox, which is how a dedicated
+    dispatcher process serves every worker when the outbox uses the shared Redis backend.
+
+    Usage:
+        python manage.py dispatch_notifications [--interval SECONDS]
+    """
+    help = 'Flushes the notification outbox: coalesces, stores and pushes queued notifications.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Keep running, flushing the outbox every this many seconds.')
+
+    def handle(self, *args, **options):
+        outbox = get_notification_outbox()
+        deltas = get_unread_count_buffer()
+        while True:
+            flushed = outbox.flush()
+            pushed = deltas.flush()
+            self.stdout.write(self.style.SUCCESS(
+                f'Dispatched {flushed} queued notifications and {pushed} unread count changes.'
+            ))
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from blog.likes import get_like_buffer
+
+
+class Command(BaseCommand):
+    """
+    Management command that writes the buffered likes and unlikes to the database.
+
+    Intended to run periodically (e.g. every second from a supervisor loop) when the like buffer
+    uses the shared Redis backend without background flushing.
+
+    Usage:
+        python manage.py flush_likes
+    """
+    help = 'Flushes buffered likes and unlikes into Like and the post like counters.'
+
+    def handle(self, *args, **options):
+        buffer = get_like_buffer()
+        if buffer is None:
+            raise CommandError('Write-behind likes are disabled; set LIKE_BUFFER["ENABLED"] to True.')
+        flushed = buffer.flush()
+        self.stdout.write(self.style.SUCCESS(f'Flushed {flushed} buffered likes.'))
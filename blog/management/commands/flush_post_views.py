@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from blog.ingest import get_post_view_buffer
+
+
+class Command(BaseCommand):
+    """
+    Management command that writes the buffered post views to the database.
+
+    Intended to run periodically (e.g. every few seconds from cron or a supervisor loop) when the
+    post view buffer uses the shared Redis backend.
+
+    Usage:
+        python manage.py flush_post_views
+    """
+    help = 'Flushes buffered post views into PostView and the daily rollup table.'
+
+    def handle(self, *args, **options):
+        flushed = get_post_view_buffer().flush()
+        self.stdout.write(self.style.SUCCESS(f'Flushed {flushed} buffered views.'))
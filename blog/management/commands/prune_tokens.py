@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from blog.blacklist import prune_tokens
+
+
+class Command(BaseCommand):
+    """
+    Management command that deletes expired outstanding and blacklisted refresh tokens.
+
+    Every login and rotation adds rows to the token blacklist tables; once a token has expired it
+    is rejected on its `exp` claim alone, so its rows can go. Deletes run in batches, each in its
+    own statement. Workers drop expired tokens from their blacklist filters on their next rebuild.
+    Intended to run periodically, e.g. nightly from cron.
+
+    Usage:
+        python manage.py prune_tokens [--batch-size N] [--sleep SECONDS]
+    """
+    help = 'Deletes expired outstanding and blacklisted refresh tokens.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of outstanding tokens deleted per batch.')
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help='Seconds to pause between batches.')
+
+    def handle(self, *args, **options):
+        outstanding, blacklisted = prune_tokens(batch_size=options['batch_size'], sleep=options['sleep'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {outstanding} expired outstanding tokens and {blacklisted} blacklist entries.'
+        ))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from blog.retention import apply_retention
+
+
+class Command(BaseCommand):
+    """
+    Management command that applies the notification retention policy.
+
+    Read notifications older than the retention period are removed, then every user's notifications
+    beyond the per-user cap, in chunked batches. Options override the `NOTIFICATION_RETENTION`
+    setting. Intended to run periodically, e.g. nightly from cron.
+
+    Usage:
+        python manage.py purge_notifications [--days N] [--max-per-user N] [--archive | --no-archive]
+                                             [--batch-size N] [--sleep SECONDS]
+    """
+    help = 'Deletes or archives old read notifications and caps the number of notifications per user.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, dest='READ_DAYS',
+                            help='Remove read notifications older than this many days.')
+        parser.add_argument('--max-per-user', type=int, dest='MAX_PER_USER',
+                            help='Keep at most this many notifications per user.')
+        parser.add_argument('--archive', action='store_true', dest='ARCHIVE', default=None,
+                            help='Copy removed notifications to the archive table.')
+        parser.add_argument('--no-archive', action='store_false', dest='ARCHIVE',
+                            help='Delete removed notifications without archiving them.')
+        parser.add_argument('--batch-size', type=int, dest='BATCH_SIZE',
+                            help='Number of rows removed per transaction.')
+        parser.add_argument('--sleep', type=float, dest='SLEEP',
+                            help='Seconds to pause between batches.')
+
+    def handle(self, *args, **options):
+        report = apply_retention(**{key: options[key] for key in
+                                    ('READ_DAYS', 'MAX_PER_USER', 'ARCHIVE', 'BATCH_SIZE', 'SLEEP')})
+        action = 'Archived' if report['archived'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} {report['expired']} expired and {report['capped']} over-cap notifications "
+            f"in {report['batches']} batches, {report['seconds']:.2f} s ({report['rows_per_second']:.0f} rows/s)."
+        ))
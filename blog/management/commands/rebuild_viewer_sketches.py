@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from blog.sketches import rebuild_viewer_sketches
+
+
+class Command(BaseCommand):
+    """
+    Management command that rebuilds the unique-viewer sketches from the PostView table.
+
+    Usage:
+        python manage.py rebuild_viewer_sketches [--batch-size N]
+    """
+    help = 'Rebuilds the per-post and site-wide daily HyperLogLog sketches of distinct viewers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='Number of PostView rows read per batch.')
+
+    def handle(self, *args, **options):
+        processed = rebuild_viewer_sketches(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt sketches from {processed} views.'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from blog.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    """
+    Management command that repairs drifted like/comment/view counters on blog posts.
+
+    Usage:
+        python manage.py reconcile_post_counters [--batch-size N] [--dry-run]
+    """
+    help = 'Recomputes denormalized BlogPost counters from the Like, Comment and PostView tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of posts examined per batch.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report drifted posts without updating them.')
+
+    def handle(self, *args, **options):
+        result = reconcile_counters(batch_size=options['batch_size'], dry_run=options['dry_run'])
+        verb = 'would be repaired' if options['dry_run'] else 'repaired'
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {result['checked']} posts, {result['repaired']} {verb}."
+        ))
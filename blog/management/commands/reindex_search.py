@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from blog.search import reindex
+
+
+class Command(BaseCommand):
+    """
+    Management command that rebuilds the full-text search index from the post and comment tables.
+
+    Usage:
+        python manage.py reindex_search [--batch-size N]
+    """
+    help = 'Rebuilds the full-text search index of blog posts and comments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of rows read and indexed per batch.')
+
+    def handle(self, *args, **options):
+        posts, comments = reindex(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {posts} posts and {comments} comments.'))
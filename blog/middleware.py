@@ -0,0 +1,81 @@
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from .authentication import ClaimsJWTAuthentication
+
+AUTH_SUBPROTOCOL = 'bearer'
+
+
+def get_raw_token(scope):
+    """
+    Returns the access token offered by a WebSocket handshake, and the subprotocol to accept when
+    it was offered as one.
+
+    Browsers cannot set an `Authorization` header on a WebSocket, so the token is read from the
+    `token` query parameter or from the `Sec-WebSocket-Protocol` header, where it follows the
+    `bearer` subprotocol (`new WebSocket(url, ['bearer', token])`). The subprotocol is preferred,
+    since query strings tend to end up in access logs.
+
+    Args:
+        scope (dict): The ASGI connection scope.
+
+    Returns:
+        tuple: The raw token or None, and `'bearer'` or None.
+    """
+    subprotocols = list(scope.get('subprotocols') or [])
+    if AUTH_SUBPROTOCOL in subprotocols:
+        index = subprotocols.index(AUTH_SUBPROTOCOL)
+        if index + 1 < len(subprotocols):
+            return subprotocols[index + 1], AUTH_SUBPROTOCOL
+    tokens = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('token')
+    return (tokens[0] if tokens else None), None
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Channels middleware that authenticates WebSocket connections with a JWT access token.
+
+    The token is validated like `ClaimsJWTAuthentication` validates a bearer token: a token carrying
+    the user claims becomes a `ClaimsUser` without any query, so connecting costs no session or user
+    lookup. Tokens without the claims fall back to loading the user. Connections with a missing,
+    invalid or expired token get an `AnonymousUser`, and consumers reject them.
+
+    Sets `scope['user']`, and `scope['auth_subprotocol']` to the subprotocol the consumer must
+    accept when the token was offered as a subprotocol (browsers close the socket unless one of
+    the offered subprotocols is accepted).
+
+    Methods:
+        authenticate(raw_token): Returns the user of an access token.
+    """
+
+    def __init__(self, inner):
+        super().__init__(inner)
+        self.authentication = ClaimsJWTAuthentication()
+
+    async def authenticate(self, raw_token):
+        """
+        Returns the user of an access token.
+
+        Args:
+            raw_token (str): The encoded access token.
+
+        Returns:
+            ClaimsUser | CustomUser | AnonymousUser: The authenticated user, or an anonymous user if
+                the token is not valid.
+        """
+        try:
+            validated_token = self.authentication.get_validated_token(raw_token)
+            user = self.authentication.get_claims_user(validated_token)
+            if user is None:
+                user = await database_sync_to_async(self.authentication.get_user)(validated_token)
+            return user
+        except (InvalidToken, AuthenticationFailed):
+            return AnonymousUser()
+
+    async def __call__(self, scope, receive, send):
+        raw_token, subprotocol = get_raw_token(scope)
+        user = await self.authenticate(raw_token) if raw_token else AnonymousUser()
+        scope = dict(scope, user=user, auth_subprotocol=subprotocol if user.is_authenticated else None)
+        return await super().__call__(scope, receive, send)
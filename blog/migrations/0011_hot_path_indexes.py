@@ -0,0 +1,25 @@
+# Generated by Django 5.1.3 on 2026-10-18 01:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('parent__isnull', True)), fields=['post', 'created_at'], name='blog_comment_post_roots_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['user', '-created_at'], name='blog_notif_user_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postview',
+            index=models.Index(fields=['post', 'created_at'], name='blog_postview_post_created_idx'),
+        ),
+    ]
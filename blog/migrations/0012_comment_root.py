@@ -0,0 +1,43 @@
+# Generated by Django 5.1.3 on 2026-10-18 01:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_comment_roots(apps, schema_editor):
+    """
+    Sets the thread root of every existing reply by walking the parent links in memory.
+    """
+    Comment = apps.get_model('blog', 'Comment')
+    parents = dict(Comment.objects.filter(parent__isnull=False).values_list('id', 'parent_id'))
+    roots = {}
+    for comment_id in parents:
+        path = [comment_id]
+        node = parents[comment_id]
+        while node in parents and node not in roots:
+            path.append(node)
+            node = parents[node]
+        root_id = roots.get(node, node)
+        for visited in path:
+            roots[visited] = root_id
+    by_root = {}
+    for comment_id, root_id in roots.items():
+        by_root.setdefault(root_id, []).append(comment_id)
+    for root_id, comment_ids in by_root.items():
+        Comment.objects.filter(pk__in=comment_ids).update(root_id=root_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0011_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='root',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='thread_replies', to='blog.comment'),
+        ),
+        migrations.RunPython(backfill_comment_roots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.3 on 2026-10-18 01:13
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_views(apps, schema_editor):
+    """
+    Rolls up the existing PostView rows into per-post, per-day totals.
+    """
+    PostView = apps.get_model('blog', 'PostView')
+    PostViewDaily = apps.get_model('blog', 'PostViewDaily')
+    rows = (PostView.objects.annotate(day=TruncDate('created_at'))
+            .values('post_id', 'day')
+            .annotate(views=Count('id'))
+            .order_by())
+    PostViewDaily.objects.bulk_create(
+        (PostViewDaily(post_id=row['post_id'], day=row['day'], views=row['views']) for row in rows),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_comment_root'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='postview',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='PostViewDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_views', to='blog.blogpost')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='blog_postviewdaily_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('post', 'day'), name='blog_postviewdaily_post_day_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_views, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.3 on 2026-10-18 01:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0013_postview_daily'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostViewSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('registers', models.BinaryField()),
+                ('post', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='viewer_sketches', to='blog.blogpost')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('post', 'day'), name='blog_postviewsketch_post_day_uniq'), models.UniqueConstraint(condition=models.Q(('post__isnull', True)), fields=('day',), name='blog_postviewsketch_site_day_uniq')],
+            },
+        ),
+    ]
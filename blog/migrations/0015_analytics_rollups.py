@@ -0,0 +1,64 @@
+# Generated by Django 5.1.3 on 2026-10-18 01:18
+
+from datetime import timezone as dt_timezone
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDay, TruncHour
+
+
+def backfill_rollups(apps, schema_editor):
+    """
+    Builds the analytics totals and hourly/daily buckets from the existing rows.
+    """
+    AnalyticsTotal = apps.get_model('blog', 'AnalyticsTotal')
+    AnalyticsBucket = apps.get_model('blog', 'AnalyticsBucket')
+    sources = {
+        'active_users': (apps.get_model('blog', 'CustomUser').objects.filter(is_active=True), 'date_joined'),
+        'posts': (apps.get_model('blog', 'BlogPost').objects.all(), 'created_at'),
+        'comments': (apps.get_model('blog', 'Comment').objects.all(), 'created_at'),
+        'likes': (apps.get_model('blog', 'Like').objects.all(), 'created_at'),
+        'views': (apps.get_model('blog', 'PostView').objects.all(), 'created_at'),
+    }
+    for metric, (queryset, field) in sources.items():
+        AnalyticsTotal.objects.create(metric=metric, value=queryset.count())
+        for granularity, trunc in (('hour', TruncHour), ('day', TruncDay)):
+            rows = (queryset.annotate(bucket=trunc(field, tzinfo=dt_timezone.utc))
+                    .values('bucket')
+                    .annotate(total=Count('pk'))
+                    .order_by())
+            AnalyticsBucket.objects.bulk_create(
+                (AnalyticsBucket(metric=metric, granularity=granularity, start=row['bucket'], count=row['total'])
+                 for row in rows),
+                batch_size=1000,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0014_postview_sketch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsTotal',
+            fields=[
+                ('metric', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AnalyticsBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=32)),
+                ('granularity', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=8)),
+                ('start', models.DateTimeField()),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('metric', 'granularity', 'start'), name='blog_analyticsbucket_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Creates the full-text index table for the database backend and fills it from the existing
+    posts and comments. Document ids are `pk * 2` for posts and `pk * 2 + 1` for comments.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE blog_search_index USING fts5("
+            "title, body, tokenize = 'porter unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            "INSERT INTO blog_search_index (rowid, title, body) "
+            "SELECT id * 2, title, content FROM blog_blogpost"
+        )
+        schema_editor.execute(
+            "INSERT INTO blog_search_index (rowid, title, body) "
+            "SELECT id * 2 + 1, '', content FROM blog_comment"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE TABLE blog_search_document (id bigint PRIMARY KEY, document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            "CREATE INDEX blog_search_document_gin ON blog_search_document USING GIN (document)"
+        )
+        schema_editor.execute(
+            "INSERT INTO blog_search_document (id, document) "
+            "SELECT id * 2, setweight(to_tsvector('english', title), 'A') || "
+            "setweight(to_tsvector('english', content), 'B') FROM blog_blogpost"
+        )
+        schema_editor.execute(
+            "INSERT INTO blog_search_document (id, document) "
+            "SELECT id * 2 + 1, setweight(to_tsvector('english', content), 'B') FROM blog_comment"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    """
+    Drops the full-text index table.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS blog_search_index')
+    elif vendor == 'postgresql':
+        schema_editor.execute('DROP TABLE IF EXISTS blog_search_document')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0015_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.3 on 2026-10-18 01:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_unread_counts(apps, schema_editor):
+    """
+    Counts the existing unread notifications of every user.
+    """
+    Notification = apps.get_model('blog', 'Notification')
+    NotificationCounter = apps.get_model('blog', 'NotificationCounter')
+    rows = (Notification.objects.filter(is_read=False)
+            .values('user_id')
+            .annotate(unread=Count('id'))
+            .order_by())
+    NotificationCounter.objects.bulk_create(
+        (NotificationCounter(user_id=row['user_id'], unread=row['unread']) for row in rows),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0016_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_unread_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.3 on 2026-10-18 02:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+from blog.hll import HyperLogLog
+
+
+def backfill_sketch_totals(apps, schema_editor):
+    """
+    Builds each post's all-time viewer sketch by merging its daily sketches.
+    """
+    PostViewSketch = apps.get_model('blog', 'PostViewSketch')
+    PostViewSketchTotal = apps.get_model('blog', 'PostViewSketchTotal')
+    batch, post_id, merged = [], None, None
+    rows = (PostViewSketch.objects.filter(post__isnull=False)
+            .order_by('post_id').values_list('post_id', 'registers'))
+    for row_post_id, registers in rows.iterator():
+        if row_post_id != post_id:
+            if merged is not None:
+                batch.append(PostViewSketchTotal(post_id=post_id, registers=merged.to_bytes()))
+            post_id, merged = row_post_id, HyperLogLog()
+        merged.merge(HyperLogLog.from_bytes(registers))
+        if len(batch) >= 1000:
+            PostViewSketchTotal.objects.bulk_create(batch)
+            batch = []
+    if merged is not None:
+        batch.append(PostViewSketchTotal(post_id=post_id, registers=merged.to_bytes()))
+    PostViewSketchTotal.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0018_notification_retention'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostViewSketchTotal',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='viewer_total', serialize=False, to='blog.blogpost')),
+                ('registers', models.BinaryField()),
+            ],
+        ),
+        migrations.RunPython(backfill_sketch_totals, migrations.RunPython.noop),
+    ]
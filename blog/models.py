@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser, Group, Permission
 from django.db import models
+from django.utils import timezone
 from django_otp.models import Device
 
 class CustomUser(AbstractUser):
@@ -28,6 +29,30 @@ class TOTPDevice(Device):
     name = models.CharField(max_length=64, unique=True)
     confirmed = models.BooleanField(default=False)
 
+class BlogPostQuerySet(models.QuerySet):
+    """
+    QuerySet for BlogPost with helpers that keep list and detail endpoints at a constant number of queries.
+
+    Methods:
+        for_listing(): Joins the author and prefetches the ids of users who liked each post.
+    """
+
+    def for_listing(self):
+        """
+        Prepares the queryset for serialization with BlogPostSerializer.
+
+        The author is fetched in the same query with `select_related`, and the `likes` relation is
+        prefetched as bare user ids in one extra query for the whole page. Like, comment and view
+        counts come from the denormalized counter columns, so a page costs the same number of
+        queries regardless of its size.
+
+        Returns:
+            BlogPostQuerySet: The prepared queryset.
+        """
+        return self.select_related('author').prefetch_related(
+            models.Prefetch('likes', queryset=CustomUser.objects.only('id'))
+        )
+
 class BlogPost(models.Model):
     """
     BlogPost represents a blog entry authored by a CustomUser.
@@ -39,12 +64,16 @@ class BlogPost(models.Model):
         created_at (DateTimeField): The datetime when the post was created. Automatically set on creation.
         updated_at (DateTimeField): The datetime when the post was last updated. Automatically set on update.
         likes (ManyToManyField): A many-to-many relationship with CustomUser representing users who liked the post.
+        like_count (PositiveIntegerField): Denormalized number of likes, maintained incrementally with F() expressions.
+        comment_count (PositiveIntegerField): Denormalized number of comments (including replies) on the post.
+        view_count (PositiveIntegerField): Denormalized number of recorded views of the post.
         
     Methods:
         __str__(): Returns the string representation of the BlogPost (its title).
         
     Meta:
         ordering: Orders blog posts by creation date in descending order.
+        indexes: A composite index on `(created_at, id)` backing keyset pagination.
     """
     title = models.CharField(max_length=255)
     content = models.TextField()
@@ -52,13 +81,20 @@ class BlogPost(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     likes = models.ManyToManyField(CustomUser, related_name='liked_posts', through='Like')
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    view_count = models.PositiveIntegerField(default=0)
 
+    objects = BlogPostQuerySet.as_manager()
 
     def __str__(self):
         return self.title
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='blog_post_created_id_idx'),
+        ]
 
 class Comment(models.Model):
     
@@ -70,16 +106,26 @@ class Comment(models.Model):
         author (ForeignKey): The user who authored the comment.
         content (TextField): The text content of the comment.
         parent (ForeignKey): A reference to another comment as the parent, enabling nested comments (replies). Optional.
+        root (ForeignKey): The top-level comment of the thread this reply belongs to, or None for top-level comments.
+            Maintained on save so a whole thread can be fetched with a single query.
         created_at (DateTimeField): The date and time when the comment was created. Automatically set on creation.
         updated_at (DateTimeField): The date and time when the comment was last updated. Automatically set on update.
         
     Methods:
         __str__(): Returns a string representation of the comment.
+        from_db(db, field_names, values): Remembers the loaded parent so saves can tell whether it changed.
+        save(*args, **kwargs): Derives the thread root from the parent before saving.
+
+    Meta:
+        indexes: Composite indexes on `(created_at, id)` and `(post, created_at, id)` backing keyset pagination,
+            and a partial index on `(post, created_at)` over top-level comments.
     """
     post = models.ForeignKey(BlogPost, related_name='comments', on_delete=models.CASCADE)
     author = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     content = models.TextField()
     parent = models.ForeignKey('self', null=True, blank=True, related_name='replies', on_delete=models.CASCADE)
+    root = models.ForeignKey('self', null=True, blank=True, related_name='thread_replies',
+                             on_delete=models.CASCADE, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     def __str__(self):
@@ -88,6 +134,65 @@ class Comment(models.Model):
             str: A string representation of the comment, showing the author and the post.
         """
         return f'Comment by {self.author} on {self.post}'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_parent_id = instance.__dict__.get('parent_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Derives the thread root from the parent and saves the comment. If an existing comment is
+        moved to a different thread, the root of all of its descendants is updated as well.
+
+        Saves of an existing comment that leave its parent alone, either because `update_fields`
+        does not include `parent` or because the parent is the one it was loaded with, skip the
+        parent and root lookups and do not write `root`, which may have changed since the comment
+        was loaded if an ancestor was moved.
+        """
+        update_fields = kwargs.get('update_fields')
+        if not self._state.adding:
+            if update_fields is not None:
+                parent_unchanged = not {'parent', 'parent_id'} & set(update_fields)
+            else:
+                parent_unchanged = ('parent_id' not in self.__dict__
+                                    or self.parent_id == getattr(self, '_loaded_parent_id', object()))
+            if parent_unchanged:
+                if update_fields is None:
+                    kwargs['update_fields'] = [
+                        field.name for field in self._meta.concrete_fields
+                        if not field.primary_key and field.name != 'root' and field.attname in self.__dict__
+                    ]
+                super().save(*args, **kwargs)
+                return
+        root_id = None
+        if self.parent_id is not None:
+            parent = Comment.objects.filter(pk=self.parent_id).values('id', 'root_id').first()
+            root_id = parent and (parent['root_id'] or parent['id'])
+        moved = False
+        if not self._state.adding:
+            old_root_id = Comment.objects.filter(pk=self.pk).values_list('root_id', flat=True).first()
+            moved = old_root_id != root_id
+        self.root_id = root_id
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'root'}
+        super().save(*args, **kwargs)
+        self._loaded_parent_id = self.parent_id
+        if moved:
+            new_root = root_id or self.pk
+            level = [self.pk]
+            while level:
+                level = list(Comment.objects.filter(parent_id__in=level).values_list('pk', flat=True))
+                Comment.objects.filter(pk__in=level).update(root_id=new_root)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='blog_comment_created_id_idx'),
+            models.Index(fields=['post', 'created_at', 'id'], name='blog_comment_post_created_idx'),
+            models.Index(fields=['post', 'created_at'], condition=models.Q(parent__isnull=True),
+                         name='blog_comment_post_roots_idx'),
+        ]
     
 class Like(models.Model):
     """
@@ -121,11 +226,123 @@ class PostView(models.Model):
     Attributes:
         user (ForeignKey): The user who viewed the post.
         post (ForeignKey): The blog post that was viewed.
-        created_at (DateTimeField): The date and time when the view was recorded. Automatically set on creation.
+        created_at (DateTimeField): The date and time when the view happened. Defaults to now, and is set explicitly
+            when buffered views are flushed in bulk.
+
+    Meta:
+        indexes: A composite index on `(post, created_at)` for per-post counts and time ranges.
     """
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     post = models.ForeignKey(BlogPost, on_delete=models.CASCADE)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created_at'], name='blog_postview_post_created_idx'),
+        ]
+
+class PostViewDaily(models.Model):
+    """
+    Pre-aggregated number of views of a blog post per day, rolled up from buffered PostView writes.
+
+    Attributes:
+        post (ForeignKey): The blog post that was viewed. Uses a reverse relationship named 'daily_views'.
+        day (DateField): The UTC day the views happened on.
+        views (PositiveIntegerField): The number of views of the post on that day.
+
+    Meta:
+        constraints: Ensures there is a single row per post and day.
+        indexes: An index on `day` for site-wide date range queries.
+    """
+    post = models.ForeignKey(BlogPost, related_name='daily_views', on_delete=models.CASCADE)
+    day = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'day'], name='blog_postviewdaily_post_day_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='blog_postviewdaily_day_idx'),
+        ]
+
+class PostViewSketch(models.Model):
+    """
+    HyperLogLog sketch of the distinct users who viewed a blog post, or the whole site, on a day.
+
+    Attributes:
+        post (ForeignKey): The blog post the sketch belongs to, or None for the site-wide sketch.
+            Uses a reverse relationship named 'viewer_sketches'.
+        day (DateField): The UTC day covered by the sketch.
+        registers (BinaryField): The serialized `blog.hll.HyperLogLog` sketch.
+
+    Meta:
+        constraints: Ensures there is a single sketch per post and day, and a single site-wide sketch per day.
+    """
+    post = models.ForeignKey(BlogPost, null=True, blank=True, related_name='viewer_sketches', on_delete=models.CASCADE)
+    day = models.DateField()
+    registers = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'day'], name='blog_postviewsketch_post_day_uniq'),
+            models.UniqueConstraint(fields=['day'], condition=models.Q(post__isnull=True),
+                                    name='blog_postviewsketch_site_day_uniq'),
+        ]
+
+class PostViewSketchTotal(models.Model):
+    """
+    HyperLogLog sketch of the distinct users who ever viewed a blog post: the union of the post's
+    daily `PostViewSketch` rows, updated with them as views are ingested, so the all-time estimate
+    reads one row however many days the post has been viewed on.
+
+    Attributes:
+        post (OneToOneField): The blog post. Primary key; uses a reverse relationship named 'viewer_total'.
+        registers (BinaryField): The serialized `blog.hll.HyperLogLog` sketch.
+    """
+    post = models.OneToOneField(BlogPost, primary_key=True, related_name='viewer_total', on_delete=models.CASCADE)
+    registers = models.BinaryField()
+
+class AnalyticsTotal(models.Model):
+    """
+    Running total of an analytics metric, maintained incrementally.
+
+    Attributes:
+        metric (CharField): The metric name, e.g. 'posts' or 'active_users'. Primary key.
+        value (BigIntegerField): The current total.
+    """
+    metric = models.CharField(max_length=32, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.metric}: {self.value}'
+
+class AnalyticsBucket(models.Model):
+    """
+    Number of events of an analytics metric that happened within an hourly or daily time bucket.
+
+    Attributes:
+        metric (CharField): The metric name, e.g. 'posts' or 'views'.
+        granularity (CharField): The bucket width, 'hour' or 'day'.
+        start (DateTimeField): The start of the bucket, truncated to the hour or day in UTC.
+        count (BigIntegerField): The number of events in the bucket.
+
+    Meta:
+        constraints: Ensures there is a single bucket per metric, granularity and start.
+    """
+    HOUR = 'hour'
+    DAY = 'day'
+    GRANULARITY_CHOICES = [(HOUR, 'Hour'), (DAY, 'Day')]
+
+    metric = models.CharField(max_length=32)
+    granularity = models.CharField(max_length=8, choices=GRANULARITY_CHOICES)
+    start = models.DateTimeField()
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['metric', 'granularity', 'start'], name='blog_analyticsbucket_uniq'),
+        ]
 
 class Notification(models.Model):
     """
@@ -139,6 +356,11 @@ class Notification(models.Model):
 
     Methods:
         __str__(): Returns a string representation of the notification.
+
+    Meta:
+        indexes: A composite index on `(user, created_at, id)` backing keyset pagination of a user's notifications,
+            a partial index on `(user, created_at)` over unread notifications only, and a partial index on
+            `created_at` over read notifications backing the retention job.
     """
     user = models.ForeignKey(CustomUser, related_name='notifications', on_delete=models.CASCADE)
     message = models.TextField()
@@ -152,6 +374,74 @@ class Notification(models.Model):
         """
         return f'Notification for {self.user}'
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='blog_notif_user_created_idx'),
+            models.Index(fields=['user', '-created_at'], condition=models.Q(is_read=False),
+                         name='blog_notif_user_unread_idx'),
+            models.Index(fields=['created_at'], condition=models.Q(is_read=True),
+                         name='blog_notif_read_created_idx'),
+        ]
+
+
+class NotificationArchive(models.Model):
+    """
+    Archived copy of a notification removed from the Notification table by the retention job.
+
+    Attributes:
+        notification_id (BigIntegerField): The primary key the notification had in the Notification table.
+        user (ForeignKey): The user the notification was sent to. Uses a reverse relationship named 'archived_notifications'.
+        message (TextField): The content of the notification message.
+        is_read (BooleanField): Whether the notification had been read when it was archived.
+        created_at (DateTimeField): When the notification was created.
+        archived_at (DateTimeField): When the notification was archived. Automatically set on creation.
+
+    Meta:
+        indexes: A composite index on `(user, created_at)` for looking up a user's archived notifications.
+    """
+    notification_id = models.BigIntegerField(unique=True)
+    user = models.ForeignKey(CustomUser, related_name='archived_notifications', on_delete=models.CASCADE)
+    message = models.TextField()
+    is_read = models.BooleanField()
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        """
+        Returns:
+            str: A string representation of the archived notification, showing the associated user.
+        """
+        return f'Archived notification for {self.user}'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='blog_notifarchive_user_idx'),
+        ]
+
+
+class NotificationCounter(models.Model):
+    """
+    Maintained count of a user's unread notifications, so reading it never scans the Notification table.
+
+    Attributes:
+        user (OneToOneField): The user whose notifications are counted. Also the primary key.
+        unread (PositiveIntegerField): The number of unread notifications.
+
+    The counter is incremented when notifications are created and decremented when they are marked as
+    read; see `blog.counters.adjust_unread`. It lives in its own table rather than on the user row, so
+    saving a stale user instance can never overwrite it.
+    """
+    user = models.OneToOneField(CustomUser, primary_key=True, related_name='notification_counter',
+                                on_delete=models.CASCADE)
+    unread = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        """
+        Returns:
+            str: A string representation of the counter, showing the associated user.
+        """
+        return f'Unread notifications of {self.user}'
+
 
 class NotificationPreference(models.Model):
     """
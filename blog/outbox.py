@@ -0,0 +1,292 @@
+from collections import Counter, OrderedDict
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from .buffers import WriteBuffer, build_store
+from .counters import adjust_unread, get_unread_counts
+from .frames import encode_frames, push_events
+from .models import Notification
+from .preferences import preference_cache
+
+DEFAULT_CONFIG = {
+    'BACKEND': 'local',
+    'MAX_SIZE': 200,
+    'MAX_AGE': 1.0,
+    'BACKGROUND': True,
+}
+
+
+def notification_group(user_id):
+    """
+    Returns the channel layer group of a user's notification sockets.
+
+    Args:
+        user_id (int): The primary key of the user.
+
+    Returns:
+        str: The group name.
+    """
+    return f'notifications_{user_id}'
+
+
+def notification_payload(notification):
+    """
+    Serializes a notification for the notification socket, both for pushes and replays. The
+    `created_at` datetime is left to the socket's encoding (see `blog.frames`).
+
+    Args:
+        notification (Notification): The saved notification.
+
+    Returns:
+        dict: The notification's `id`, `message`, `is_read` flag and `created_at` time.
+    """
+    return {
+        'id': notification.id,
+        'message': notification.message,
+        'is_read': notification.is_read,
+        'created_at': notification.created_at,
+    }
+
+
+def notification_event(notification):
+    """
+    Builds the channel layer event delivering a notification to `NotificationConsumer`.
+
+    The message is encoded once here, in every socket encoding, and every socket the event reaches
+    sends the frame of its encoding as is.
+
+    Args:
+        notification (Notification): The saved notification.
+
+    Returns:
+        dict: The event, with the encoded `frames`.
+    """
+    return {
+        'type': 'send_notification',
+        'frames': encode_frames({'type': 'notification', **notification_payload(notification)}),
+    }
+
+
+def unread_count_events(deltas):
+    """
+    Builds the channel layer events telling users' sockets how their unread count changed.
+
+    Each event carries the delta and the counter value read after applying it, so a client that
+    missed an event can resynchronize from the next one.
+
+    Args:
+        deltas (dict): A mapping of user id to the change in unread notifications.
+
+    Returns:
+        list: `(group, event)` pairs for `NotificationConsumer.unread_count`.
+    """
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return []
+    counts = get_unread_counts(deltas)
+    return [
+        (notification_group(user_id), {
+            'type': 'unread_count',
+            'frames': encode_frames({'type': 'unread_count', 'delta': delta, 'unread': counts[user_id]}),
+        })
+        for user_id, delta in deltas.items()
+    ]
+
+
+def coalesce(items):
+    """
+    Merges buffered notifications that share a user and a coalescing key into one.
+
+    A group with a single notification keeps its own message; a larger group is replaced by its
+    summary template formatted with the number of notifications, e.g. "12 new comments on your
+    post". Notifications without a key are never merged. Groups keep the order of their first item.
+
+    Args:
+        items (list): `[user_id, message, key, summary]` items, oldest first.
+
+    Returns:
+        list: `(user_id, message)` pairs.
+    """
+    groups = OrderedDict()
+    for index, (user_id, message, key, summary) in enumerate(items):
+        group = groups.setdefault((user_id, key if key else index), [])
+        group.append((message, summary))
+    merged = []
+    for (user_id, _), group in groups.items():
+        message, summary = group[0]
+        if len(group) > 1 and summary:
+            message = summary.replace('{count}', str(len(group)))
+        merged.append((user_id, message))
+    return merged
+
+
+class NotificationOutbox(WriteBuffer):
+    """
+    Write-behind outbox for notifications.
+
+    `send_notification` only appends to the outbox. Each flush looks up the recipients'
+    preferences in bulk, drops notifications to users who opted out of both push and email
+    notifications, coalesces the rest, writes the notification rows with one `bulk_create`, and
+    then bumps the recipients' unread counters with one UPDATE and pushes one WebSocket event per
+    row, plus one unread count delta per recipient, to the users with push notifications enabled,
+    concurrently. With the default `BACKGROUND` setting, flushes run
+    in a background thread, so neither the insert nor the channel layer round-trips happen on the
+    request path; with the Redis backend, the `dispatch_notifications` command can drain the outbox
+    for every worker.
+
+    Methods:
+        enqueue(user_id, message, key, summary): Buffers a notification.
+        write(items): Persists and pushes a drained batch of notifications.
+    """
+
+    def enqueue(self, user_id, message, key=None, summary=None):
+        """
+        Buffers a notification.
+
+        Args:
+            user_id (int): The primary key of the recipient.
+            message (str): The notification message.
+            key (str): Notifications to the same user with the same key are merged when flushed
+                together. None disables merging.
+            summary (str): The message of a merged notification, with a `{count}` placeholder.
+
+        Returns:
+            int: The number of notifications written by a triggered flush, or 0.
+        """
+        return self.add([user_id, message, key, summary])
+
+    def write(self, items):
+        """
+        Filters, coalesces, persists and pushes a batch of notifications. Opted-out users cost no
+        row and no channel layer traffic, and notifications to users deleted since they were
+        buffered are dropped.
+
+        Args:
+            items (list): The drained `[user_id, message, key, summary]` items.
+        """
+        prefs = preference_cache.get_many({item[0] for item in items})
+        items = [
+            item for item in items
+            if prefs[item[0]]['push_notifications'] or prefs[item[0]]['email_notifications']
+        ]
+        if not items:
+            return
+        merged = coalesce(items)
+        user_ids = set(get_user_model().objects.filter(pk__in={user_id for user_id, _ in merged})
+                       .values_list('pk', flat=True))
+        notifications = [
+            Notification(user_id=user_id, message=message)
+            for user_id, message in merged
+            if user_id in user_ids
+        ]
+        if not notifications:
+            return
+        deltas = Counter(notification.user_id for notification in notifications)
+        with transaction.atomic():
+            Notification.objects.bulk_create(notifications, batch_size=1000)
+            adjust_unread(deltas)
+        pushed = {user_id: delta for user_id, delta in deltas.items() if prefs[user_id]['push_notifications']}
+        async_to_sync(push_events)([
+            *((notification_group(notification.user_id), notification_event(notification))
+              for notification in notifications if notification.user_id in pushed),
+            *unread_count_events(pushed),
+        ])
+
+
+class UnreadCountBuffer(WriteBuffer):
+    """
+    Write-behind buffer of unread count deltas to push to users' notification sockets.
+
+    Marking notifications as read updates the counter in the request, but the WebSocket push goes
+    through this buffer: deltas of the same user are summed on flush, so a burst of reads costs one
+    event per user, and users with push notifications disabled cost none.
+
+    Methods:
+        record(user_id, delta): Buffers a change of a user's unread count.
+        write(items): Sums and pushes a drained batch of deltas.
+    """
+
+    def record(self, user_id, delta):
+        """
+        Buffers a change of a user's unread count.
+
+        Args:
+            user_id (int): The primary key of the user.
+            delta (int): The change in unread notifications.
+
+        Returns:
+            int: The number of deltas pushed by a triggered flush, or 0.
+        """
+        return self.add([user_id, delta])
+
+    def write(self, items):
+        """
+        Sums the deltas per user and pushes one event per user with push notifications enabled.
+
+        Args:
+            items (list): The drained `[user_id, delta]` items.
+        """
+        deltas = Counter()
+        for user_id, delta in items:
+            deltas[user_id] += delta
+        prefs = preference_cache.get_many(deltas)
+        async_to_sync(push_events)(unread_count_events(
+            {user_id: delta for user_id, delta in deltas.items() if prefs[user_id]['push_notifications']}
+        ))
+
+
+_buffers = {}
+
+
+def _get_buffer(cls, key):
+    """
+    Returns the process-wide buffer of the given class, built from the `NOTIFICATION_OUTBOX` setting.
+
+    Args:
+        cls (type): The WriteBuffer subclass.
+        key (str): The Redis key used by the Redis backend.
+
+    Returns:
+        WriteBuffer: The configured buffer.
+    """
+    if cls not in _buffers:
+        config = {**DEFAULT_CONFIG, **getattr(settings, 'NOTIFICATION_OUTBOX', {})}
+        _buffers.setdefault(cls, cls(
+            build_store(config, key),
+            max_size=config['MAX_SIZE'],
+            max_age=config['MAX_AGE'],
+            background=config['BACKGROUND'],
+        ))
+    return _buffers[cls]
+
+
+def get_notification_outbox():
+    """
+    Returns the process-wide notification outbox.
+
+    Returns:
+        NotificationOutbox: The configured outbox.
+    """
+    return _get_buffer(NotificationOutbox, 'blog:notification_outbox')
+
+
+def get_unread_count_buffer():
+    """
+    Returns the process-wide buffer of unread count deltas.
+
+    Returns:
+        UnreadCountBuffer: The configured buffer.
+    """
+    return _get_buffer(UnreadCountBuffer, 'blog:unread_count_deltas')
+
+
+@receiver(setting_changed)
+def reset_notification_outbox(setting, **kwargs):
+    """
+    Drops the cached buffers when `NOTIFICATION_OUTBOX` is overridden, e.g. in tests.
+    """
+    if setting == 'NOTIFICATION_OUTBOX':
+        _buffers.clear()
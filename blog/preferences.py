@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import OrderedDict
+from django.core.cache import cache
+from .models import NotificationPreference
+
+DEFAULTS = {
+    'push_notifications': NotificationPreference._meta.get_field('push_notifications').default,
+    'email_notifications': NotificationPreference._meta.get_field('email_notifications').default,
+}
+
+
+class PreferenceCache:
+    """
+    Two-level cache of users' notification preferences: an in-process LRU in front of the shared
+    cache backend, in front of the database.
+
+    Lookups are made in bulk, so a notification fanning out to many recipients costs at most one
+    `get_many` on the shared cache and one query for the users missing from both levels. Users
+    without a `NotificationPreference` row get the model defaults. Entries are dropped from the
+    local LRU and the shared cache when a preference is saved or deleted; other processes pick up
+    the change when their local entry expires after `local_timeout` seconds.
+
+    Attributes:
+        maxsize (int): The maximum number of users kept in the local LRU.
+        local_timeout (float): Seconds a local entry is trusted.
+        shared_timeout (int): Seconds an entry is kept in the shared cache.
+
+    Methods:
+        get(user_id): Returns one user's preferences.
+        get_many(user_ids): Returns the preferences of several users.
+        invalidate(user_id): Drops a user's cached preferences.
+        clear(): Empties the local LRU.
+    """
+    key_prefix = 'blog:notification_preference'
+
+    def __init__(self, maxsize=4096, local_timeout=30, shared_timeout=60 * 60):
+        self.maxsize = maxsize
+        self.local_timeout = local_timeout
+        self.shared_timeout = shared_timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def make_key(self, user_id):
+        """
+        Returns the shared cache key of a user's preferences.
+        """
+        return f'{self.key_prefix}:{user_id}'
+
+    def get(self, user_id):
+        """
+        Returns one user's preferences.
+
+        Args:
+            user_id (int): The primary key of the user.
+
+        Returns:
+            dict: `push_notifications` and `email_notifications` flags.
+        """
+        return self.get_many([user_id])[user_id]
+
+    def get_many(self, user_ids):
+        """
+        Returns the preferences of several users, reading each level only for the users missing
+        from the level above it.
+
+        Args:
+            user_ids (iterable): The primary keys of the users.
+
+        Returns:
+            dict: A mapping of user id to `push_notifications` and `email_notifications` flags.
+        """
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for user_id in set(user_ids):
+                entry = self._entries.get(user_id)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(user_id)
+                    found[user_id] = entry[1]
+        missing = [user_id for user_id in set(user_ids) if user_id not in found]
+        if not missing:
+            return found
+
+        shared = cache.get_many([self.make_key(user_id) for user_id in missing])
+        loaded = {user_id: shared[self.make_key(user_id)] for user_id in missing if self.make_key(user_id) in shared}
+        missing = [user_id for user_id in missing if user_id not in loaded]
+        if missing:
+            from_db = {user_id: dict(DEFAULTS) for user_id in missing}
+            for row in NotificationPreference.objects.filter(user_id__in=missing).values(
+                    'user_id', 'push_notifications', 'email_notifications'):
+                from_db[row.pop('user_id')] = row
+            cache.set_many({self.make_key(user_id): prefs for user_id, prefs in from_db.items()},
+                           timeout=self.shared_timeout)
+            loaded.update(from_db)
+
+        with self._lock:
+            expires = time.monotonic() + self.local_timeout
+            for user_id, prefs in loaded.items():
+                self._entries[user_id] = (expires, prefs)
+                self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        found.update(loaded)
+        return found
+
+    def invalidate(self, user_id):
+        """
+        Drops a user's preferences from the local LRU and the shared cache.
+
+        Args:
+            user_id (int): The primary key of the user.
+        """
+        with self._lock:
+            self._entries.pop(user_id, None)
+        cache.delete(self.make_key(user_id))
+
+    def clear(self):
+        """
+        Empties the local LRU.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+preference_cache = PreferenceCache()
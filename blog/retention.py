@@ -0,0 +1,159 @@
+import time
+from collections import Counter
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from .counters import adjust_unread
+from .models import Notification, NotificationArchive
+
+DEFAULT_POLICY = {
+    'READ_DAYS': 30,
+    'MAX_PER_USER': 1000,
+    'ARCHIVE': False,
+    'BATCH_SIZE': 1000,
+    'SLEEP': 0.0,
+}
+ARCHIVED_FIELDS = ('id', 'user_id', 'message', 'is_read', 'created_at')
+
+
+def get_policy(**overrides):
+    """
+    Returns the retention policy from the `NOTIFICATION_RETENTION` setting, with overrides applied.
+
+    Args:
+        **overrides: Policy keys to override, e.g. from command line options. None values are ignored.
+
+    Returns:
+        dict: The policy.
+    """
+    policy = {**DEFAULT_POLICY, **getattr(settings, 'NOTIFICATION_RETENTION', {})}
+    policy.update({key: value for key, value in overrides.items() if value is not None})
+    return policy
+
+
+def remove_batch(pks, archive=False):
+    """
+    Removes one batch of notifications in its own short transaction.
+
+    The rows are optionally copied to NotificationArchive first, the DELETE targets the batch by
+    primary key, and the unread counters of the owners of any unread rows are decremented.
+
+    Args:
+        pks (list): The primary keys of the notifications.
+        archive (bool): Whether to copy the rows to the archive table.
+
+    Returns:
+        int: The number of notifications deleted.
+    """
+    with transaction.atomic():
+        rows = list(Notification.objects.filter(pk__in=pks).values(*ARCHIVED_FIELDS))
+        if archive:
+            NotificationArchive.objects.bulk_create(
+                [NotificationArchive(notification_id=row.pop('id'), **row) for row in rows],
+                ignore_conflicts=True,
+            )
+        deleted, _ = Notification.objects.filter(pk__in=pks).delete()
+        adjust_unread({
+            user_id: -count
+            for user_id, count in Counter(row['user_id'] for row in rows if not row['is_read']).items()
+        })
+    return deleted
+
+
+def purge_expired(cutoff, batch_size=1000, archive=False, sleep=0.0):
+    """
+    Removes read notifications created before `cutoff`, one batch at a time.
+
+    Each batch selects the next primary keys through the partial index on read notifications and
+    deletes them in a separate transaction, so locks are held only for one batch. `sleep` pauses
+    between batches to leave room for concurrent writers.
+
+    Args:
+        cutoff (datetime): Read notifications created before this are removed.
+        batch_size (int): The number of rows removed per batch.
+        archive (bool): Whether to copy the rows to the archive table.
+        sleep (float): Seconds to pause between batches.
+
+    Returns:
+        tuple: The numbers of rows removed and of batches run.
+    """
+    removed = batches = 0
+    while True:
+        pks = list(Notification.objects.filter(is_read=True, created_at__lt=cutoff)
+                   .order_by('created_at').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return removed, batches
+        removed += remove_batch(pks, archive=archive)
+        batches += 1
+        if sleep:
+            time.sleep(sleep)
+
+
+def cap_per_user(limit, batch_size=1000, archive=False, sleep=0.0):
+    """
+    Removes each user's oldest notifications beyond their newest `limit`, read or not.
+
+    Users over the limit are found with one grouped query; the rows past each user's limit are
+    found through the `(user, created_at, id)` index and removed in batches.
+
+    Args:
+        limit (int): The maximum number of notifications kept per user.
+        batch_size (int): The number of rows removed per batch.
+        archive (bool): Whether to copy the rows to the archive table.
+        sleep (float): Seconds to pause between batches.
+
+    Returns:
+        tuple: The numbers of rows removed and of batches run.
+    """
+    removed = batches = 0
+    over = (Notification.objects.values('user_id')
+            .annotate(total=Count('id'))
+            .filter(total__gt=limit)
+            .values_list('user_id', flat=True)
+            .order_by())
+    for user_id in list(over):
+        while True:
+            pks = list(Notification.objects.filter(user_id=user_id)
+                       .order_by('-created_at', '-id')
+                       .values_list('pk', flat=True)[limit:limit + batch_size])
+            if not pks:
+                break
+            removed += remove_batch(pks, archive=archive)
+            batches += 1
+            if sleep:
+                time.sleep(sleep)
+    return removed, batches
+
+
+def apply_retention(**overrides):
+    """
+    Runs the retention policy: expires old read notifications, then caps every user's notifications.
+
+    Args:
+        **overrides: Policy keys overriding the `NOTIFICATION_RETENTION` setting.
+
+    Returns:
+        dict: The report of the run, with the rows `expired` and `capped`, whether rows were
+            `archived`, the number of `batches`, the elapsed `seconds` and the throughput in
+            `rows_per_second`.
+    """
+    policy = get_policy(**overrides)
+    options = {'batch_size': policy['BATCH_SIZE'], 'archive': policy['ARCHIVE'], 'sleep': policy['SLEEP']}
+    started = time.perf_counter()
+    expired = capped = batches = 0
+    if policy['READ_DAYS'] is not None:
+        expired, batches = purge_expired(timezone.now() - timedelta(days=policy['READ_DAYS']), **options)
+    if policy['MAX_PER_USER'] is not None:
+        capped, capped_batches = cap_per_user(policy['MAX_PER_USER'], **options)
+        batches += capped_batches
+    seconds = time.perf_counter() - started
+    return {
+        'expired': expired,
+        'capped': capped,
+        'archived': policy['ARCHIVE'],
+        'batches': batches,
+        'seconds': seconds,
+        'rows_per_second': (expired + capped) / seconds if seconds else 0.0,
+    }
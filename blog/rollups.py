@@ -0,0 +1,222 @@
+from collections import Counter
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Q, When
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+from .models import AnalyticsBucket, AnalyticsTotal, BlogPost, Comment, Like, PostView
+
+METRICS = ('active_users', 'posts', 'comments', 'likes', 'views')
+GRANULARITIES = {
+    AnalyticsBucket.HOUR: timedelta(hours=1),
+    AnalyticsBucket.DAY: timedelta(days=1),
+}
+
+
+def truncate(moment, granularity):
+    """
+    Truncates a datetime to the start of its hourly or daily bucket in UTC.
+
+    Args:
+        moment (datetime): An aware datetime.
+        granularity (str): 'hour' or 'day'.
+
+    Returns:
+        datetime: The start of the bucket.
+    """
+    moment = moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if granularity == AnalyticsBucket.DAY:
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def _increment(model, key_fields, deltas):
+    """
+    Adds per-row amounts to the `count`/`value` column of rows identified by composite keys.
+
+    The common case, where every row exists, costs a single UPDATE. Missing rows are created with
+    `ignore_conflicts` and the remaining amounts applied with a second UPDATE, so concurrent
+    writers creating the same row never fail.
+
+    Args:
+        model (Model): AnalyticsBucket or AnalyticsTotal.
+        key_fields (tuple): The fields forming the key of each row.
+        deltas (dict): A mapping of key tuple to the amount to add.
+    """
+    column = 'count' if model is AnalyticsBucket else 'value'
+
+    def update(keys):
+        condition = Q()
+        cases = []
+        for key in keys:
+            match = dict(zip(key_fields, key))
+            condition |= Q(**match)
+            cases.append(When(**match, then=deltas[key]))
+        model.objects.filter(condition).update(
+            **{column: F(column) + Case(*cases, default=0, output_field=IntegerField())}
+        )
+        return set(model.objects.filter(condition).values_list(*key_fields))
+
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    existing = update(deltas)
+    missing = [key for key in deltas if key not in existing]
+    if missing:
+        model.objects.bulk_create([model(**dict(zip(key_fields, key))) for key in missing], ignore_conflicts=True)
+        update(missing)
+
+
+def record_events(metric, timestamps):
+    """
+    Records events of a metric: adds them to the running total and to their hourly and daily buckets.
+
+    Args:
+        metric (str): The metric name.
+        timestamps (iterable): The aware datetimes at which the events happened.
+    """
+    buckets = Counter()
+    total = 0
+    for moment in timestamps:
+        total += 1
+        for granularity in GRANULARITIES:
+            buckets[(metric, granularity, truncate(moment, granularity))] += 1
+    if not total:
+        return
+    with transaction.atomic():
+        _increment(AnalyticsTotal, ('metric',), {(metric,): total})
+        _increment(AnalyticsBucket, ('metric', 'granularity', 'start'), buckets)
+
+
+def record_event(metric, at=None):
+    """
+    Records a single event of a metric.
+
+    Args:
+        metric (str): The metric name.
+        at (datetime): When the event happened. Defaults to now.
+    """
+    record_events(metric, [at or timezone.now()])
+
+
+def adjust_total(metric, delta):
+    """
+    Adjusts the running total of a metric without touching its buckets, e.g. on deletes.
+
+    Args:
+        metric (str): The metric name.
+        delta (int): The amount to add; negative to subtract.
+    """
+    _increment(AnalyticsTotal, ('metric',), {(metric,): delta})
+
+
+def get_totals():
+    """
+    Returns the running totals of every metric with a single query.
+
+    Returns:
+        dict: A mapping of metric name to total, with 0 for metrics without events.
+    """
+    totals = dict.fromkeys(METRICS, 0)
+    totals.update(AnalyticsTotal.objects.filter(metric__in=METRICS).values_list('metric', 'value'))
+    return totals
+
+
+def get_series(metrics, granularity, start, end):
+    """
+    Returns dense time series of bucket counts for a range, filling empty buckets with zeros.
+
+    Args:
+        metrics (iterable): The metric names.
+        granularity (str): 'hour' or 'day'.
+        start (datetime): The start of the range, inclusive.
+        end (datetime): The end of the range, exclusive.
+
+    Returns:
+        dict: A mapping of metric name to a list of `{'start': datetime, 'count': int}` points.
+    """
+    step = GRANULARITIES[granularity]
+    first = truncate(start, granularity)
+    starts = []
+    moment = first
+    while moment < end:
+        starts.append(moment)
+        moment += step
+    counts = {
+        (metric, bucket_start): count
+        for metric, bucket_start, count in AnalyticsBucket.objects.filter(
+            metric__in=metrics, granularity=granularity, start__gte=first, start__lt=end,
+        ).values_list('metric', 'start', 'count')
+    }
+    return {
+        metric: [{'start': moment, 'count': counts.get((metric, moment), 0)} for moment in starts]
+        for metric in metrics
+    }
+
+
+def _sources():
+    """
+    Returns the raw querysets and timestamp fields each metric is rebuilt from.
+
+    Returns:
+        dict: A mapping of metric name to `(queryset, timestamp_field)`.
+    """
+    return {
+        'active_users': (get_user_model().objects.filter(is_active=True), 'date_joined'),
+        'posts': (BlogPost.objects.all(), 'created_at'),
+        'comments': (Comment.objects.all(), 'created_at'),
+        'likes': (Like.objects.all(), 'created_at'),
+        'views': (PostView.objects.all(), 'created_at'),
+    }
+
+
+def rebuild(metrics=METRICS):
+    """
+    Rebuilds the running totals and buckets of the given metrics from the raw tables.
+
+    Each metric is rebuilt with one COUNT and one GROUP BY query per granularity, inside a
+    transaction so readers never observe a partially rebuilt metric.
+
+    Args:
+        metrics (iterable): The metric names to rebuild.
+
+    Returns:
+        dict: A mapping of metric name to its rebuilt total.
+    """
+    truncs = {AnalyticsBucket.HOUR: TruncHour, AnalyticsBucket.DAY: TruncDay}
+    totals = {}
+    sources = _sources()
+    for metric in metrics:
+        queryset, field = sources[metric]
+        with transaction.atomic():
+            AnalyticsBucket.objects.filter(metric=metric).delete()
+            totals[metric] = queryset.count()
+            AnalyticsTotal.objects.update_or_create(metric=metric, defaults={'value': totals[metric]})
+            for granularity, trunc in truncs.items():
+                rows = (queryset.annotate(bucket=trunc(field, tzinfo=dt_timezone.utc))
+                        .values('bucket')
+                        .annotate(total=Count('pk'))
+                        .order_by())
+                AnalyticsBucket.objects.bulk_create(
+                    (AnalyticsBucket(metric=metric, granularity=granularity, start=row['bucket'], count=row['total'])
+                     for row in rows),
+                    batch_size=1000,
+                )
+    return totals
+
+
+def day_bounds(start_day, end_day):
+    """
+    Converts an inclusive range of dates into an aware datetime range [start, end).
+
+    Args:
+        start_day (date): The first day.
+        end_day (date): The last day, inclusive.
+
+    Returns:
+        tuple: The aware start and end datetimes in UTC.
+    """
+    start = datetime.combine(start_day, dt_time.min, tzinfo=dt_timezone.utc)
+    end = datetime.combine(end_day, dt_time.min, tzinfo=dt_timezone.utc) + timedelta(days=1)
+    return start, end
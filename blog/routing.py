@@ -1,7 +1,8 @@
 from django.urls import path
-from .consumers import NotificationConsumer
+from .consumers import NotificationConsumer, PostActivityConsumer
 
-# WebSocket URL patterns for handling real-time notifications
+# WebSocket URL patterns for handling real-time notifications and post activity
 websocket_urlpatterns = [
     path('ws/notifications/', NotificationConsumer.as_asgi()),
+    path('ws/posts/<int:pk>/', PostActivityConsumer.as_asgi()),
 ]
\ No newline at end of file
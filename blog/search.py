@@ -0,0 +1,460 @@
+import re
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from .models import BlogPost, Comment
+
+POST, COMMENT = 0, 1
+KINDS = {'post': POST, 'comment': COMMENT}
+TERM_RE = re.compile(r'\w+\*?', re.UNICODE)
+
+
+def doc_id(kind, object_id):
+    """
+    Encodes a post or comment as the id of its search document.
+
+    Posts and comments share one index; the low bit of the document id tells them apart, so a
+    single integer primary key identifies any document.
+
+    Args:
+        kind (int): `POST` or `COMMENT`.
+        object_id (int): The primary key of the post or comment.
+
+    Returns:
+        int: The document id.
+    """
+    return object_id * 2 + kind
+
+
+def parse_terms(query):
+    """
+    Splits a user query into search terms, discarding any query-language syntax.
+
+    A trailing `*` on a term is kept and turns it into a prefix match.
+
+    Args:
+        query (str): The raw query.
+
+    Returns:
+        list: The terms, lowercased.
+    """
+    return [term.lower() for term in TERM_RE.findall(query or '')]
+
+
+class SQLiteSearchBackend:
+    """
+    Search backend built on an SQLite FTS5 virtual table.
+
+    FTS5 keeps an inverted index of the `title` and `body` columns and ranks matches with BM25,
+    weighting title hits above body hits. The table is created by the `0016_search_index`
+    migration.
+
+    Attributes:
+        table (str): The name of the FTS5 table.
+        weights (tuple): The BM25 weights of the `title` and `body` columns.
+
+    Methods:
+        index(documents): Adds or replaces documents.
+        remove(doc_ids): Removes documents.
+        clear(): Removes every document.
+        optimize(): Merges the index segments after a bulk load.
+        search(terms, kind, limit, offset): Returns a page of ranked hits.
+        count(terms, kind): Returns the number of matching documents.
+    """
+    table = 'blog_search_index'
+    weights = (4.0, 1.0)
+
+    def match_expression(self, terms):
+        """
+        Builds an FTS5 MATCH expression requiring every term, each quoted so user input can never
+        be interpreted as query syntax.
+
+        Args:
+            terms (list): The parsed terms.
+
+        Returns:
+            str: The MATCH expression.
+        """
+        return ' '.join(
+            '"{}"*'.format(term[:-1]) if term.endswith('*') else '"{}"'.format(term)
+            for term in terms
+        )
+
+    def kind_clause(self, kind):
+        """
+        Returns the SQL restricting hits to posts or comments through the low bit of the rowid.
+        """
+        return '' if kind is None else f' AND rowid %% 2 = {int(kind)}'
+
+    def index(self, documents):
+        """
+        Adds or replaces documents.
+
+        Args:
+            documents (iterable): `(doc_id, title, body)` tuples.
+        """
+        rows = [(doc, title, body) for doc, title, body in documents]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(row[0],) for row in rows])
+            cursor.executemany(f'INSERT INTO {self.table} (rowid, title, body) VALUES (%s, %s, %s)', rows)
+
+    def remove(self, doc_ids):
+        """
+        Removes documents.
+
+        Args:
+            doc_ids (iterable): The document ids.
+        """
+        doc_ids = [(doc,) for doc in doc_ids]
+        if doc_ids:
+            with connection.cursor() as cursor:
+                cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', doc_ids)
+
+    def clear(self):
+        """
+        Removes every document.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+
+    def optimize(self):
+        """
+        Merges the index b-trees into one, which makes queries faster after a bulk load.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {self.table} ({self.table}) VALUES ('optimize')")
+
+    def search(self, terms, kind=None, limit=20, offset=0):
+        """
+        Returns a page of hits ordered by BM25 score.
+
+        Args:
+            terms (list): The parsed terms.
+            kind (int): `POST` or `COMMENT` to restrict the hits, or None for both.
+            limit (int): The maximum number of hits.
+            offset (int): The number of hits to skip.
+
+        Returns:
+            list: `(doc_id, score, snippet)` tuples, best first. Higher scores are better.
+        """
+        sql = (f"SELECT rowid, -bm25({self.table}, %s, %s), "
+               f"snippet({self.table}, -1, '<mark>', '</mark>', '…', 16) "
+               f"FROM {self.table} WHERE {self.table} MATCH %s{self.kind_clause(kind)} "
+               f"ORDER BY bm25({self.table}, %s, %s) LIMIT %s OFFSET %s")
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*self.weights, self.match_expression(terms), *self.weights, limit, offset])
+            return cursor.fetchall()
+
+    def count(self, terms, kind=None):
+        """
+        Returns the number of documents matching every term.
+
+        Args:
+            terms (list): The parsed terms.
+            kind (int): `POST` or `COMMENT` to restrict the hits, or None for both.
+
+        Returns:
+            int: The number of matches.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {self.table} WHERE {self.table} MATCH %s{self.kind_clause(kind)}',
+                [self.match_expression(terms)],
+            )
+            return cursor.fetchone()[0]
+
+
+class PostgresSearchBackend:
+    """
+    Search backend built on a PostgreSQL `tsvector` column with a GIN index.
+
+    Titles are stored with weight A and bodies with weight B, and matches are ranked with
+    `ts_rank_cd`. PostgreSQL has no built-in BM25; cover density ranking with length
+    normalization is the closest equivalent. The table is created by the `0016_search_index`
+    migration.
+
+    Attributes:
+        table (str): The name of the document table.
+        config (str): The text search configuration.
+
+    Methods:
+        index(documents): Adds or replaces documents.
+        remove(doc_ids): Removes documents.
+        clear(): Removes every document.
+        optimize(): Refreshes the planner statistics after a bulk load.
+        search(terms, kind, limit, offset): Returns a page of ranked hits.
+        count(terms, kind): Returns the number of matching documents.
+    """
+    table = 'blog_search_document'
+    config = 'english'
+
+    def tsquery(self, terms):
+        """
+        Builds a `to_tsquery` input requiring every term, with `:*` for prefix terms.
+
+        Args:
+            terms (list): The parsed terms.
+
+        Returns:
+            str: The tsquery text.
+        """
+        return ' & '.join(
+            f"'{term[:-1]}':*" if term.endswith('*') else f"'{term}'"
+            for term in terms
+        )
+
+    def kind_clause(self, kind):
+        """
+        Returns the SQL restricting hits to posts or comments through the low bit of the id.
+        """
+        return '' if kind is None else f' AND id %% 2 = {int(kind)}'
+
+    def index(self, documents):
+        """
+        Adds or replaces documents with a single upsert statement per batch.
+
+        Args:
+            documents (iterable): `(doc_id, title, body)` tuples.
+        """
+        rows = [(doc, self.config, title, self.config, body) for doc, title, body in documents]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {self.table} (id, document) VALUES "
+                f"(%s, setweight(to_tsvector(%s::regconfig, %s), 'A') || setweight(to_tsvector(%s::regconfig, %s), 'B')) "
+                f"ON CONFLICT (id) DO UPDATE SET document = EXCLUDED.document",
+                rows,
+            )
+
+    def remove(self, doc_ids):
+        """
+        Removes documents.
+
+        Args:
+            doc_ids (iterable): The document ids.
+        """
+        doc_ids = list(doc_ids)
+        if doc_ids:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {self.table} WHERE id = ANY(%s)', [doc_ids])
+
+    def clear(self):
+        """
+        Removes every document.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {self.table}')
+
+    def optimize(self):
+        """
+        Refreshes the planner statistics after a bulk load.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {self.table}')
+
+    def search(self, terms, kind=None, limit=20, offset=0):
+        """
+        Returns a page of hits ordered by rank. PostgreSQL has no cheap equivalent of FTS5
+        snippets, so the snippet is left empty rather than running `ts_headline` over every hit.
+
+        Args:
+            terms (list): The parsed terms.
+            kind (int): `POST` or `COMMENT` to restrict the hits, or None for both.
+            limit (int): The maximum number of hits.
+            offset (int): The number of hits to skip.
+
+        Returns:
+            list: `(doc_id, score, snippet)` tuples, best first.
+        """
+        sql = (f"SELECT id, ts_rank_cd(document, query, 32), '' "
+               f"FROM {self.table}, to_tsquery(%s::regconfig, %s) query "
+               f"WHERE document @@ query{self.kind_clause(kind)} "
+               f"ORDER BY 2 DESC, id DESC LIMIT %s OFFSET %s")
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [self.config, self.tsquery(terms), limit, offset])
+            return cursor.fetchall()
+
+    def count(self, terms, kind=None):
+        """
+        Returns the number of documents matching every term.
+
+        Args:
+            terms (list): The parsed terms.
+            kind (int): `POST` or `COMMENT` to restrict the hits, or None for both.
+
+        Returns:
+            int: The number of matches.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {self.table} WHERE document @@ to_tsquery(%s::regconfig, %s){self.kind_clause(kind)}',
+                [self.config, self.tsquery(terms)],
+            )
+            return cursor.fetchone()[0]
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend():
+    """
+    Returns the search backend for the default database.
+
+    Returns:
+        SQLiteSearchBackend | PostgresSearchBackend: The backend.
+    """
+    try:
+        return BACKENDS[connection.vendor]()
+    except KeyError:
+        raise ImproperlyConfigured(f'Full-text search is not supported on {connection.vendor}.')
+
+
+def index_posts(posts):
+    """
+    Adds or replaces the search documents of blog posts.
+
+    Args:
+        posts (iterable): BlogPost instances.
+    """
+    get_search_backend().index((doc_id(POST, post.pk), post.title, post.content) for post in posts)
+
+
+def index_comments(comments):
+    """
+    Adds or replaces the search documents of comments. Comments have an empty title.
+
+    Args:
+        comments (iterable): Comment instances.
+    """
+    get_search_backend().index((doc_id(COMMENT, comment.pk), '', comment.content) for comment in comments)
+
+
+def remove_post(post_id):
+    """
+    Removes the search documents of a post and of all of its comments, before the post and its
+    comments are deleted.
+
+    Args:
+        post_id (int): The primary key of the blog post.
+    """
+    comment_ids = Comment.objects.filter(post_id=post_id).values_list('pk', flat=True)
+    get_search_backend().remove([doc_id(POST, post_id), *(doc_id(COMMENT, pk) for pk in comment_ids)])
+
+
+def remove_comments(comment_ids):
+    """
+    Removes the search documents of comments.
+
+    Args:
+        comment_ids (iterable): The primary keys of the comments.
+    """
+    get_search_backend().remove(doc_id(COMMENT, pk) for pk in comment_ids)
+
+
+def reindex(batch_size=1000):
+    """
+    Rebuilds the search index from the post and comment tables in batches.
+
+    Args:
+        batch_size (int): The number of rows read and indexed per batch.
+
+    Returns:
+        tuple: The numbers of posts and comments indexed.
+    """
+    backend = get_search_backend()
+    backend.clear()
+    totals = []
+    for queryset, kind in ((BlogPost.objects.only('id', 'title', 'content'), POST),
+                           (Comment.objects.only('id', 'content'), COMMENT)):
+        indexed = 0
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+            if not batch:
+                break
+            backend.index(
+                (doc_id(kind, obj.pk), getattr(obj, 'title', ''), obj.content) for obj in batch
+            )
+            indexed += len(batch)
+            last_pk = batch[-1].pk
+        totals.append(indexed)
+    backend.optimize()
+    return tuple(totals)
+
+
+class SearchResults:
+    """
+    Lazy, sliceable sequence of search hits, so the DRF paginators can page through it like a
+    queryset: `count()` runs the COUNT query and slicing runs the ranked query for one page and
+    hydrates the hits with their posts and comments.
+
+    Hits whose post or comment no longer exists are dropped.
+
+    Attributes:
+        terms (list): The parsed terms.
+        kind (int): `POST`, `COMMENT` or None for both.
+
+    Methods:
+        count(): Returns the number of matching documents.
+    """
+
+    def __init__(self, terms, kind=None):
+        self.terms = terms
+        self.kind = kind
+        self.backend = get_search_backend()
+        self._count = None
+
+    def count(self):
+        """
+        Returns:
+            int: The number of matching documents, counted once per instance.
+        """
+        if self._count is None:
+            self._count = self.backend.count(self.terms, self.kind) if self.terms else 0
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        stop = index.stop if index.stop is not None else self.count()
+        if not self.terms or stop <= start:
+            return []
+        return self.hydrate(self.backend.search(self.terms, self.kind, limit=stop - start, offset=start))
+
+    def hydrate(self, hits):
+        """
+        Resolves hits to result dicts with two queries, one for posts and one for comments.
+
+        Args:
+            hits (list): `(doc_id, score, snippet)` tuples.
+
+        Returns:
+            list: Result dicts with `type`, `id`, `post`, `title`, `snippet` and `score`.
+        """
+        post_ids = [doc // 2 for doc, _, _ in hits if doc % 2 == POST]
+        comment_ids = [doc // 2 for doc, _, _ in hits if doc % 2 == COMMENT]
+        posts = {row['id']: row for row in BlogPost.objects.filter(pk__in=post_ids).values('id', 'title')} if post_ids else {}
+        comments = {
+            row['id']: row for row in
+            Comment.objects.filter(pk__in=comment_ids).values('id', 'post_id', 'post__title')
+        } if comment_ids else {}
+        results = []
+        for doc, score, snippet in hits:
+            object_id = doc // 2
+            if doc % 2 == POST and object_id in posts:
+                results.append({'type': 'post', 'id': object_id, 'post': object_id,
+                                'title': posts[object_id]['title'], 'snippet': snippet, 'score': score})
+            elif doc % 2 == COMMENT and object_id in comments:
+                row = comments[object_id]
+                results.append({'type': 'comment', 'id': object_id, 'post': row['post_id'],
+                                'title': row['post__title'], 'snippet': snippet, 'score': score})
+        return results
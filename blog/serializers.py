@@ -1,9 +1,16 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import RefreshToken
 from django_otp.plugins.otp_totp.models import TOTPDevice
 from .models import (BlogPost, Comment, Like,
                       PostView, Notification, NotificationPreference)
+from .authentication import USER_CLAIMS, ClaimsRefreshToken, user_cache
+from .likes import ACTIONS
+from .sketches import estimate_unique_viewers
 
 User = get_user_model()
 
@@ -48,6 +55,55 @@ class LoginSerializer(serializers.Serializer):
     username = serializers.CharField()
     password = serializers.CharField()
 
+class RefreshTokenSerializer(TokenRefreshSerializer):
+    """
+    Serializer exchanging a refresh token for a new access token, and a new refresh token when
+    `ROTATE_REFRESH_TOKENS` is set.
+
+    The user is re-read on every refresh (through `user_cache`), so inactive users are rejected and
+    the claims of the new access token reflect the user's current privileges: a demoted or
+    deactivated user keeps them at most until their current access token expires, plus the
+    `user_cache` timeout on other workers.
+
+    Attributes:
+        token_class (ClaimsRefreshToken): Sets the user claims on the issued access token and checks
+            the blacklist through the worker's blacklist filter.
+
+    Methods:
+        validate(attrs): Validates the refresh token and issues the new tokens.
+    """
+    token_class = ClaimsRefreshToken
+
+    def validate(self, attrs):
+        """
+        Validates the refresh token, loads its user and issues the new tokens.
+
+        Args:
+            attrs (dict): The request data with the `refresh` token.
+
+        Returns:
+            dict: The new `access` token, and the rotated `refresh` token when rotation is enabled.
+
+        Raises:
+            AuthenticationFailed: If the user no longer exists or is inactive.
+        """
+        refresh = self.token_class(attrs['refresh'])
+        user = user_cache.get(refresh[api_settings.USER_ID_CLAIM])
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        refresh.user = user
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            for claim in USER_CLAIMS:
+                refresh.payload.pop(claim, None)
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
+
 class TOTPDeviceSerializer(serializers.ModelSerializer):
     """
     Serializer for the TOTPDevice model, used for two-factor authentication.
@@ -64,29 +120,47 @@ class BlogPostSerializer(serializers.ModelSerializer):
     """
     Serializer for the BlogPost model, used to serialize/deserialize blog post data.
 
-    Attributes:
-        like_count (SerializerMethodField): A field to get the count of likes for the blog post.
+    The like, comment and view counts are read from the denormalized counter columns on the post,
+    so serializing a post never issues COUNT queries.
     
     Meta:
         model (BlogPost): The blog post model being serialized.
         fields (str): Specifies that all fields in the model should be included.
+        read_only_fields (tuple): The counters are maintained by the server and cannot be written by clients.
     """
-    like_count = serializers.SerializerMethodField()
-    comment_count = serializers.SerializerMethodField()
-    view_count = serializers.SerializerMethodField()
-
     class Meta:
         model = BlogPost
         fields = '__all__'
+        read_only_fields = ('like_count', 'comment_count', 'view_count')
 
-    def get_like_count(self, obj):
-        return obj.likes.count()
-    
-    def get_comment_count(self, obj):
-        return obj.comments.count()
+    def update(self, instance, validated_data):
+        """
+        Updates the blog post, writing only the edited columns so that concurrent counter
+        increments are never overwritten by a stale in-memory copy of the post.
+
+        Args:
+            instance (BlogPost): The blog post being updated.
+            validated_data (dict): Validated data for the blog post.
 
-    def get_view_count(self, obj):
-        return PostView.objects.filter(post=obj).count()
+        Returns:
+            BlogPost: The updated blog post instance.
+        """
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
+
+class BlogPostDetailSerializer(BlogPostSerializer):
+    """
+    Serializer for a single blog post, adding the estimated number of distinct viewers.
+
+    Attributes:
+        unique_viewers (SerializerMethodField): Distinct viewers estimated from the post's all-time HyperLogLog sketch.
+    """
+    unique_viewers = serializers.SerializerMethodField()
+
+    def get_unique_viewers(self, obj):
+        return estimate_unique_viewers(post_id=obj.pk)
 
 class CommentSerializer(serializers.ModelSerializer):
     """
@@ -97,7 +171,7 @@ class CommentSerializer(serializers.ModelSerializer):
         
     Meta:
         model (Comment): The model being serialized.
-        fields (str): Specifies that all fields in the Comment model should be included.
+        exclude (tuple): Includes every Comment field except the internal thread root.
         
     Methods:
         get_replies(obj): Retrieves serialized data for any replies associated with the comment.
@@ -106,11 +180,12 @@ class CommentSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Comment
-        fields = '__all__'
+        exclude = ('root',)
 
     def get_replies(self, obj):
-        if obj.replies.exists():
-            return CommentSerializer(obj.replies.all(), many=True).data
+        replies = list(obj.replies.all())
+        if replies:
+            return CommentSerializer(replies, many=True).data
         return None
 
 class LikeSerializer(serializers.ModelSerializer):
@@ -125,6 +200,26 @@ class LikeSerializer(serializers.ModelSerializer):
         model = Like
         fields = '__all__'
 
+class LikeOperationSerializer(serializers.Serializer):
+    """
+    Serializer for one operation of a like batch.
+    
+    Attributes:
+        post (IntegerField): The id of the blog post.
+        action (ChoiceField): `like` or `unlike`.
+    """
+    post = serializers.IntegerField(min_value=1)
+    action = serializers.ChoiceField(choices=ACTIONS)
+
+class LikeBatchSerializer(serializers.Serializer):
+    """
+    Serializer for a batch of like and unlike operations.
+    
+    Attributes:
+        operations (ListField): Up to 100 operations, oldest first.
+    """
+    operations = serializers.ListField(child=LikeOperationSerializer(), min_length=1, max_length=100)
+
 class PostViewSerializer(serializers.ModelSerializer):
     """
     Serializer for the PostView model.
@@ -150,6 +245,32 @@ class NotificationSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class MarkNotificationsReadSerializer(serializers.Serializer):
+    """
+    Serializer validating a bulk mark-as-read request. Exactly one selector must be given.
+
+    Fields:
+        all (BooleanField): Marks every unread notification of the user as read.
+        up_to (IntegerField): Marks the user's unread notifications with an id up to and including this one.
+        ids (ListField): Marks the user's unread notifications with these ids. At most 1000 ids.
+    """
+    all = serializers.BooleanField(required=False)
+    up_to = serializers.IntegerField(required=False, min_value=1)
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False,
+                                allow_empty=False, max_length=1000)
+
+    def validate(self, attrs):
+        """
+        Ensures exactly one selector is given and `all` is true when it is the selector.
+        """
+        selectors = [name for name in ('all', 'up_to', 'ids') if name in attrs]
+        if len(selectors) != 1:
+            raise serializers.ValidationError('Provide exactly one of "all", "up_to" or "ids".')
+        if attrs.get('all') is False:
+            raise serializers.ValidationError({'all': 'Must be true.'})
+        return attrs
+
+
 class NotificationPreferenceSerializer(serializers.ModelSerializer):
     """
     Serializer for the NotificationPreference model.
@@ -0,0 +1,147 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from .authentication import user_cache
+from .cache import bump_generation
+from .counters import adjust_unread, live_counts
+from .models import BlogPost, Comment, Like, Notification, NotificationPreference
+from .preferences import preference_cache
+from .rollups import adjust_total, record_event
+from .search import index_comments, index_posts, remove_post
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+def invalidate_post_cache(sender, **kwargs):
+    """
+    Bumps the content generation whenever a blog post is saved or deleted, so cached post pages
+    and fragments are rebuilt on their next read. Comment and like writes bump it through
+    `blog.counters.adjust_counter`.
+    """
+    bump_generation()
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Like)
+def record_created(sender, instance, created, **kwargs):
+    """
+    Adds newly created posts, comments and likes to the analytics rollups.
+    """
+    if created:
+        metric = {BlogPost: 'posts', Comment: 'comments', Like: 'likes'}[sender]
+        record_event(metric, instance.created_at)
+
+
+@receiver(pre_delete, sender=BlogPost)
+def remove_post_from_totals(sender, instance, **kwargs):
+    """
+    Subtracts a post about to be deleted and the comments, likes and views cascading with it from
+    the analytics totals. The related rows are counted with one query before the cascade removes
+    them; the handler runs inside the delete transaction, so a failed delete rolls it back.
+    Comments and likes deleted on their own are subtracted by the views deleting them, and deletes
+    outside the API are corrected by the `backfill_analytics` command.
+    """
+    counts = sender.objects.filter(pk=instance.pk).values(
+        **{f'live_{field}': expression for field, expression in live_counts().items()}
+    ).first()
+    adjust_total('posts', -1)
+    if counts:
+        adjust_total('comments', -counts['live_comment_count'])
+        adjust_total('likes', -counts['live_like_count'])
+        adjust_total('views', -counts['live_view_count'])
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_save, sender=Comment)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    """
+    Adds or replaces the search document of a saved post or comment. Saves that do not touch the
+    indexed text skip the write.
+    """
+    indexed = {'title', 'content'} if sender is BlogPost else {'content'}
+    if update_fields is not None and not indexed & set(update_fields):
+        return
+    if sender is BlogPost:
+        index_posts([instance])
+    else:
+        index_comments([instance])
+
+
+@receiver(pre_delete, sender=BlogPost)
+def remove_post_from_search_index(sender, instance, **kwargs):
+    """
+    Removes the search documents of a post and of the comments cascading with it. Comments deleted
+    on their own are removed by the view deleting them; stale documents left by other deletes are
+    never returned, since hits are resolved against the live tables, and are dropped by the next
+    `reindex_search` run.
+    """
+    remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Notification)
+def count_unread_notification(sender, instance, created, **kwargs):
+    """
+    Increments the recipient's unread counter for a notification created on its own. The
+    notification outbox creates rows with `bulk_create` and adjusts the counters itself.
+    """
+    if created and not instance.is_read:
+        adjust_unread({instance.user_id: 1})
+
+
+@receiver(post_save, sender=NotificationPreference)
+@receiver(post_delete, sender=NotificationPreference)
+def invalidate_notification_preference(sender, instance, **kwargs):
+    """
+    Drops a user's cached notification preferences when they are updated, e.g. through
+    `NotificationPreferenceView`, or deleted.
+    """
+    preference_cache.invalidate(instance.user_id)
+
+
+@receiver(pre_save, sender=User)
+def remember_user_activity(sender, instance, update_fields=None, **kwargs):
+    """
+    Remembers whether an existing user was active before the save, so `record_user_activity` can
+    tell activations and deactivations apart. Saves that do not touch `is_active`, such as the
+    `last_login` update on every login, skip the extra query.
+    """
+    if instance.pk is None or (update_fields is not None and 'is_active' not in update_fields):
+        instance._was_active = None
+        return
+    instance._was_active = sender.objects.filter(pk=instance.pk).values_list('is_active', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def record_user_activity(sender, instance, created, **kwargs):
+    """
+    Keeps the active users total in step with registrations, activations and deactivations.
+    Registrations of active users are also added to the hourly and daily buckets.
+    """
+    if created:
+        if instance.is_active:
+            record_event('active_users', instance.date_joined)
+        return
+    was_active = getattr(instance, '_was_active', None)
+    if was_active is not None and was_active != instance.is_active:
+        adjust_total('active_users', 1 if instance.is_active else -1)
+
+
+@receiver(post_delete, sender=User)
+def remove_user_from_totals(sender, instance, **kwargs):
+    """
+    Subtracts a deleted active user from the active users total.
+    """
+    if instance.is_active:
+        adjust_total('active_users', -1)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Drops a saved or deleted user from the user cache of `ClaimsJWTAuthentication`.
+    """
+    user_cache.invalidate(instance.pk)
@@ -0,0 +1,125 @@
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Q
+from .hll import HyperLogLog
+from .models import PostView, PostViewSketch, PostViewSketchTotal
+
+
+def _sketch_filter(keys):
+    """
+    Builds a filter matching the sketches for the given `(post_id, day)` keys.
+
+    Args:
+        keys (iterable): `(post_id, day)` pairs; a post_id of None selects the site-wide sketch.
+
+    Returns:
+        Q: The filter.
+    """
+    condition = Q()
+    for post_id, day in keys:
+        if post_id is None:
+            condition |= Q(post__isnull=True, day=day)
+        else:
+            condition |= Q(post_id=post_id, day=day)
+    return condition
+
+
+def update_viewer_sketches(views):
+    """
+    Adds viewers to the per-post and site-wide daily sketches and to the posts' all-time sketches.
+
+    Missing sketch rows are created empty first, then the affected rows are locked, merged with
+    the new viewers and written back with one bulk UPDATE per table. Must be called inside a
+    transaction.
+
+    Args:
+        views (iterable): `(post_id, user_id, day)` tuples.
+    """
+    viewers = defaultdict(set)
+    post_viewers = defaultdict(set)
+    for post_id, user_id, day in views:
+        viewers[(post_id, day)].add(user_id)
+        viewers[(None, day)].add(user_id)
+        post_viewers[post_id].add(user_id)
+    if not viewers:
+        return
+
+    empty = HyperLogLog().to_bytes()
+    PostViewSketch.objects.bulk_create(
+        [PostViewSketch(post_id=post_id, day=day, registers=empty) for post_id, day in viewers],
+        ignore_conflicts=True,
+    )
+    sketches = list(PostViewSketch.objects.select_for_update().filter(_sketch_filter(viewers)))
+    for sketch in sketches:
+        hll = HyperLogLog.from_bytes(sketch.registers)
+        hll.update(viewers[(sketch.post_id, sketch.day)])
+        sketch.registers = hll.to_bytes()
+    PostViewSketch.objects.bulk_update(sketches, ['registers'])
+
+    PostViewSketchTotal.objects.bulk_create(
+        [PostViewSketchTotal(post_id=post_id, registers=empty) for post_id in post_viewers],
+        ignore_conflicts=True,
+    )
+    totals = list(PostViewSketchTotal.objects.select_for_update().filter(post_id__in=post_viewers))
+    for total in totals:
+        hll = HyperLogLog.from_bytes(total.registers)
+        hll.update(post_viewers[total.post_id])
+        total.registers = hll.to_bytes()
+    PostViewSketchTotal.objects.bulk_update(totals, ['registers'])
+
+
+def estimate_unique_viewers(post_id=None, start=None, end=None):
+    """
+    Estimates the number of distinct viewers of a post, or of the whole site, over a date range by
+    merging the daily sketches. A post's all-time estimate reads its `PostViewSketchTotal` instead.
+
+    Args:
+        post_id (int): The primary key of the blog post, or None for the whole site.
+        start (date): The first day of the range, inclusive. Defaults to the first sketch.
+        end (date): The last day of the range, inclusive. Defaults to the last sketch.
+
+    Returns:
+        int: The estimated number of distinct viewers.
+    """
+    if post_id is not None and start is None and end is None:
+        registers = PostViewSketchTotal.objects.filter(post_id=post_id).values_list('registers', flat=True).first()
+        return HyperLogLog.from_bytes(registers).count() if registers is not None else 0
+    if post_id is None:
+        sketches = PostViewSketch.objects.filter(post__isnull=True)
+    else:
+        sketches = PostViewSketch.objects.filter(post_id=post_id)
+    if start is not None:
+        sketches = sketches.filter(day__gte=start)
+    if end is not None:
+        sketches = sketches.filter(day__lte=end)
+    merged = HyperLogLog()
+    for registers in sketches.values_list('registers', flat=True).iterator():
+        merged.merge(HyperLogLog.from_bytes(registers))
+    return merged.count()
+
+
+def rebuild_viewer_sketches(batch_size=10000):
+    """
+    Rebuilds every sketch from the raw PostView table.
+
+    Args:
+        batch_size (int): The number of PostView rows read per batch.
+
+    Returns:
+        int: The number of PostView rows processed.
+    """
+    processed = 0
+    last_pk = 0
+    with transaction.atomic():
+        PostViewSketch.objects.all().delete()
+        PostViewSketchTotal.objects.all().delete()
+        while True:
+            batch = list(PostView.objects.filter(pk__gt=last_pk)
+                         .order_by('pk')
+                         .values_list('pk', 'post_id', 'user_id', 'created_at')[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            processed += len(batch)
+            update_viewer_sketches((post_id, user_id, created_at.date()) for _, post_id, user_id, created_at in batch)
+    return processed
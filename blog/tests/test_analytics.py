@@ -1,11 +1,21 @@
+from datetime import timedelta
+from io import StringIO
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth import get_user_model
-from ..models import BlogPost, Comment, Like, PostView
+from django.core.management import call_command
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+from ..counters import record_view
+from ..hll import HyperLogLog
+from ..models import AnalyticsBucket, AnalyticsTotal, BlogPost, Comment, Like
+from ..sketches import estimate_unique_viewers, update_viewer_sketches
 
 CustomUser = get_user_model()
 
+@override_settings(POST_VIEW_BUFFER={'BACKEND': 'local', 'MAX_SIZE': 1, 'BACKGROUND': False})
 class AnalyticsTests(APITestCase):
 
     def setUp(self):
@@ -23,7 +33,7 @@ class AnalyticsTests(APITestCase):
             author=self.user
         )
         Like.objects.create(user=self.user, post=self.blog_post)
-        PostView.objects.create(user=self.user, post=self.blog_post)
+        record_view(self.blog_post.pk, self.user)
         self.analytics_url = reverse('analytics')
 
     def test_analytics(self):
@@ -34,4 +44,105 @@ class AnalyticsTests(APITestCase):
         self.assertEqual(response.data['total_posts'], 1)
         self.assertEqual(response.data['total_comments'], 1)
         self.assertEqual(response.data['total_likes'], 1)
-        self.assertEqual(response.data['total_views'], 1)
\ No newline at end of file
+        self.assertEqual(response.data['total_views'], 1)
+        self.assertEqual(response.data['unique_viewers'], 1)
+
+    def test_unique_viewers(self):
+        record_view(self.blog_post.pk, self.user)
+        record_view(self.blog_post.pk, self.admin_user)
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.get(self.analytics_url)
+        self.assertEqual(response.data['total_views'], 3)
+        self.assertEqual(response.data['unique_viewers'], 2)
+        response = self.client.get(reverse('post-detail', kwargs={'pk': self.blog_post.pk}))
+        self.assertEqual(response.data['unique_viewers'], 2)
+
+    def test_post_unique_viewers_read_the_all_time_sketch(self):
+        today = timezone.now().date()
+        with transaction.atomic():
+            for days in range(1, 30):
+                update_viewer_sketches([(self.blog_post.pk, self.admin_user.pk, today - timedelta(days=days))])
+        with self.assertNumQueries(1):
+            self.assertEqual(estimate_unique_viewers(post_id=self.blog_post.pk), 2)
+        self.assertEqual(estimate_unique_viewers(post_id=self.blog_post.pk, end=today - timedelta(days=1)), 1)
+        call_command('rebuild_viewer_sketches', stdout=StringIO())
+        self.assertEqual(estimate_unique_viewers(post_id=self.blog_post.pk), 1)
+
+    def test_unique_viewers_for_empty_range(self):
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.get(self.analytics_url, {'start': '2000-01-01', 'end': '2000-01-31'})
+        self.assertEqual(response.data['unique_viewers'], 0)
+        response = self.client.get(self.analytics_url, {'start': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_series(self):
+        self.client.force_authenticate(user=self.admin_user)
+        today = timezone.now().date().isoformat()
+        response = self.client.get(self.analytics_url, {'start': today, 'end': today, 'granularity': 'hour',
+                                                        'metrics': 'posts,views'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['series']), {'posts', 'views'})
+        self.assertEqual(len(response.data['series']['posts']), 24)
+        self.assertEqual(sum(point['count'] for point in response.data['series']['posts']), 1)
+        self.assertEqual(sum(point['count'] for point in response.data['series']['views']), 1)
+        response = self.client.get(self.analytics_url)
+        self.assertEqual(len(response.data['series']['comments']), 7)
+        self.assertEqual(response.data['series']['comments'][-1]['count'], 1)
+
+    def test_series_params_are_validated(self):
+        self.client.force_authenticate(user=self.admin_user)
+        for params in ({'granularity': 'week'}, {'metrics': 'posts,bogus'},
+                       {'start': '2024-02-01', 'end': '2024-01-01'},
+                       {'start': '2024-01-01', 'end': '2024-12-31', 'granularity': 'hour'}):
+            response = self.client.get(self.analytics_url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_totals_follow_deletes_and_deactivation(self):
+        self.client.force_authenticate(user=self.admin_user)
+        self.client.delete(reverse('comment-detail', kwargs={'pk': self.comment.pk}))
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.analytics_url)
+        self.assertEqual(response.data['total_comments'], 0)
+        self.assertEqual(response.data['active_users'], 1)
+        self.blog_post.delete()
+        response = self.client.get(self.analytics_url)
+        self.assertEqual(response.data['total_posts'], 0)
+        self.assertEqual(response.data['total_likes'], 0)
+        self.assertEqual(response.data['total_views'], 0)
+
+    def test_backfill_rebuilds_rollups(self):
+        AnalyticsTotal.objects.all().delete()
+        AnalyticsBucket.objects.all().delete()
+        call_command('backfill_analytics', stdout=StringIO())
+        self.assertEqual(AnalyticsTotal.objects.get(metric='views').value, 1)
+        self.assertEqual(AnalyticsTotal.objects.get(metric='active_users').value, 2)
+        self.assertEqual(AnalyticsBucket.objects.filter(metric='posts', granularity='hour').get().count, 1)
+
+    def test_query_count_is_independent_of_data(self):
+        self.client.force_authenticate(user=self.admin_user)
+        for i in range(5):
+            Comment.objects.create(post=self.blog_post, content=f'Comment {i}', author=self.user)
+        with self.assertNumQueries(3):
+            response = self.client.get(self.analytics_url)
+        self.assertEqual(response.data['total_comments'], 6)
+
+
+class HyperLogLogTests(APITestCase):
+
+    def test_estimate_is_within_error_bound(self):
+        sketch = HyperLogLog()
+        sketch.update(range(20000))
+        self.assertLess(abs(sketch.count() - 20000) / 20000, 0.05)
+
+    def test_small_cardinalities_are_exact(self):
+        sketch = HyperLogLog()
+        sketch.update([1, 2, 3, 3, 2, 1])
+        self.assertEqual(sketch.count(), 3)
+
+    def test_merge_estimates_union(self):
+        first, second = HyperLogLog(), HyperLogLog()
+        first.update(range(0, 6000))
+        second.update(range(4000, 10000))
+        merged = HyperLogLog.from_bytes(first.to_bytes()).merge(second)
+        self.assertLess(abs(merged.count() - 10000) / 10000, 0.05)
\ No newline at end of file
@@ -1,16 +1,35 @@
-from django.urls import reverse
+import asyncio
+from datetime import timedelta
+from asgiref.sync import iscoroutinefunction
+from io import StringIO
+from django.contrib.auth.hashers import make_password
+from django.conf import settings
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth import get_user_model
-from rest_framework_simplejwt.tokens import RefreshToken
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 from django_otp.plugins.otp_totp.models import TOTPDevice
 from django_rest_passwordreset.models import ResetPasswordToken
+from blog.authentication import ClaimsRefreshToken, ClaimsUser, user_cache
+from blog.blacklist import BloomFilter, get_blacklist_filter
+from blog.hashers import PooledModelBackend
+from blog.throttling import get_throttle_store
+from blog.models import BlogPost, Like
 
 User = get_user_model()
 
 class UserTests(APITestCase):
 
     def setUp(self):
+        get_throttle_store().clear()
         self.register_url = reverse('register')
         self.login_url = reverse('login')
         self.logout_url = reverse('logout')
@@ -72,4 +91,220 @@ class UserTests(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.access_token)
         response = self.client.post(self.totp_url, {'name': 'My TOTP Device'}, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
-        self.assertEqual(TOTPDevice.objects.count(), 1)
\ No newline at end of file
+        self.assertEqual(TOTPDevice.objects.count(), 1)
+
+
+class ClaimsAuthenticationTests(APITestCase):
+
+    def setUp(self):
+        get_throttle_store().clear()
+        user_cache.clear()
+        self.user = User.objects.create_user(username='claims', password='testpassword', email='claims@example.com')
+        response = self.client.post(reverse('login'), {'username': 'claims', 'password': 'testpassword'}, format='json')
+        self.access = response.data['access']
+
+    def user_queries(self, response_queries):
+        return [query for query in response_queries if User._meta.db_table in query['sql']]
+
+    def test_login_token_carries_user_claims(self):
+        refresh = RefreshToken(self.client.post(
+            reverse('login'), {'username': 'claims', 'password': 'testpassword'}, format='json').data['refresh'])
+        self.assertNotIn('is_staff', refresh)
+        access = AccessToken(self.access)
+        self.assertEqual(access['username'], 'claims')
+        self.assertFalse(access['is_staff'])
+
+    def test_refreshed_access_token_does_not_keep_privileges(self):
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        tokens = self.client.post(reverse('login'), {'username': 'claims', 'password': 'testpassword'}, format='json').data
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+        self.assertEqual(self.client.get(reverse('analytics')).status_code, status.HTTP_200_OK)
+        User.objects.filter(pk=self.user.pk).update(is_staff=False)
+        for _ in range(2):
+            tokens = self.client.post(reverse('token-refresh'), {'refresh': tokens['refresh']}, format='json').data
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+        self.assertEqual(self.client.get(reverse('analytics')).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_authenticated_request_does_not_load_user(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('notification-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.user_queries(queries.captured_queries), [])
+
+    def test_token_without_claims_falls_back_to_lookup(self):
+        access = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('notification-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(self.user_queries(queries.captured_queries)), 1)
+
+    def test_full_user_is_loaded_once_and_cached(self):
+        first = BlogPost.objects.create(title='First', content='Body', author=self.user)
+        second = BlogPost.objects.create(title='Second', content='Body', author=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        response = self.client.post(reverse('like-post', kwargs={'pk': first.pk}))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Like.objects.get(post=first).user, self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('like-post', kwargs={'pk': second.pk}))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.user_queries(queries.captured_queries), [])
+
+    def test_saving_user_invalidates_cache(self):
+        user = ClaimsUser({'user_id': self.user.pk, 'username': 'claims', 'is_staff': False, 'is_superuser': False})
+        self.assertEqual(user.email, 'claims@example.com')
+        self.user.email = 'changed@example.com'
+        self.user.save()
+        user = ClaimsUser({'user_id': self.user.pk, 'username': 'claims', 'is_staff': False, 'is_superuser': False})
+        self.assertEqual(user.email, 'changed@example.com')
+
+
+@override_settings(TOKEN_BLACKLIST_FILTER={'SYNC_INTERVAL': 3600, 'REBUILD_INTERVAL': 3600})
+class TokenBlacklistTests(APITestCase):
+
+    def setUp(self):
+        get_throttle_store().clear()
+        user_cache.clear()
+        self.user = User.objects.create_user(username='tokens', password='testpassword', email='tokens@example.com')
+        self.refresh = ClaimsRefreshToken.for_user(self.user)
+        self.filter = get_blacklist_filter()
+        self.filter.rebuild()
+
+    def test_refresh_rotates_and_blacklists_token(self):
+        response = self.client.post(reverse('token-refresh'), {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('access', response.data)
+        self.assertNotIn('is_staff', RefreshToken(response.data['refresh']))
+        self.assertEqual(AccessToken(response.data['access'])['username'], 'tokens')
+        response = self.client.post(reverse('token-refresh'), {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_reads_current_privileges(self):
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        response = self.client.post(reverse('token-refresh'), {'refresh': str(self.refresh)}, format='json')
+        self.assertTrue(AccessToken(response.data['access'])['is_staff'])
+        User.objects.filter(pk=self.user.pk).update(is_staff=False)
+        user_cache.clear()
+        response = self.client.post(reverse('token-refresh'), {'refresh': response.data['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(AccessToken(response.data['access'])['is_staff'])
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.assertEqual(self.client.get(reverse('analytics')).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_refresh_rejects_inactive_user(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        response = self.client.post(reverse('token-refresh'), {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertNotIn('access', response.data)
+
+    def test_unlisted_token_skips_blacklist_query(self):
+        with self.assertNumQueries(0):
+            ClaimsRefreshToken(str(self.refresh))
+
+    def test_token_blacklisted_by_another_worker_is_picked_up(self):
+        self.refresh.blacklist()
+        with override_settings(TOKEN_BLACKLIST_FILTER={'SYNC_INTERVAL': 0, 'REBUILD_INTERVAL': 3600}):
+            get_blacklist_filter().rebuild()
+            other = ClaimsRefreshToken.for_user(self.user)
+            RefreshToken(str(other)).blacklist()
+            with self.assertRaises(TokenError):
+                ClaimsRefreshToken(str(other))
+            with self.assertRaises(TokenError):
+                ClaimsRefreshToken(str(self.refresh))
+
+    def test_blacklist_entry_committed_late_is_picked_up(self):
+        late = ClaimsRefreshToken.for_user(self.user)
+        BlacklistedToken.objects.create(id=1000, token=OutstandingToken.objects.get(jti=self.refresh['jti']))
+        with override_settings(TOKEN_BLACKLIST_FILTER={'SYNC_INTERVAL': 0, 'REBUILD_INTERVAL': 3600}):
+            blacklist_filter = get_blacklist_filter()
+            self.assertTrue(blacklist_filter.might_contain(self.refresh['jti']))
+            BlacklistedToken.objects.create(id=999, token=OutstandingToken.objects.get(jti=late['jti']))
+            self.assertTrue(blacklist_filter.might_contain(late['jti']))
+            self.assertEqual(blacklist_filter._bloom.count, 2)
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add(f'jti-{i}')
+        self.assertTrue(all(f'jti-{i}' in bloom for i in range(1000)))
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_prune_tokens_deletes_expired_tokens(self):
+        self.refresh.blacklist()
+        OutstandingToken.objects.filter(jti=self.refresh['jti']).update(expires_at=timezone.now() - timedelta(days=1))
+        ClaimsRefreshToken.for_user(self.user)
+        out = StringIO()
+        call_command('prune_tokens', stdout=out)
+        self.assertIn('Deleted 1 expired outstanding tokens and 1 blacklist entries', out.getvalue())
+        self.assertEqual(OutstandingToken.objects.count(), 1)
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+class LoginHardeningTests(APITestCase):
+
+    def setUp(self):
+        get_throttle_store().clear()
+        self.user = User.objects.create_user(username='hashing', password='testpassword', email='hashing@example.com')
+
+    def login(self, password='testpassword', username='hashing', **extra):
+        return self.client.post(reverse('login'), {'username': username, 'password': password}, format='json', **extra)
+
+    def test_passwords_are_hashed_with_configured_scrypt(self):
+        algorithm, work_factor, _, block_size, parallelism, _ = self.user.password.split('$')
+        self.assertEqual((algorithm, work_factor, block_size, parallelism), ('scrypt', '16384', '8', '1'))
+
+    def test_legacy_hash_is_upgraded_on_login(self):
+        User.objects.filter(pk=self.user.pk).update(password=make_password('testpassword', hasher='pbkdf2_sha256'))
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.assertTrue(User.objects.get(pk=self.user.pk).password.startswith('scrypt$16384$'))
+
+    def test_hash_is_upgraded_when_cost_changes(self):
+        with override_settings(PASSWORD_HASHING={'SCRYPT_WORK_FACTOR': 2 ** 12}):
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+            self.assertTrue(User.objects.get(pk=self.user.pk).password.startswith('scrypt$4096$'))
+
+    def test_invalid_password_is_rejected(self):
+        self.assertEqual(self.login(password='wrong').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.login(username='nobody').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_login_view_is_async(self):
+        self.assertTrue(iscoroutinefunction(resolve(reverse('login')).func))
+        response = self.client.options(reverse('login'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    async def test_async_login_awaits_the_hash(self):
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.001)
+
+        ticker = asyncio.create_task(tick())
+        backend = PooledModelBackend()
+        user = await backend.aauthenticate(None, username='hashing', password='testpassword')
+        ticker.cancel()
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertGreater(ticks, 5)
+        self.assertIsNone(await backend.aauthenticate(None, username='hashing', password='wrong'))
+        self.assertIsNone(await backend.aauthenticate(None, username='nobody', password='testpassword'))
+
+    def test_login_attempts_are_throttled_per_account(self):
+        for i in range(10):
+            self.login(password='wrong', REMOTE_ADDR=f'10.0.0.{i}')
+        response = self.login(REMOTE_ADDR='10.0.1.1')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], 'login_ip': '5/min'},
+    })
+    def test_login_attempts_are_throttled_per_ip(self):
+        for i in range(5):
+            self.login(username=f'user{i}', password='wrong')
+        response = self.login()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
@@ -1,11 +1,18 @@
+import threading
+from unittest import mock
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth import get_user_model
-from ..models import BlogPost
+from django.core.management import call_command
+from django.test import override_settings
+from io import StringIO
+from ..ingest import PostViewBuffer, get_post_view_buffer
+from ..models import BlogPost, Comment, Like, PostView, PostViewDaily
 
 CustomUser = get_user_model()
 
+@override_settings(POST_VIEW_BUFFER={'BACKEND': 'local', 'MAX_SIZE': 1, 'BACKGROUND': False})
 class BlogPostTests(APITestCase):
 
     def setUp(self):
@@ -77,4 +84,92 @@ class BlogPostTests(APITestCase):
         # Retrieve the blog post again to check if cache is updated
         response = self.client.get(self.detail_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data['title'], 'Updated Blog Post')
\ No newline at end of file
+        self.assertEqual(response.data['title'], 'Updated Blog Post')
+
+    def test_retrieve_records_view_for_authenticated_user(self):
+        self.client.force_authenticate(user=self.user)
+        self.client.get(self.detail_url)
+        self.blog_post.refresh_from_db()
+        self.assertEqual(self.blog_post.view_count, 1)
+        self.assertEqual(PostView.objects.filter(post=self.blog_post).count(), 1)
+
+    def test_counters_are_read_only(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.patch(self.detail_url, {'like_count': 99}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.blog_post.refresh_from_db()
+        self.assertEqual(self.blog_post.like_count, 0)
+
+    def test_reconcile_post_counters(self):
+        Like.objects.create(user=self.user, post=self.blog_post)
+        Comment.objects.create(post=self.blog_post, content='Comment', author=self.user)
+        PostView.objects.create(user=self.user, post=self.blog_post)
+        out = StringIO()
+        call_command('reconcile_post_counters', stdout=out)
+        self.blog_post.refresh_from_db()
+        self.assertEqual(
+            (self.blog_post.like_count, self.blog_post.comment_count, self.blog_post.view_count),
+            (1, 1, 1),
+        )
+        self.assertIn('1 repaired', out.getvalue())
+
+    def test_post_list_query_count_is_constant(self):
+        liker = CustomUser.objects.create_user(username='liker', password='testpassword', email='liker@example.com')
+        for i in range(14):
+            post = BlogPost.objects.create(title=f'Blog Post {i}', content='Content', author=self.user)
+            Like.objects.create(user=self.user, post=post)
+            Like.objects.create(user=liker, post=post)
+        # One SELECT joined with authors and one prefetch of liking user ids; cursor pages issue no COUNT.
+        with self.assertNumQueries(2):
+            response = self.client.get(self.list_create_url)
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(sorted(response.data['results'][0]['likes']), sorted([self.user.id, liker.id]))
+        # Page-number mode adds the COUNT.
+        with self.assertNumQueries(3):
+            response = self.client.get(self.list_create_url, {'page': 2})
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_cursor_pagination_walks_all_posts(self):
+        for i in range(15):
+            BlogPost.objects.create(title=f'Blog Post {i}', content='Content', author=self.user)
+        response = self.client.get(self.list_create_url)
+        self.assertNotIn('count', response.data)
+        first_page = [post['id'] for post in response.data['results']]
+        response = self.client.get(response.data['next'])
+        second_page = [post['id'] for post in response.data['results']]
+        self.assertEqual(len(second_page), 6)
+        self.assertIsNone(response.data['next'])
+        expected = list(BlogPost.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(first_page + second_page, expected)
+
+    def test_page_number_pagination_is_opt_in(self):
+        for i in range(15):
+            BlogPost.objects.create(title=f'Blog Post {i}', content='Content', author=self.user)
+        response = self.client.get(self.list_create_url, {'page': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 16)
+        self.assertEqual(len(response.data['results']), 6)
+
+    def test_views_are_buffered_and_flushed_in_bulk(self):
+        with self.settings(POST_VIEW_BUFFER={'BACKEND': 'local', 'MAX_SIZE': 3, 'MAX_AGE': 60, 'BACKGROUND': False}):
+            self.client.force_authenticate(user=self.user)
+            self.client.get(self.detail_url)
+            self.client.get(self.detail_url)
+            self.assertEqual(PostView.objects.count(), 0)
+            self.client.get(self.detail_url)
+            self.assertEqual(PostView.objects.count(), 3)
+            self.blog_post.refresh_from_db()
+            self.assertEqual(self.blog_post.view_count, 3)
+            self.assertEqual(PostViewDaily.objects.get(post=self.blog_post).views, 3)
+            self.client.get(self.detail_url)
+            self.assertEqual(get_post_view_buffer().flush(), 1)
+            self.assertEqual(PostViewDaily.objects.get(post=self.blog_post).views, 4)
+
+    def test_buffered_views_are_written_without_further_views(self):
+        written = threading.Event()
+        with self.settings(POST_VIEW_BUFFER={'BACKEND': 'local', 'MAX_SIZE': 100, 'MAX_AGE': 0.1, 'BACKGROUND': True}):
+            with mock.patch.object(PostViewBuffer, 'write', side_effect=lambda items: written.set()) as write:
+                self.client.force_authenticate(user=self.user)
+                self.client.get(self.detail_url)
+                self.assertTrue(written.wait(5))
+        self.assertEqual(write.call_args.args[0][0][:2], [self.blog_post.pk, self.user.pk])
\ No newline at end of file
@@ -0,0 +1,63 @@
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+from django.contrib.auth import get_user_model
+from ..cache import VersionedCache, bump_generation, get_generation
+from ..models import BlogPost
+
+CustomUser = get_user_model()
+
+class PostCacheTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username='testuser', password='testpassword', email='testuser@example.com')
+        self.blog_post = BlogPost.objects.create(title='Test Blog Post', content='Content', author=self.user)
+        self.list_create_url = reverse('post-list-create')
+        self.like_url = reverse('like-post', kwargs={'pk': self.blog_post.pk})
+
+    def test_post_page_is_served_from_cache(self):
+        self.client.get(self.list_create_url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.list_create_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['title'], 'Test Blog Post')
+
+    def test_pages_are_keyed_by_query_parameters(self):
+        for i in range(12):
+            BlogPost.objects.create(title=f'Blog Post {i}', content='Content', author=self.user)
+        first = self.client.get(self.list_create_url)
+        second = self.client.get(self.list_create_url, {'page': 2})
+        self.assertEqual(len(first.data['results']), 10)
+        self.assertEqual(len(second.data['results']), 3)
+
+    @override_settings(ALLOWED_HOSTS=['testserver', 'example.com'])
+    def test_pages_are_keyed_by_scheme_and_host(self):
+        for i in range(12):
+            BlogPost.objects.create(title=f'Blog Post {i}', content='Content', author=self.user)
+        self.assertTrue(self.client.get(self.list_create_url).data['next'].startswith('http://testserver/'))
+        response = self.client.get(self.list_create_url, secure=True)
+        self.assertTrue(response.data['next'].startswith('https://testserver/'))
+        self.client.get(self.list_create_url, {'host': 'example.com'})
+        response = self.client.get(self.list_create_url, HTTP_HOST='example.com')
+        self.assertNotIn('host=', response.data['next'])
+
+    def test_like_bumps_generation_and_refreshes_page(self):
+        self.client.get(self.list_create_url)
+        generation = get_generation()
+        self.client.force_authenticate(user=self.user)
+        self.client.post(self.like_url)
+        self.assertGreater(get_generation(), generation)
+        response = self.client.get(self.list_create_url)
+        self.assertEqual(response.data['results'][0]['like_count'], 1)
+
+    def test_stale_entry_is_served_while_another_worker_rebuilds(self):
+        page_cache = VersionedCache('test:page')
+        page_cache.get_or_build({'page': 1}, lambda: {'value': 'old'})
+        bump_generation()
+        cache.add(f"{page_cache.make_key({'page': 1})}:lock", 1)
+        self.assertEqual(page_cache.get_or_build({'page': 1}, lambda: {'value': 'new'}), {'value': 'old'})
+        cache.delete(f"{page_cache.make_key({'page': 1})}:lock")
+        self.assertEqual(page_cache.get_or_build({'page': 1}, lambda: {'value': 'new'}), {'value': 'new'})
@@ -2,13 +2,22 @@ from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth import get_user_model
-from ..models import BlogPost, Comment
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from ..models import BlogPost, Comment, Notification
+from ..throttling import get_throttle_store
 
 CustomUser = get_user_model()
 
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'blog.layers.LocalChannelLayer'}},
+    NOTIFICATION_OUTBOX={'BACKEND': 'local', 'MAX_SIZE': 1, 'BACKGROUND': False},
+)
 class CommentTests(APITestCase):
 
     def setUp(self):
+        get_throttle_store().clear()
         self.user = CustomUser.objects.create_user(username='testuser', password='testpassword')
         self.client.login(username='testuser', password='testpassword')
         self.blog_post = BlogPost.objects.create(
@@ -40,6 +49,8 @@ class CommentTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Comment.objects.count(), 2)
         self.assertEqual(Comment.objects.get(id=response.data['id']).content, 'This is a new comment.')
+        self.assertEqual(Notification.objects.get(user=self.user).message,
+                         'New comment on your post: This is a new comment.')
 
     def test_retrieve_comment(self):
         self.client.force_authenticate(user=self.user)
@@ -90,4 +101,74 @@ class CommentTests(APITestCase):
         response = self.client.get(self.detail_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['replies']), 1)
-        self.assertEqual(response.data['replies'][0]['content'], nested_comment.content)
\ No newline at end of file
+        self.assertEqual(response.data['replies'][0]['content'], nested_comment.content)
+
+    def test_delete_comment_decrements_comment_count_including_replies(self):
+        Comment.objects.create(post=self.blog_post, content='Reply', author=self.user, parent=self.comment)
+        BlogPost.objects.filter(pk=self.blog_post.pk).update(comment_count=2)
+        self.client.force_authenticate(user=self.user)
+        response = self.client.delete(self.detail_url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.blog_post.refresh_from_db()
+        self.assertEqual(self.blog_post.comment_count, 0)
+
+    def test_comment_root_tracks_thread(self):
+        reply = Comment.objects.create(post=self.blog_post, content='Reply', author=self.user, parent=self.comment)
+        nested = Comment.objects.create(post=self.blog_post, content='Nested', author=self.user, parent=reply)
+        self.assertIsNone(self.comment.root_id)
+        self.assertEqual(reply.root_id, self.comment.id)
+        self.assertEqual(nested.root_id, self.comment.id)
+        reply.parent = None
+        reply.save()
+        nested.refresh_from_db()
+        self.assertEqual(nested.root_id, reply.id)
+
+    def test_saving_comment_without_moving_it_skips_root_lookups(self):
+        reply = Comment.objects.create(post=self.blog_post, content='Reply', author=self.user, parent=self.comment)
+        reply = Comment.objects.get(pk=reply.pk)
+        reply.content = 'Edited'
+        for save_kwargs in ({}, {'update_fields': ['content']}):
+            with CaptureQueriesContext(connection) as queries:
+                reply.save(**save_kwargs)
+            self.assertFalse([query for query in queries if query['sql'].startswith('SELECT')])
+            self.assertNotIn('"root_id"', queries[0]['sql'])
+        reply.parent = None
+        reply.save(update_fields=['parent'])
+        self.assertEqual(Comment.objects.filter(pk=reply.pk).values_list('parent_id', 'root_id').get(), (None, None))
+
+    def test_list_comment_threads(self):
+        reply = Comment.objects.create(post=self.blog_post, content='Reply', author=self.user, parent=self.comment)
+        Comment.objects.create(post=self.blog_post, content='Nested', author=self.user, parent=reply)
+        Comment.objects.create(post=self.blog_post, content='Second thread', author=self.user)
+        url = reverse('post-comment-threads', kwargs={'pk': self.blog_post.pk})
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        threads = response.data['results']
+        self.assertEqual([thread['content'] for thread in threads], ['This is a test comment.', 'Second thread'])
+        self.assertEqual(threads[0]['replies'][0]['content'], 'Reply')
+        self.assertEqual(threads[0]['replies'][0]['replies'][0]['content'], 'Nested')
+        self.assertEqual(threads[1]['replies'], [])
+
+    def test_list_comment_threads_with_depth_limit(self):
+        reply = Comment.objects.create(post=self.blog_post, content='Reply', author=self.user, parent=self.comment)
+        Comment.objects.create(post=self.blog_post, content='Nested', author=self.user, parent=reply)
+        url = reverse('post-comment-threads', kwargs={'pk': self.blog_post.pk})
+        response = self.client.get(url, {'depth': 1})
+        reply_node = response.data['results'][0]['replies'][0]
+        self.assertEqual(reply_node['replies'], [])
+        self.assertEqual(reply_node['reply_count'], 1)
+
+    def test_list_comment_threads_paginates_top_level_comments(self):
+        for i in range(25):
+            Comment.objects.create(post=self.blog_post, content=f'Thread {i}', author=self.user)
+        url = reverse('post-comment-threads', kwargs={'pk': self.blog_post.pk})
+        response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 20)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 6)
+
+    def test_list_comment_threads_for_missing_post(self):
+        url = reverse('post-comment-threads', kwargs={'pk': self.blog_post.pk + 100})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
\ No newline at end of file
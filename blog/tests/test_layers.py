@@ -0,0 +1,75 @@
+import asyncio
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase
+from ..layers import HashRing, LocalChannelLayer, ShardedRedisChannelLayer
+
+
+class LocalChannelLayerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.layer = LocalChannelLayer(capacity=2)
+
+    async def test_group_send_reaches_every_member_once(self):
+        channels = [await self.layer.new_channel() for _ in range(3)]
+        for channel in channels:
+            await self.layer.group_add('post_1', channel)
+        await self.layer.group_add('post_2', channels[0])
+        message = {'type': 'post_activity', 'frames': {'json': '{}'}}
+        await self.layer.group_send('post_1', message)
+        message['frames'] = None
+        for channel in channels:
+            self.assertEqual(await self.layer.receive(channel), {'type': 'post_activity', 'frames': {'json': '{}'}})
+        self.assertEqual(self.layer.channels, {})
+
+    async def test_group_discard_stops_delivery(self):
+        channel = await self.layer.new_channel()
+        await self.layer.group_add('post_1', channel)
+        await self.layer.group_discard('post_1', channel)
+        await self.layer.group_send('post_1', {'type': 'post_activity'})
+        self.assertEqual(self.layer.channels, {})
+
+    async def test_full_channel_drops_messages(self):
+        channel = await self.layer.new_channel()
+        await self.layer.group_add('post_1', channel)
+        for number in range(3):
+            await self.layer.group_send('post_1', {'type': 'post_activity', 'number': number})
+        self.assertEqual((await self.layer.receive(channel))['number'], 0)
+        self.assertEqual((await self.layer.receive(channel))['number'], 1)
+        self.assertEqual(self.layer.channels, {})
+
+    async def test_send_from_another_thread_wakes_the_receiver(self):
+        channel = await self.layer.new_channel()
+        await self.layer.group_add('notifications_1', channel)
+        receiver = asyncio.ensure_future(self.layer.receive(channel))
+        await asyncio.sleep(0)
+        await asyncio.to_thread(async_to_sync(self.layer.group_send), 'notifications_1', {'type': 'unread_count'})
+        self.assertEqual(await asyncio.wait_for(receiver, 1), {'type': 'unread_count'})
+
+
+class ShardedRedisChannelLayerTests(SimpleTestCase):
+    keys = [f'notifications_{user_id}' for user_id in range(20000)]
+
+    def test_keys_spread_evenly(self):
+        ring = HashRing(['a', 'b', 'c', 'd'])
+        shares = [0] * 4
+        for key in self.keys:
+            shares[ring.node(key)] += 1
+        for share in shares:
+            self.assertGreater(share, len(self.keys) / 4 * 0.8)
+            self.assertLess(share, len(self.keys) / 4 * 1.2)
+
+    def test_adding_a_host_moves_few_keys(self):
+        before = ShardedRedisChannelLayer(hosts=['redis://a:6379', 'redis://b:6379', 'redis://c:6379'])
+        after = ShardedRedisChannelLayer(hosts=['redis://c:6379', 'redis://d:6379', 'redis://a:6379', 'redis://b:6379'])
+        moved = 0
+        for key in self.keys:
+            old = before.hosts[before.consistent_hash(key)]
+            new = after.hosts[after.consistent_hash(key)]
+            if old != new:
+                self.assertEqual(new['address'], 'redis://d:6379')
+                moved += 1
+        self.assertLess(moved, len(self.keys) * 0.35)
+
+    def test_single_host(self):
+        layer = ShardedRedisChannelLayer(hosts=[('127.0.0.1', 6379)])
+        self.assertEqual({layer.consistent_hash(key) for key in self.keys[:100]}, {0})
@@ -1,14 +1,20 @@
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth import get_user_model
-from ..models import BlogPost, Like
+from ..buffers import LocalBufferStore
+from ..cache import get_generation
+from ..likes import LikeBuffer, LocalPendingStore, get_like_buffer, insert_likes
+from ..models import AnalyticsTotal, BlogPost, Like
+from ..throttling import get_throttle_store
 
 CustomUser = get_user_model()
 
 class LikeTests(APITestCase):
 
     def setUp(self):
+        get_throttle_store().clear()
         self.user = CustomUser.objects.create_user(username='testuser', password='testpassword')
         self.client.login(username='testuser', password='testpassword')
         self.blog_post = BlogPost.objects.create(
@@ -40,4 +46,153 @@ class LikeTests(APITestCase):
         response = self.client.post(self.like_url)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(Like.objects.count(), 1)
-        self.assertEqual(self.blog_post.likes.count(), 1)
\ No newline at end of file
+        self.assertEqual(self.blog_post.likes.count(), 1)
+
+    def test_like_and_unlike_maintain_like_count(self):
+        self.client.force_authenticate(user=self.user)
+        self.client.post(self.like_url)
+        self.blog_post.refresh_from_db()
+        self.assertEqual(self.blog_post.like_count, 1)
+        self.client.delete(self.unlike_url)
+        self.blog_post.refresh_from_db()
+        self.assertEqual(self.blog_post.like_count, 0)
+
+    def test_like_is_idempotent_under_repeated_inserts(self):
+        self.assertEqual(insert_likes(self.user.pk, [self.blog_post.pk]), {self.blog_post.pk})
+        self.assertEqual(insert_likes(self.user.pk, [self.blog_post.pk]), set())
+        self.assertEqual(Like.objects.count(), 1)
+
+    def test_like_updates_counter_and_totals_once(self):
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.post(self.like_url).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.client.post(self.like_url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.blog_post.refresh_from_db()
+        self.assertEqual(self.blog_post.like_count, 1)
+        self.assertEqual(AnalyticsTotal.objects.get(metric='likes').value, 1)
+        self.assertEqual(self.client.delete(self.unlike_url).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.delete(self.unlike_url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(AnalyticsTotal.objects.get(metric='likes').value, 0)
+
+    def test_like_missing_post(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(reverse('like-post', kwargs={'pk': self.blog_post.pk + 100}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_like_batch(self):
+        other = BlogPost.objects.create(title='Other', content='Other post.', author=self.user)
+        Like.objects.create(user=self.user, post=other)
+        BlogPost.objects.filter(pk=other.pk).update(like_count=1)
+        self.client.force_authenticate(user=self.user)
+        operations = [
+            {'post': self.blog_post.pk, 'action': 'like'},
+            {'post': other.pk, 'action': 'unlike'},
+            {'post': self.blog_post.pk + 100, 'action': 'like'},
+            {'post': other.pk, 'action': 'like'},
+            {'post': other.pk, 'action': 'unlike'},
+        ]
+        response = self.client.post(reverse('like-batch'), {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [
+            {'post': self.blog_post.pk, 'action': 'like', 'changed': True, 'found': True},
+            {'post': other.pk, 'action': 'unlike', 'changed': True, 'found': True},
+            {'post': self.blog_post.pk + 100, 'action': 'like', 'changed': False, 'found': False},
+        ])
+        self.assertEqual(list(Like.objects.values_list('post_id', flat=True)), [self.blog_post.pk])
+        self.assertEqual(dict(BlogPost.objects.values_list('pk', 'like_count')), {self.blog_post.pk: 1, other.pk: 0})
+        response = self.client.post(reverse('like-batch'), {'operations': operations}, format='json')
+        self.assertFalse(any(result['changed'] for result in response.data['results']))
+
+    def test_like_batch_rejects_invalid_operations(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(reverse('like-batch'), {'operations': [{'post': self.blog_post.pk, 'action': 'love'}]},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(
+    LIKE_BUFFER={'ENABLED': True, 'BACKEND': 'local', 'MAX_SIZE': 1000, 'MAX_AGE': 60, 'BACKGROUND': False},
+    POST_VIEW_BUFFER={'BACKEND': 'local', 'MAX_SIZE': 1, 'BACKGROUND': False},
+)
+class LikeBufferTests(APITestCase):
+
+    def setUp(self):
+        get_throttle_store().clear()
+        self.user = CustomUser.objects.create_user(username='testuser', email='testuser@example.com',
+                                                   password='testpassword')
+        self.other = CustomUser.objects.create_user(username='otheruser', email='otheruser@example.com',
+                                                    password='testpassword')
+        self.blog_post = BlogPost.objects.create(title='Test Blog Post', content='This is a test blog post.',
+                                                 author=self.other)
+        self.like_url = reverse('like-post', kwargs={'pk': self.blog_post.pk})
+        self.unlike_url = reverse('unlike-post', kwargs={'pk': self.blog_post.pk})
+        self.detail_url = reverse('post-detail', kwargs={'pk': self.blog_post.pk})
+
+    def test_like_is_buffered_until_flush(self):
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.post(self.like_url).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Like.objects.count(), 0)
+        self.assertEqual(self.client.post(self.like_url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(get_like_buffer().flush(), 1)
+        self.assertEqual(list(Like.objects.values_list('user_id', 'post_id')), [(self.user.pk, self.blog_post.pk)])
+        self.blog_post.refresh_from_db()
+        self.assertEqual(self.blog_post.like_count, 1)
+        self.assertEqual(AnalyticsTotal.objects.get(metric='likes').value, 1)
+        self.assertEqual(self.client.post(self.like_url).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_liking_user_reads_own_pending_like(self):
+        self.client.force_authenticate(user=self.other)
+        self.client.get(self.detail_url)
+        self.client.force_authenticate(user=self.user)
+        self.client.post(self.like_url)
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.data['like_count'], 1)
+        self.assertIn(self.user.pk, response.data['likes'])
+        response = self.client.get(reverse('post-list-create'))
+        self.assertEqual(response.data['results'][0]['like_count'], 1)
+        self.client.force_authenticate(user=self.other)
+        self.assertEqual(self.client.get(self.detail_url).data['like_count'], 0)
+        get_like_buffer().flush()
+        self.assertEqual(self.client.get(self.detail_url).data['like_count'], 1)
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get(self.detail_url).data['like_count'], 1)
+
+    def test_like_then_unlike_before_flush_writes_nothing(self):
+        self.client.force_authenticate(user=self.user)
+        self.client.post(self.like_url)
+        self.assertEqual(self.client.delete(self.unlike_url).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.delete(self.unlike_url).status_code, status.HTTP_400_BAD_REQUEST)
+        get_like_buffer().flush()
+        self.assertEqual(Like.objects.count(), 0)
+        self.blog_post.refresh_from_db()
+        self.assertEqual(self.blog_post.like_count, 0)
+        self.assertFalse(AnalyticsTotal.objects.filter(metric='likes', value__gt=0).exists())
+
+    def test_flush_skips_deleted_posts(self):
+        self.client.force_authenticate(user=self.user)
+        self.client.post(self.like_url)
+        self.blog_post.delete()
+        get_like_buffer().flush()
+        self.assertEqual(Like.objects.count(), 0)
+
+    def test_like_and_unlike_with_unchanged_count_bump_generation(self):
+        Like.objects.create(user=self.other, post=self.blog_post)
+        self.client.force_authenticate(user=self.user)
+        self.client.post(self.like_url)
+        self.client.force_authenticate(user=self.other)
+        self.client.delete(self.unlike_url)
+        generation = get_generation()
+        self.assertEqual(get_like_buffer().flush(), 2)
+        self.assertNotEqual(get_generation(), generation)
+        self.assertEqual(self.client.get(self.detail_url).data['likes'], [self.user.pk])
+
+    def test_pending_likes_are_shared_by_workers_sharing_the_stores(self):
+        store, pending = LocalBufferStore(), LocalPendingStore()
+        first = LikeBuffer(store, pending=pending, max_size=1000, max_age=60)
+        second = LikeBuffer(store, pending=pending, max_size=1000, max_age=60)
+        self.assertEqual(first.apply(self.user.pk, liked=[self.blog_post.pk]), ({self.blog_post.pk}, set()))
+        self.assertEqual(second.apply(self.user.pk, liked=[self.blog_post.pk]), (set(), set()))
+        self.assertEqual(second.pending_for_user(self.user.pk), {self.blog_post.pk: (True, 1)})
+        self.assertEqual(second.flush(), 1)
+        self.assertEqual(first.pending_for_user(self.user.pk), {})
+        self.assertEqual(second.apply(self.user.pk, unliked=[self.blog_post.pk]), (set(), {self.blog_post.pk}))
+        self.assertEqual(first.pending_for_user(self.user.pk), {self.blog_post.pk: (False, -1)})
@@ -1,14 +1,35 @@
+import json
+import threading
+from datetime import timedelta
+from io import StringIO
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
 from django.contrib.auth import get_user_model
-from ..models import Notification, NotificationPreference
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from ..buffers import LocalBufferStore, WriteBuffer
+from ..models import Notification, NotificationArchive, NotificationCounter, NotificationPreference
+from ..outbox import NotificationOutbox, coalesce, get_notification_outbox
+from ..preferences import preference_cache
+from ..retention import apply_retention
+from ..utils import send_notifications
 
 CustomUser = get_user_model()
 
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'blog.layers.LocalChannelLayer'}},
+    NOTIFICATION_OUTBOX={'BACKEND': 'local', 'MAX_SIZE': 1, 'BACKGROUND': False},
+)
 class NotificationTests(APITestCase):
 
     def setUp(self):
+        cache.clear()
+        preference_cache.clear()
         self.user = CustomUser.objects.create_user(username='testuser', password='testpassword', email='testuser@example.com')
         self.client.login(username='testuser', password='testpassword')
         self.notification = Notification.objects.create(
@@ -23,13 +44,15 @@ class NotificationTests(APITestCase):
         self.notification_list_url = reverse('notification-list')
         self.mark_notification_read_url = reverse('mark-notification-read', kwargs={'pk': self.notification.pk})
         self.notification_preferences_url = reverse('notification-preferences')
+        self.unread_count_url = reverse('notification-unread-count')
+        self.bulk_read_url = reverse('notifications-mark-read')
 
     def test_list_notifications(self):
         self.client.force_authenticate(user=self.user)
         response = self.client.get(self.notification_list_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['message'], 'This is a test notification.')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['message'], 'This is a test notification.')
 
     def test_mark_notification_as_read(self):
         self.client.force_authenticate(user=self.user)
@@ -37,6 +60,62 @@ class NotificationTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.notification.refresh_from_db()
         self.assertTrue(self.notification.is_read)
+        self.assertEqual(self.client.get(self.unread_count_url).data['unread'], 0)
+        self.client.patch(self.mark_notification_read_url, {'is_read': True}, format='json')
+        self.assertEqual(NotificationCounter.objects.get(user=self.user).unread, 0)
+
+    def test_mark_notification_as_read_updates_only_is_read(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.patch(self.mark_notification_read_url, {'is_read': True, 'message': 'Changed'}, format='json')
+        self.assertTrue(response.data['is_read'])
+        self.assertEqual(response.data['message'], 'This is a test notification.')
+        self.notification.refresh_from_db()
+        self.assertTrue(self.notification.is_read)
+        self.assertEqual(self.notification.message, 'This is a test notification.')
+
+    def test_unread_count_is_read_from_counter(self):
+        for i in range(3):
+            Notification.objects.create(user=self.user, message=f'Notification {i}')
+        self.client.force_authenticate(user=self.user)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.unread_count_url)
+        self.assertEqual(response.data['unread'], 4)
+
+    def test_unread_count_is_initialized_when_missing(self):
+        NotificationCounter.objects.all().delete()
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get(self.unread_count_url).data['unread'], 1)
+        self.assertEqual(NotificationCounter.objects.get(user=self.user).unread, 1)
+
+    def test_bulk_mark_as_read(self):
+        other = CustomUser.objects.create_user(username='other', password='testpassword', email='other@example.com')
+        foreign = Notification.objects.create(user=other, message='Not yours')
+        created = [Notification.objects.create(user=self.user, message=f'Notification {i}') for i in range(4)]
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(self.bulk_read_url, {'ids': [created[0].pk, foreign.pk]}, format='json')
+        self.assertEqual(response.data, {'marked': 1, 'unread': 4})
+        response = self.client.post(self.bulk_read_url, {'up_to': created[2].pk}, format='json')
+        self.assertEqual(response.data, {'marked': 3, 'unread': 1})
+        response = self.client.post(self.bulk_read_url, {'all': True}, format='json')
+        self.assertEqual(response.data, {'marked': 1, 'unread': 0})
+        foreign.refresh_from_db()
+        self.assertFalse(foreign.is_read)
+
+    def test_bulk_mark_as_read_requires_one_selector(self):
+        self.client.force_authenticate(user=self.user)
+        for data in ({}, {'all': True, 'up_to': 3}, {'all': False}, {'ids': []}):
+            response = self.client.post(self.bulk_read_url, data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_mark_as_read_pushes_count_delta(self):
+        channel_layer = get_channel_layer()
+        channel = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(f'notifications_{self.user.id}', channel)
+        Notification.objects.create(user=self.user, message='Another')
+        self.client.force_authenticate(user=self.user)
+        self.client.post(self.bulk_read_url, {'all': True}, format='json')
+        event = async_to_sync(channel_layer.receive)(channel)
+        self.assertEqual(json.loads(event['frames']['json']), {'type': 'unread_count', 'delta': -2, 'unread': 0})
 
     def test_retrieve_notification_preferences(self):
         self.client.force_authenticate(user=self.user)
@@ -50,4 +129,127 @@ class NotificationTests(APITestCase):
         response = self.client.patch(self.notification_preferences_url, {'email_notifications': False}, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.notification_preference.refresh_from_db()
-        self.assertFalse(self.notification_preference.email_notifications)
\ No newline at end of file
+        self.assertFalse(self.notification_preference.email_notifications)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'blog.layers.LocalChannelLayer'}})
+class NotificationOutboxTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        preference_cache.clear()
+        self.user = CustomUser.objects.create_user(username='author', password='testpassword', email='author@example.com')
+        self.other = CustomUser.objects.create_user(username='other', password='testpassword', email='other@example.com')
+        self.outbox = NotificationOutbox(LocalBufferStore(), max_size=100, max_age=60)
+        self.channel_layer = get_channel_layer()
+        self.channel = async_to_sync(self.channel_layer.new_channel)()
+        async_to_sync(self.channel_layer.group_add)(f'notifications_{self.user.id}', self.channel)
+
+    def test_burst_is_coalesced_into_one_notification(self):
+        for i in range(12):
+            self.outbox.enqueue(self.user.id, f'New comment {i}', key='comments:1', summary='{count} new comments on your post')
+        self.outbox.enqueue(self.other.id, 'New comment', key='comments:1', summary='{count} new comments on your post')
+        self.assertEqual(Notification.objects.count(), 0)
+        with self.assertNumQueries(8):
+            self.assertEqual(self.outbox.flush(), 13)
+        self.assertEqual(Notification.objects.get(user=self.user).message, '12 new comments on your post')
+        self.assertEqual(Notification.objects.get(user=self.other).message, 'New comment')
+        self.assertEqual(NotificationCounter.objects.get(user=self.user).unread, 1)
+        event = async_to_sync(self.channel_layer.receive)(self.channel)
+        self.assertEqual(event['type'], 'send_notification')
+        self.assertEqual(json.loads(event['frames']['json'])['message'], '12 new comments on your post')
+        event = async_to_sync(self.channel_layer.receive)(self.channel)
+        self.assertEqual(json.loads(event['frames']['json']), {'type': 'unread_count', 'delta': 1, 'unread': 1})
+
+    def test_notifications_without_key_are_not_merged(self):
+        merged = coalesce([[1, 'a', None, None], [1, 'b', None, None], [1, 'c', 'k', '{count} c'], [1, 'd', 'k', '{count} c']])
+        self.assertEqual(merged, [(1, 'a'), (1, 'b'), (1, '2 c')])
+
+    def test_background_flush_runs_off_the_calling_thread(self):
+        written = threading.Event()
+
+        class RecordingBuffer(WriteBuffer):
+            def write(self, items):
+                self.items, self.thread = items, threading.current_thread()
+                written.set()
+
+        buffer = RecordingBuffer(LocalBufferStore(), max_size=2, max_age=60, background=True)
+        self.assertEqual(buffer.add('a'), 0)
+        self.assertEqual(buffer.add('b'), 0)
+        self.assertTrue(written.wait(5))
+        self.assertEqual(buffer.items, ['a', 'b'])
+        self.assertIsNot(buffer.thread, threading.current_thread())
+
+    def test_opted_out_users_cost_no_writes_or_pushes(self):
+        NotificationPreference.objects.create(user=self.user, push_notifications=False, email_notifications=False)
+        self.outbox.enqueue(self.user.id, 'New comment')
+        self.outbox.flush()
+        self.assertFalse(Notification.objects.exists())
+        NotificationPreference.objects.filter(user=self.user).update(email_notifications=True)
+        preference_cache.invalidate(self.user.id)
+        self.outbox.enqueue(self.user.id, 'New comment')
+        self.outbox.flush()
+        self.assertEqual(Notification.objects.count(), 1)
+        self.assertEqual(len(self.channel_layer.channels.get(self.channel, [])), 0)
+
+    def test_preferences_are_looked_up_in_bulk_and_cached(self):
+        users = [self.user, self.other] + [
+            CustomUser.objects.create_user(username=f'reader{i}', password='testpassword', email=f'reader{i}@example.com')
+            for i in range(5)
+        ]
+        NotificationPreference.objects.create(user=users[2], push_notifications=False, email_notifications=False)
+        with self.assertNumQueries(1):
+            prefs = preference_cache.get_many([user.id for user in users])
+        self.assertFalse(prefs[users[2].id]['push_notifications'])
+        self.assertTrue(prefs[users[3].id]['push_notifications'])
+        with self.assertNumQueries(0):
+            preference_cache.get_many([user.id for user in users])
+        preference_cache.clear()
+        with self.assertNumQueries(0):
+            preference_cache.get_many([user.id for user in users])
+
+    @override_settings(NOTIFICATION_OUTBOX={'BACKEND': 'local', 'MAX_SIZE': 100, 'BACKGROUND': False})
+    def test_fan_out_skips_opted_out_users(self):
+        NotificationPreference.objects.create(user=self.other, push_notifications=False, email_notifications=False)
+        send_notifications([self.user, self.other], 'Announcement')
+        self.assertEqual(get_notification_outbox().flush(), 2)
+        self.assertEqual(list(Notification.objects.values_list('user_id', flat=True)), [self.user.id])
+
+    def test_preference_update_invalidates_cache(self):
+        preference = NotificationPreference.objects.create(user=self.user)
+        self.assertTrue(preference_cache.get(self.user.id)['push_notifications'])
+        self.client.force_authenticate(user=self.user)
+        self.client.patch(reverse('notification-preferences'), {'push_notifications': False}, format='json')
+        self.assertFalse(preference_cache.get(self.user.id)['push_notifications'])
+
+
+class NotificationRetentionTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='testuser', password='testpassword', email='testuser@example.com')
+        self.old = [Notification.objects.create(user=self.user, message=f'Old {i}', is_read=i < 3) for i in range(5)]
+        Notification.objects.filter(pk__in=[n.pk for n in self.old]).update(created_at=timezone.now() - timedelta(days=60))
+        self.recent = [Notification.objects.create(user=self.user, message=f'Recent {i}', is_read=True) for i in range(3)]
+
+    def test_expired_read_notifications_are_purged_in_batches(self):
+        report = apply_retention(READ_DAYS=30, MAX_PER_USER=100, BATCH_SIZE=2)
+        self.assertEqual(report['expired'], 3)
+        self.assertEqual(report['capped'], 0)
+        self.assertEqual(report['batches'], 2)
+        self.assertEqual(Notification.objects.count(), 5)
+        self.assertFalse(Notification.objects.filter(pk__in=[n.pk for n in self.old[:3]]).exists())
+
+    def test_notifications_beyond_cap_are_removed_oldest_first(self):
+        report = apply_retention(READ_DAYS=365, MAX_PER_USER=4, ARCHIVE=True)
+        self.assertEqual(report['capped'], 4)
+        self.assertEqual(set(Notification.objects.values_list('message', flat=True)),
+                         {'Recent 0', 'Recent 1', 'Recent 2', 'Old 4'})
+        self.assertEqual(NotificationArchive.objects.filter(user=self.user).count(), 4)
+        self.assertEqual(NotificationCounter.objects.get(user=self.user).unread, 1)
+
+    def test_command_reports_throughput(self):
+        out = StringIO()
+        call_command('purge_notifications', '--days', '30', '--archive', stdout=out)
+        self.assertIn('Archived 3 expired and 0 over-cap notifications', out.getvalue())
+        self.assertIn('rows/s', out.getvalue())
+        self.assertEqual(NotificationArchive.objects.count(), 3)
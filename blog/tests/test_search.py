@@ -0,0 +1,75 @@
+from django.core.management import call_command
+from django.urls import reverse
+from io import StringIO
+from rest_framework.test import APITestCase
+from rest_framework import status
+from django.contrib.auth import get_user_model
+from ..models import BlogPost, Comment
+from ..search import SearchResults, get_search_backend, parse_terms
+
+CustomUser = get_user_model()
+
+class SearchTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='testuser', password='testpassword', email='testuser@example.com')
+        self.client.force_authenticate(user=self.user)
+        self.django_post = BlogPost.objects.create(
+            title='Django performance', content='Caching querysets and running migrations.', author=self.user
+        )
+        self.other_post = BlogPost.objects.create(
+            title='Gardening notes', content='Tomatoes need sun. Django reinhardt played guitar.', author=self.user
+        )
+        self.comment = Comment.objects.create(
+            post=self.other_post, content='Cached tomatoes taste better.', author=self.user
+        )
+        self.search_url = reverse('search')
+
+    def test_search_ranks_title_matches_first(self):
+        response = self.client.get(self.search_url, {'q': 'django'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([r['id'] for r in response.data['results']], [self.django_post.pk, self.other_post.pk])
+        self.assertIn('<mark>', response.data['results'][0]['snippet'])
+
+    def test_search_stems_terms_and_covers_comments(self):
+        response = self.client.get(self.search_url, {'q': 'caching'})
+        self.assertEqual({(r['type'], r['id']) for r in response.data['results']},
+                         {('post', self.django_post.pk), ('comment', self.comment.pk)})
+        comment_hit = next(r for r in response.data['results'] if r['type'] == 'comment')
+        self.assertEqual(comment_hit['post'], self.other_post.pk)
+        response = self.client.get(self.search_url, {'q': 'caching', 'type': 'comment'})
+        self.assertEqual(response.data['count'], 1)
+
+    def test_search_requires_every_term_and_supports_prefixes(self):
+        response = self.client.get(self.search_url, {'q': 'django tomatoes'})
+        self.assertEqual([r['id'] for r in response.data['results']], [self.other_post.pk])
+        response = self.client.get(self.search_url, {'q': 'garden*'})
+        self.assertEqual([r['id'] for r in response.data['results']], [self.other_post.pk])
+
+    def test_query_syntax_is_not_interpreted(self):
+        response = self.client.get(self.search_url, {'q': 'django OR "NEAR( -tomatoes'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for params in ({'q': ''}, {'q': '"*'}, {'q': 'django', 'type': 'user'}):
+            response = self.client.get(self.search_url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_index_follows_updates_and_deletes(self):
+        self.client.patch(reverse('post-detail', kwargs={'pk': self.django_post.pk}),
+                        {'title': 'Flask performance', 'content': 'Nothing here.'})
+        self.assertEqual(self.client.get(self.search_url, {'q': 'django'}).data['count'], 1)
+        self.assertEqual(self.client.get(self.search_url, {'q': 'flask'}).data['count'], 1)
+        self.client.delete(reverse('comment-detail', kwargs={'pk': self.comment.pk}))
+        self.assertEqual(self.client.get(self.search_url, {'q': 'cached'}).data['count'], 0)
+        self.other_post.delete()
+        self.assertEqual(get_search_backend().count(parse_terms('tomatoes')), 0)
+
+    def test_search_query_count(self):
+        with self.assertNumQueries(4):
+            self.client.get(self.search_url, {'q': 'caching'})
+
+    def test_reindex_rebuilds_index(self):
+        get_search_backend().clear()
+        self.assertEqual(SearchResults(parse_terms('django')).count(), 0)
+        call_command('reindex_search', stdout=StringIO())
+        self.assertEqual(SearchResults(parse_terms('django')).count(), 2)
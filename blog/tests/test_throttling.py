@@ -0,0 +1,119 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from ..models import BlogPost
+from ..throttling import LocalThrottleStore, get_throttle_store, sliding_window, throttle_metrics, token_bucket
+
+CustomUser = get_user_model()
+
+
+def with_rates(**rates):
+    return override_settings(REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], **rates},
+    })
+
+
+class ThrottleAlgorithmTests(SimpleTestCase):
+
+    def test_token_bucket_allows_burst_then_refills(self):
+        state = None
+        results = []
+        for _ in range(4):
+            state, allowed, remaining, wait = token_bucket(state, 1000.0, 3, 60)
+            results.append((allowed, remaining))
+        self.assertEqual(results, [(True, 2), (True, 1), (True, 0), (False, 0)])
+        self.assertAlmostEqual(wait, 20.0)
+        state, allowed, _, _ = token_bucket(state, 1020.0, 3, 60)
+        self.assertTrue(allowed)
+
+    def test_sliding_window_weights_previous_window(self):
+        state = None
+        for _ in range(4):
+            state, allowed, _, _ = sliding_window(state, 1150.0, 4, 60)
+        self.assertTrue(allowed)
+        state, allowed, _, wait = sliding_window(state, 1150.0, 4, 60)
+        self.assertFalse(allowed)
+        state, allowed, _, _ = sliding_window(state, 1185.0, 4, 60)
+        self.assertFalse(allowed)
+        state, allowed, _, _ = sliding_window(state, 1225.0, 4, 60)
+        self.assertTrue(allowed)
+
+    def test_local_store_keeps_keys_apart(self):
+        store = LocalThrottleStore()
+        self.assertTrue(store.hit('a', 1, 60)[0])
+        self.assertFalse(store.hit('a', 1, 60)[0])
+        self.assertTrue(store.hit('b', 1, 60)[0])
+
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'blog.layers.LocalChannelLayer'}},
+    NOTIFICATION_OUTBOX={'BACKEND': 'local', 'MAX_SIZE': 1, 'BACKGROUND': False},
+)
+class ThrottleTests(APITestCase):
+
+    def setUp(self):
+        get_throttle_store().clear()
+        throttle_metrics.clear()
+        self.user = CustomUser.objects.create_user(username='throttled', password='testpassword')
+        self.other = CustomUser.objects.create_user(username='other', password='testpassword', email='other@example.com')
+        self.admin = CustomUser.objects.create_superuser(username='admin', password='testpassword', email='admin@example.com')
+        self.posts = [
+            BlogPost.objects.create(title=f'Post {i}', content='Body', author=self.other) for i in range(4)
+        ]
+
+    def like(self, post, user=None):
+        self.client.force_authenticate(user=user or self.user)
+        return self.client.post(reverse('like-post', kwargs={'pk': post.pk}))
+
+    @with_rates(likes='2/min')
+    def test_user_is_throttled_with_retry_after(self):
+        self.assertEqual(self.like(self.posts[0]).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.like(self.posts[1]).status_code, status.HTTP_201_CREATED)
+        response = self.like(self.posts[2])
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(self.like(self.posts[2], user=self.other).status_code, status.HTTP_201_CREATED)
+
+    @with_rates(likes_ip='3/min')
+    def test_ip_is_throttled_across_users(self):
+        self.like(self.posts[0])
+        self.like(self.posts[1])
+        self.like(self.posts[0], user=self.other)
+        self.assertEqual(self.like(self.posts[1], user=self.other).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @with_rates(comments='1/min')
+    def test_listing_comments_is_not_throttled(self):
+        self.client.force_authenticate(user=self.user)
+        data = {'post': self.posts[0].pk, 'content': 'Hello', 'author': self.user.pk}
+        for _ in range(3):
+            self.assertEqual(self.client.get(reverse('comment-list-create')).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.post(reverse('comment-list-create'), data, format='json').status_code,
+                         status.HTTP_201_CREATED)
+        self.assertEqual(self.client.post(reverse('comment-list-create'), data, format='json').status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @with_rates(likes='1/min')
+    def test_metrics_report_allowed_and_throttled_requests(self):
+        self.like(self.posts[0])
+        self.like(self.posts[1])
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get(reverse('throttle-metrics')).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(reverse('throttle-metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['algorithm'], 'token_bucket')
+        self.assertEqual(response.data['scopes']['likes'], {'allowed': 1, 'throttled': 1, 'rate': '1/min'})
+
+    @override_settings(THROTTLING={'BACKEND': 'local', 'ALGORITHM': 'sliding_window'})
+    @with_rates(register_ip='1/hour')
+    def test_registration_is_throttled_per_ip(self):
+        data = {'username': 'new', 'password': 'newpassword', 'email': 'new@example.com'}
+        self.assertEqual(self.client.post(reverse('register'), data, format='json').status_code,
+                         status.HTTP_201_CREATED)
+        data = {'username': 'newer', 'password': 'newpassword', 'email': 'newer@example.com'}
+        response = self.client.post(reverse('register'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
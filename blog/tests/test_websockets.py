@@ -0,0 +1,288 @@
+import json
+import os
+import subprocess
+import sys
+import msgpack
+from unittest import mock
+from asgiref.testing import ApplicationCommunicator
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from ..activity import get_post_activity_buffer
+from ..authentication import ClaimsRefreshToken
+from ..likes import apply_likes
+from ..consumers import NotificationConsumer
+from ..outbox import notification_event
+from ..middleware import JWTAuthMiddleware
+from ..models import BlogPost, Notification
+from ..routing import websocket_urlpatterns
+from ..throttling import get_throttle_store
+
+CustomUser = get_user_model()
+
+class AsgiApplicationTests(TestCase):
+
+    def test_asgi_module_imports_in_a_fresh_process(self):
+        # The test process has already set up Django, so the entry point is imported in a new one,
+        # as `daphne blog_project.asgi:application` does.
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'blog_project.settings'}
+        result = subprocess.run([sys.executable, '-c', 'import blog_project.asgi'],
+                                env=env, capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'blog.layers.LocalChannelLayer'}})
+class WebSocketAuthTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='testuser', password='testpassword', email='testuser@example.com')
+        self.token = str(ClaimsRefreshToken.for_user(self.user).access_token)
+        self.application = JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+    async def connect(self, subprotocols=(), query_string=b''):
+        communicator = ApplicationCommunicator(self.application, {
+            'type': 'websocket',
+            'path': '/ws/notifications/',
+            'query_string': query_string,
+            'headers': [],
+            'subprotocols': list(subprotocols),
+        })
+        await communicator.send_input({'type': 'websocket.connect'})
+        return communicator, await communicator.receive_output(timeout=1)
+
+    async def disconnect(self, communicator):
+        await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await communicator.wait(timeout=1)
+
+    async def test_connect_with_bearer_subprotocol(self):
+        communicator, message = await self.connect(subprotocols=['bearer', self.token])
+        self.assertEqual(message, {'type': 'websocket.accept', 'subprotocol': 'bearer'})
+        await get_channel_layer().group_send(f'notifications_{self.user.pk}', {
+            'type': 'send_notification',
+            'notification': {'message': 'Hello'},
+        })
+        message = await communicator.receive_output(timeout=1)
+        self.assertEqual(json.loads(message['text']), {'type': 'notification', 'message': 'Hello'})
+        await self.disconnect(communicator)
+
+    async def test_connect_with_query_string_token(self):
+        communicator, message = await self.connect(query_string=f'token={self.token}'.encode())
+        self.assertEqual(message['type'], 'websocket.accept')
+        self.assertIsNone(message['subprotocol'])
+        await self.disconnect(communicator)
+
+    async def test_connect_does_not_load_the_user(self):
+        await CustomUser.objects.filter(pk=self.user.pk).adelete()
+        communicator, message = await self.connect(subprotocols=['bearer', self.token])
+        self.assertEqual(message['type'], 'websocket.accept')
+        await self.disconnect(communicator)
+
+    async def test_reject_missing_or_invalid_token(self):
+        for options in ({}, {'subprotocols': ['bearer', 'invalid']}, {'query_string': b'token=invalid'}):
+            communicator, message = await self.connect(**options)
+            self.assertEqual(message['type'], 'websocket.close')
+            await communicator.wait(timeout=1)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'blog.layers.LocalChannelLayer'}})
+class WebSocketProtocolTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username='testuser', password='testpassword', email='testuser@example.com')
+        self.token = str(ClaimsRefreshToken.for_user(self.user).access_token)
+        self.notifications = [Notification.objects.create(user=self.user, message=f'Notification {i}') for i in range(5)]
+        self.application = JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+    async def connect(self):
+        communicator = ApplicationCommunicator(self.application, {
+            'type': 'websocket',
+            'path': '/ws/notifications/',
+            'query_string': b'',
+            'headers': [],
+            'subprotocols': ['bearer', self.token],
+        })
+        await communicator.send_input({'type': 'websocket.connect'})
+        self.assertEqual((await communicator.receive_output(timeout=1))['type'], 'websocket.accept')
+        return communicator
+
+    async def request(self, communicator, message):
+        await communicator.send_input({'type': 'websocket.receive', 'text': json.dumps(message)})
+        return json.loads((await communicator.receive_output(timeout=1))['text'])
+
+    async def close(self, communicator):
+        await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await communicator.wait(timeout=1)
+
+    async def test_ping(self):
+        communicator = await self.connect()
+        self.assertEqual(await self.request(communicator, {'type': 'ping', 'ts': 42}), {'type': 'pong', 'ts': 42})
+        await self.close(communicator)
+
+    async def test_resume_replays_missed_notifications(self):
+        communicator = await self.connect()
+        reply = await self.request(communicator, {'type': 'resume', 'after': self.notifications[2].id})
+        self.assertEqual(reply['type'], 'replay')
+        self.assertEqual([n['id'] for n in reply['notifications']], [n.id for n in self.notifications[3:]])
+        self.assertEqual(reply['cursor'], self.notifications[-1].id)
+        self.assertTrue(reply['complete'])
+        self.assertEqual(reply['unread'], 5)
+        await self.close(communicator)
+
+    async def test_resume_is_limited(self):
+        communicator = await self.connect()
+        with mock.patch.object(NotificationConsumer, 'replay_limit', 2):
+            reply = await self.request(communicator, {'type': 'resume', 'after': 0})
+        self.assertEqual([n['id'] for n in reply['notifications']], [n.id for n in self.notifications[:2]])
+        self.assertFalse(reply['complete'])
+        self.assertEqual(reply['cursor'], self.notifications[1].id)
+        await self.close(communicator)
+
+    async def test_resume_from_acknowledged_cursor(self):
+        communicator = await self.connect()
+        await communicator.send_input({'type': 'websocket.receive', 'text': json.dumps({'type': 'ack', 'id': self.notifications[3].id})})
+        await self.close(communicator)
+        communicator = await self.connect()
+        reply = await self.request(communicator, {'type': 'resume'})
+        self.assertEqual([n['id'] for n in reply['notifications']], [self.notifications[4].id])
+        await self.close(communicator)
+
+    async def test_resume_without_cursor(self):
+        communicator = await self.connect()
+        reply = await self.request(communicator, {'type': 'resume'})
+        self.assertEqual(reply, {'type': 'replay', 'notifications': [], 'cursor': None, 'complete': False})
+        await self.close(communicator)
+
+    async def test_invalid_messages(self):
+        communicator = await self.connect()
+        await communicator.send_input({'type': 'websocket.receive', 'text': 'not json'})
+        self.assertEqual(json.loads((await communicator.receive_output(timeout=1))['text'])['type'], 'error')
+        self.assertEqual((await self.request(communicator, {'type': 'subscribe'}))['type'], 'error')
+        self.assertEqual((await self.request(communicator, {'type': 'ack', 'id': 'x'}))['type'], 'error')
+        await self.close(communicator)
+
+    async def test_msgpack_subprotocol(self):
+        communicator = ApplicationCommunicator(self.application, {
+            'type': 'websocket',
+            'path': '/ws/notifications/',
+            'query_string': b'',
+            'headers': [],
+            'subprotocols': ['msgpack', 'bearer', self.token],
+        })
+        await communicator.send_input({'type': 'websocket.connect'})
+        self.assertEqual(await communicator.receive_output(timeout=1), {'type': 'websocket.accept', 'subprotocol': 'msgpack'})
+        await communicator.send_input({'type': 'websocket.receive', 'bytes': msgpack.packb({'type': 'ping'})})
+        self.assertEqual(msgpack.unpackb((await communicator.receive_output(timeout=1))['bytes']), {'type': 'pong'})
+        notification = self.notifications[0]
+        await get_channel_layer().group_send(f'notifications_{self.user.pk}', notification_event(notification))
+        message = msgpack.unpackb((await communicator.receive_output(timeout=1))['bytes'], timestamp=3)
+        self.assertEqual(message['id'], notification.id)
+        self.assertEqual(message['created_at'], notification.created_at)
+        await self.close(communicator)
+
+    async def test_pushed_frames_are_shared(self):
+        communicator = await self.connect()
+        event = notification_event(self.notifications[0])
+        await get_channel_layer().group_send(f'notifications_{self.user.pk}', event)
+        message = await communicator.receive_output(timeout=1)
+        self.assertEqual(message['text'], event['frames']['json'])
+        self.assertEqual(json.loads(message['text'])['type'], 'notification')
+        await self.close(communicator)
+
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'blog.layers.LocalChannelLayer'}},
+    NOTIFICATION_OUTBOX={'BACKEND': 'local', 'MAX_SIZE': 1000, 'BACKGROUND': False},
+    POST_ACTIVITY={'BACKEND': 'local', 'MAX_SIZE': 1000, 'MAX_AGE': 60, 'BACKGROUND': False},
+    POST_VIEW_BUFFER={'BACKEND': 'local', 'MAX_SIZE': 1, 'BACKGROUND': False},
+)
+class PostActivityTests(TestCase):
+
+    def setUp(self):
+        get_throttle_store().clear()
+        self.user = CustomUser.objects.create_user(username='testuser', password='testpassword', email='testuser@example.com')
+        self.blog_post = BlogPost.objects.create(title='Hot post', content='Content', author=self.user)
+        self.application = JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+    async def watch(self, post_id):
+        communicator = ApplicationCommunicator(self.application, {
+            'type': 'websocket',
+            'path': f'/ws/posts/{post_id}/',
+            'query_string': b'',
+            'headers': [],
+            'subprotocols': [],
+        })
+        await communicator.send_input({'type': 'websocket.connect'})
+        return communicator, await communicator.receive_output(timeout=1)
+
+    async def close(self, communicator):
+        await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await communicator.wait(timeout=1)
+
+    def comment_and_like(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            for content in ('First', 'Second'):
+                client.post(reverse('comment-list-create'), {'post': self.blog_post.pk, 'content': content, 'author': self.user.pk}, format='json')
+            client.post(reverse('like-post', kwargs={'pk': self.blog_post.pk}))
+            client.get(reverse('post-detail', kwargs={'pk': self.blog_post.pk}))
+        return get_post_activity_buffer().flush()
+
+    async def test_snapshot_on_connect(self):
+        communicator, message = await self.watch(self.blog_post.pk)
+        self.assertEqual(message['type'], 'websocket.accept')
+        message = json.loads((await communicator.receive_output(timeout=1))['text'])
+        self.assertIsNotNone(message.pop('at'))
+        self.assertEqual(message, {'type': 'snapshot', 'post': self.blog_post.pk,
+                                   'like_count': 0, 'comment_count': 0, 'view_count': 0})
+        await self.close(communicator)
+
+    async def test_unknown_post_is_rejected(self):
+        communicator, message = await self.watch(self.blog_post.pk + 100)
+        self.assertEqual(message, {'type': 'websocket.close', 'code': 4404})
+        await communicator.wait(timeout=1)
+
+    async def test_activity_is_batched_per_post(self):
+        communicator, _ = await self.watch(self.blog_post.pk)
+        await communicator.receive_output(timeout=1)
+        self.assertEqual(await database_sync_to_async(self.comment_and_like)(), 6)
+        message = json.loads((await communicator.receive_output(timeout=1))['text'])
+        self.assertEqual(message['type'], 'activity')
+        self.assertEqual([comment['content'] for comment in message['comments']], ['First', 'Second'])
+        self.assertEqual(message['deltas'], {'comment_count': 2, 'like_count': 1, 'view_count': 1})
+        self.assertEqual(message['counts'], {'like_count': 1, 'comment_count': 2, 'view_count': 1})
+        self.assertTrue(await communicator.receive_nothing())
+        await self.close(communicator)
+
+    def comment_and_like_unflushed(self):
+        with mock.patch.object(get_post_activity_buffer(), 'flush', return_value=0):
+            return self.comment_and_like()
+
+    async def test_snapshot_taken_before_flush_is_not_double_counted(self):
+        await database_sync_to_async(self.comment_and_like_unflushed)()
+        communicator, _ = await self.watch(self.blog_post.pk)
+        snapshot = json.loads((await communicator.receive_output(timeout=1))['text'])
+        self.assertEqual(snapshot['like_count'], 1)
+        self.assertEqual(await database_sync_to_async(get_post_activity_buffer().flush)(), 6)
+        message = json.loads((await communicator.receive_output(timeout=1))['text'])
+        self.assertEqual(message['deltas']['like_count'], 1)
+        self.assertGreaterEqual(message['at'], snapshot['at'])
+        self.assertEqual(message['counts'], {field: snapshot[field] for field in ('like_count', 'comment_count', 'view_count')})
+        await self.close(communicator)
+
+    def roll_back_like(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(DatabaseError), transaction.atomic():
+                apply_likes(self.user.pk, liked=[self.blog_post.pk])
+                raise DatabaseError
+        return get_post_activity_buffer().flush()
+
+    async def test_rolled_back_activity_is_not_streamed(self):
+        self.assertEqual(await database_sync_to_async(self.roll_back_like)(), 0)
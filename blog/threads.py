@@ -0,0 +1,76 @@
+from collections import deque
+from .models import Comment
+
+THREAD_FIELDS = ('id', 'post', 'author', 'content', 'parent', 'created_at', 'updated_at')
+
+
+def fetch_thread_comments(root_ids):
+    """
+    Fetches every reply in the given threads with a single query.
+
+    Args:
+        root_ids (list): The ids of the top-level comments whose threads are fetched.
+
+    Returns:
+        list: One dict per reply, ordered by creation time.
+    """
+    if not root_ids:
+        return []
+    return list(Comment.objects.filter(root_id__in=root_ids)
+                .order_by('created_at', 'id')
+                .values(*THREAD_FIELDS))
+
+
+def build_comment_tree(roots, replies, max_depth=None):
+    """
+    Assembles comment threads in memory in O(n) without recursion.
+
+    Every node gets a `replies` list and a `reply_count` of its direct replies. Nodes deeper than
+    `max_depth` are left out; their parent keeps its `reply_count` so clients can fetch the rest
+    of the thread on demand.
+
+    Args:
+        roots (list): The top-level comments as dicts, in display order.
+        replies (list): The replies in those threads as dicts, ordered by creation time.
+        max_depth (int): The number of reply levels to include, or None for the whole thread.
+
+    Returns:
+        list: The root nodes with their nested replies.
+    """
+    children = {}
+    for reply in replies:
+        children.setdefault(reply['parent'], []).append(reply)
+
+    queue = deque((root, 0) for root in roots)
+    while queue:
+        node, depth = queue.popleft()
+        node_children = children.get(node['id'], [])
+        node['reply_count'] = len(node_children)
+        if max_depth is not None and depth >= max_depth:
+            node['replies'] = []
+            continue
+        node['replies'] = node_children
+        queue.extend((child, depth + 1) for child in node_children)
+    return roots
+
+
+def subtree_ids(comment):
+    """
+    Returns the ids of a comment and of all of its descendants.
+
+    A top-level comment's descendants are found through the `root` column with one query; a reply's
+    are walked level by level through `parent`.
+
+    Args:
+        comment (Comment): The comment.
+
+    Returns:
+        list: The comment ids.
+    """
+    if comment.parent_id is None:
+        return [comment.pk, *Comment.objects.filter(root_id=comment.pk).values_list('pk', flat=True)]
+    ids = level = [comment.pk]
+    while level:
+        level = list(Comment.objects.filter(parent_id__in=level).values_list('pk', flat=True))
+        ids = ids + level
+    return ids
@@ -0,0 +1,433 @@
+import functools
+import threading
+import time
+from collections import Counter
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+DEFAULT_CONFIG = {
+    'BACKEND': 'local',
+    'URL': 'redis://127.0.0.1:6379/0',
+    'ALGORITHM': 'token_bucket',
+    'MAX_KEYS': 100000,
+}
+ALGORITHMS = ('token_bucket', 'sliding_window')
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+@functools.lru_cache(maxsize=None)
+def parse_rate(rate):
+    """
+    Parses a DRF rate string such as `'60/min'`.
+
+    Args:
+        rate (str): The number of requests and the period (`s`, `m`, `h` or `d`, possibly spelled out).
+
+    Returns:
+        tuple: The number of requests and the period in seconds.
+    """
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+def token_bucket(state, now, limit, period):
+    """
+    Applies one request to a token bucket holding up to `limit` tokens, refilled continuously at
+    `limit / period` tokens per second, so bursts up to the limit are allowed.
+
+    Args:
+        state (list): `[tokens, updated_at]`, or None for a new bucket. Updated in place.
+        now (float): The current time in seconds.
+        limit (int): The bucket capacity.
+        period (int): Seconds to refill an empty bucket.
+
+    Returns:
+        tuple: The new state, whether the request is allowed, the remaining tokens and the
+            seconds until the next token.
+    """
+    refill = limit / period
+    if state is None:
+        state = [float(limit), now]
+    tokens = min(float(limit), state[0] + (now - state[1]) * refill)
+    if tokens >= 1:
+        state[:] = [tokens - 1, now]
+        return state, True, int(tokens - 1), 0.0
+    state[:] = [tokens, now]
+    return state, False, 0, (1 - tokens) / refill
+
+
+def sliding_window(state, now, limit, period):
+    """
+    Applies one request to a sliding window counter: the count of the current fixed window plus
+    the previous window's count weighted by how much of it still overlaps the sliding window.
+
+    Args:
+        state (list): `[window, current, previous]`, or None for a new counter. Updated in place.
+        now (float): The current time in seconds.
+        limit (int): The number of requests allowed per period.
+        period (int): The window length in seconds.
+
+    Returns:
+        tuple: The new state, whether the request is allowed, the remaining requests and the
+            seconds until a request would be allowed.
+    """
+    window = int(now // period)
+    if state is None or state[0] < window - 1:
+        state = [window, 0, 0]
+    elif state[0] == window - 1:
+        state[:] = [window, 0, state[1]]
+    elapsed = now - window * period
+    weight = 1 - elapsed / period
+    estimate = state[2] * weight + state[1]
+    if estimate + 1 <= limit:
+        state[1] += 1
+        return state, True, int(limit - estimate - 1), 0.0
+    if state[2] and state[1] + 1 <= limit:
+        retry = period * (1 - (limit - 1 - state[1]) / state[2]) - elapsed
+    else:
+        retry = period - elapsed
+    return state, False, 0, max(retry, 0.0)
+
+
+class LocalThrottleStore:
+    """
+    In-process throttle store keeping one small state list per key in a dict guarded by a lock.
+
+    A request costs one dict lookup and a few float operations. When the store grows past
+    `max_keys`, keys idle for longer than their period are swept, at most once a second. Limits
+    apply per worker.
+
+    Attributes:
+        max_keys (int): The number of keys above which idle keys are swept.
+
+    Methods:
+        hit(key, limit, period, algorithm): Applies one request to a key.
+        clear(): Drops every key.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._states = {}
+        self._swept_at = 0.0
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, period, algorithm='token_bucket'):
+        """
+        Applies one request to a key.
+
+        Args:
+            key (str): The throttle key, e.g. `throttle:likes:user:1`.
+            limit (int): The number of requests allowed per period.
+            period (int): The period in seconds.
+            algorithm (str): `'token_bucket'` or `'sliding_window'`.
+
+        Returns:
+            tuple: Whether the request is allowed, the remaining requests and the seconds to wait.
+        """
+        apply = token_bucket if algorithm == 'token_bucket' else sliding_window
+        now = time.time()
+        with self._lock:
+            entry = self._states.get(key)
+            state, allowed, remaining, wait = apply(entry[0] if entry else None, now, limit, period)
+            self._states[key] = (state, now + period)
+            if len(self._states) > self.max_keys and now - self._swept_at >= 1:
+                self._states = {k: v for k, v in self._states.items() if v[1] > now}
+                self._swept_at = now
+        return allowed, remaining, wait
+
+    def clear(self):
+        """
+        Drops every key.
+        """
+        with self._lock:
+            self._states.clear()
+
+
+TOKEN_BUCKET_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local limit = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local refill = limit / period
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or limit
+local ts = tonumber(state[2]) or now
+tokens = math.min(limit, tokens + (now - ts) * refill)
+local allowed, wait = 0, 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / refill
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(period))
+return {allowed, math.floor(tokens), tostring(wait)}
+"""
+
+SLIDING_WINDOW_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local limit = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local window = math.floor(now / period)
+local elapsed = now - window * period
+local current_key = KEYS[1] .. ':' .. window
+local current = tonumber(redis.call('GET', current_key)) or 0
+local previous = tonumber(redis.call('GET', KEYS[1] .. ':' .. (window - 1))) or 0
+local estimate = previous * (1 - elapsed / period) + current
+if estimate + 1 <= limit then
+    redis.call('INCR', current_key)
+    redis.call('EXPIRE', current_key, math.ceil(2 * period))
+    return {1, math.floor(limit - estimate - 1), '0'}
+end
+local wait = period - elapsed
+if previous > 0 and current + 1 <= limit then
+    wait = period * (1 - (limit - 1 - current) / previous) - elapsed
+end
+return {0, 0, tostring(math.max(wait, 0))}
+"""
+
+
+class RedisThrottleStore:
+    """
+    Throttle store backed by Redis, shared by every worker that points at the same server.
+
+    Each request runs one Lua script, so reading and updating a key is atomic across workers and
+    costs a single round-trip. The scripts read the clock from Redis, so workers with skewed
+    clocks agree on the state of a key, and keys expire once idle for their period.
+
+    Methods:
+        hit(key, limit, period, algorithm): Applies one request to a key.
+        clear(): Drops every throttle key.
+    """
+
+    def __init__(self, url='redis://127.0.0.1:6379/0', client=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.scripts = {
+            'token_bucket': client.register_script(TOKEN_BUCKET_SCRIPT),
+            'sliding_window': client.register_script(SLIDING_WINDOW_SCRIPT),
+        }
+
+    def hit(self, key, limit, period, algorithm='token_bucket'):
+        """
+        Applies one request to a key.
+
+        Args:
+            key (str): The throttle key.
+            limit (int): The number of requests allowed per period.
+            period (int): The period in seconds.
+            algorithm (str): `'token_bucket'` or `'sliding_window'`.
+
+        Returns:
+            tuple: Whether the request is allowed, the remaining requests and the seconds to wait.
+        """
+        allowed, remaining, wait = self.scripts[algorithm](keys=[key], args=[limit, period])
+        return bool(allowed), int(remaining), float(wait)
+
+    def clear(self):
+        """
+        Drops every throttle key.
+        """
+        for key in self.client.scan_iter(match='throttle:*'):
+            self.client.delete(key)
+
+
+class ThrottleMetrics:
+    """
+    In-process counters of allowed and throttled requests per throttle scope.
+
+    Methods:
+        record(scope, allowed): Counts one request.
+        snapshot(): Returns the counters.
+        clear(): Resets the counters.
+    """
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, scope, allowed):
+        """
+        Counts one request.
+
+        Args:
+            scope (str): The throttle scope, e.g. `likes_ip`.
+            allowed (bool): Whether the request was allowed.
+        """
+        with self._lock:
+            self._counts[scope, allowed] += 1
+
+    def snapshot(self):
+        """
+        Returns the counters.
+
+        Returns:
+            dict: A mapping of scope to its `allowed` and `throttled` counts.
+        """
+        with self._lock:
+            counts = dict(self._counts)
+        scopes = {}
+        for (scope, allowed), count in sorted(counts.items()):
+            scopes.setdefault(scope, {'allowed': 0, 'throttled': 0})['allowed' if allowed else 'throttled'] = count
+        return scopes
+
+    def clear(self):
+        """
+        Resets the counters.
+        """
+        with self._lock:
+            self._counts.clear()
+
+
+throttle_metrics = ThrottleMetrics()
+_store = None
+
+
+def get_config():
+    """
+    Returns the `THROTTLING` setting merged over the defaults.
+
+    Returns:
+        dict: The configuration.
+    """
+    return {**DEFAULT_CONFIG, **getattr(settings, 'THROTTLING', {})}
+
+
+def get_throttle_store():
+    """
+    Returns the process-wide throttle store, built from the `THROTTLING` setting.
+
+    Returns:
+        LocalThrottleStore | RedisThrottleStore: The configured store.
+    """
+    global _store
+    if _store is None:
+        config = get_config()
+        if config['ALGORITHM'] not in ALGORITHMS:
+            raise ValueError(f"Unknown throttling algorithm: {config['ALGORITHM']}")
+        if config['BACKEND'] == 'local':
+            _store = LocalThrottleStore(max_keys=config['MAX_KEYS'])
+        elif config['BACKEND'] == 'redis':
+            _store = RedisThrottleStore(url=config['URL'])
+        else:
+            raise ValueError(f"Unknown throttling backend: {config['BACKEND']}")
+    return _store
+
+
+@receiver(setting_changed)
+def reset_throttle_store(setting, **kwargs):
+    """
+    Drops the cached store when `THROTTLING` is overridden, e.g. in tests.
+    """
+    global _store
+    if setting == 'THROTTLING':
+        _store = None
+
+
+def get_metrics():
+    """
+    Returns the throttling configuration and this worker's counters.
+
+    Returns:
+        dict: The `backend` and `algorithm` in use, and for each scope that has counted requests,
+            its `rate` and its `allowed` and `throttled` counts.
+    """
+    config = get_config()
+    scopes = throttle_metrics.snapshot()
+    for name, counts in scopes.items():
+        counts['rate'] = api_settings.DEFAULT_THROTTLE_RATES.get(name)
+    return {'backend': config['BACKEND'], 'algorithm': config['ALGORITHM'], 'scopes': scopes}
+
+
+class ScopedThrottle(BaseThrottle):
+    """
+    Base throttle limiting requests per endpoint scope and per identity.
+
+    The scope is the class's `scope` or the view's `throttle_scope`; the rate is looked up in
+    `DEFAULT_THROTTLE_RATES` under the scope followed by `rate_suffix`, so one endpoint can have
+    separate per-user and per-IP limits. Views without a scope or scopes without a rate are not
+    throttled and cost nothing. Requests are counted by the algorithm in the `THROTTLING` setting,
+    token bucket by default, and throttled responses carry a `Retry-After` header.
+
+    Attributes:
+        scope (str): A fixed scope, or None to use the view's `throttle_scope`.
+        rate_suffix (str): Appended to the scope to name the rate.
+
+    Methods:
+        get_ident_key(request): Returns the identity requests are counted against.
+        allow_request(request, view): Returns whether the request is allowed.
+        wait(): Returns the seconds until the next request is allowed.
+    """
+    scope = None
+    rate_suffix = ''
+
+    def get_ident_key(self, request):
+        """
+        Returns the identity requests are counted against, or None to skip throttling.
+        """
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        scope = self.scope or getattr(view, 'throttle_scope', None)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(f'{scope}{self.rate_suffix}') if scope else None
+        if rate is None:
+            return True
+        ident = self.get_ident_key(request)
+        if ident is None:
+            return True
+        limit, period = parse_rate(rate)
+        name = f'{scope}{self.rate_suffix}'
+        allowed, _, wait = get_throttle_store().hit(
+            f'throttle:{name}:{ident}', limit, period, get_config()['ALGORITHM'],
+        )
+        throttle_metrics.record(name, allowed)
+        if not allowed:
+            self.wait_seconds = wait
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class ScopedUserThrottle(ScopedThrottle):
+    """
+    Limits requests per authenticated user at the scope's rate, or per IP for anonymous requests.
+    """
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+
+class ScopedIPThrottle(ScopedThrottle):
+    """
+    Limits requests per client IP at the `<scope>_ip` rate, across all users behind the address.
+    """
+    rate_suffix = '_ip'
+
+    def get_ident_key(self, request):
+        return f'ip:{self.get_ident(request)}'
+
+
+class ScopedAccountThrottle(ScopedThrottle):
+    """
+    Limits requests per submitted username at the `<scope>_account` rate, so guessing one
+    account's password from many addresses is throttled too. Requests without a username are not
+    counted.
+    """
+    rate_suffix = '_account'
+
+    def get_ident_key(self, request):
+        username = request.data.get('username') if hasattr(request.data, 'get') else None
+        if not isinstance(username, str) or not username:
+            return None
+        return f'account:{username.strip().lower()}'
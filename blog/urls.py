@@ -1,28 +1,37 @@
 from django.urls import path
-from .views import (RegisterView, LoginView, LogoutView, 
+from .views import (RegisterView, LoginView, LogoutView, RefreshTokenView,
                     PasswordResetView, PasswordResetConfirmView, 
                     TOTPDeviceView, BlogPostListCreateView, 
                     BlogPostRetrieveUpdateDestroyView,
                     CommentListCreateView, CommentRetrieveUpdateDestroyView,
-                    LikePostView, UnlikePostView, AnalyticsView,
+                    PostCommentThreadView,
+                    LikePostView, UnlikePostView, LikeBatchView, SearchView, AnalyticsView, ThrottleMetricsView,
                     NotificationListView, MarkNotificationAsReadView, 
+                    MarkNotificationsReadView, UnreadNotificationCountView,
                     NotificationPreferenceView)
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
+    path('token/refresh/', RefreshTokenView.as_view(), name='token-refresh'),
     path('password_reset/', PasswordResetView.as_view(), name='password_reset'),
     path('password_reset/confirm/', PasswordResetConfirmView.as_view(), name='password_reset_confirm'),
     path('totp/', TOTPDeviceView.as_view(), name='totp'),
     path('posts/', BlogPostListCreateView.as_view(), name='post-list-create'),
     path('posts/<int:pk>/', BlogPostRetrieveUpdateDestroyView.as_view(), name='post-detail'),
+    path('posts/<int:pk>/comments/', PostCommentThreadView.as_view(), name='post-comment-threads'),
     path('comments/', CommentListCreateView.as_view(), name='comment-list-create'),
     path('comments/<int:pk>/', CommentRetrieveUpdateDestroyView.as_view(), name='comment-detail'),
     path('posts/<int:pk>/like/', LikePostView.as_view(), name='like-post'),
     path('posts/<int:pk>/unlike/', UnlikePostView.as_view(), name='unlike-post'),
+    path('likes/batch/', LikeBatchView.as_view(), name='like-batch'),
+    path('search/', SearchView.as_view(), name='search'),
     path('analytics/', AnalyticsView.as_view(), name='analytics'),
+    path('throttling/metrics/', ThrottleMetricsView.as_view(), name='throttle-metrics'),
     path('notifications/', NotificationListView.as_view(), name='notification-list'),
+    path('notifications/read/', MarkNotificationsReadView.as_view(), name='notifications-mark-read'),
+    path('notifications/unread-count/', UnreadNotificationCountView.as_view(), name='notification-unread-count'),
     path('notifications/<int:pk>/read/', MarkNotificationAsReadView.as_view(), name='mark-notification-read'),
     path('notification-preferences/', NotificationPreferenceView.as_view(), name='notification-preferences'),
 ]
\ No newline at end of file
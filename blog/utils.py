@@ -1,48 +1,47 @@
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-from .models import Notification
+from .outbox import get_notification_outbox
 
-def send_notification(user, message):
+def send_notification(user, message, key=None, summary=None):
     """
-    Sends a real-time notification to a specific user via WebSocket, if the channel layer is configured, 
-    and creates a Notification record in the database.
+    Queues a notification for a user. The Notification record is created and pushed to the user's
+    WebSocket group when the notification outbox is flushed, off the request path, according to
+    the user's NotificationPreference: no row and no push if both push and email notifications
+    are disabled, and no push if push notifications are disabled.
 
     Args:
         user (CustomUser): The user to whom the notification will be sent.
         message (str): The notification message.
+        key (str): Optional coalescing key. Notifications to the same user with the same key that are
+            flushed together are merged into one.
+        summary (str): The message of a merged notification, with a `{count}` placeholder,
+            e.g. '{count} new comments on your post'.
 
     Workflow:
-        1. Creates a Notification instance for the user.
-        2. Checks if the channel layer is configured.
-        3. Sends a message to the WebSocket group associated with the user if the channel layer is available.
+        1. Appends the notification to the outbox (see `blog.outbox.NotificationOutbox`).
+        2. On flush, recipients' preferences are read in bulk through `blog.preferences.preference_cache`.
+        3. Bursts sharing a key are coalesced and all rows are created with one `bulk_create`.
+        4. Each created notification is sent to the `notifications_<user_id>` WebSocket group of users
+           with push notifications enabled.
 
     WebSocket Message Format:
         - type: 'send_notification' (the method to invoke on the WebSocket consumer).
-        - notification: A dictionary containing the notification details.
+        - frames: The notification message encoded once as JSON and as msgpack, sent as is by every
+          socket in the group (see `blog.frames`).
     """
-    # Create a Notification instance in the database
-    notification = Notification.objects.create(user=user, message=message)
-
-    # Get the channel layer for WebSocket communication
-    channel_layer = get_channel_layer()
-
-    # Check if the channel layer is configured
-    if channel_layer is not None:
-        # Send the notification to the WebSocket group
-        async_to_sync(channel_layer.group_send)(
-            f'notifications_{user.id}',  # Group name based on user ID
-            {
-                'type': 'send_notification',  # WebSocket consumer method to invoke
-                'notification': {
-                    'id': notification.id,
-                    'message': notification.message,
-                    'is_read': notification.is_read,
-                    'created_at': str(notification.created_at),  # Convert datetime to string
-                }
-            }
-        )
-
-
+    get_notification_outbox().enqueue(user.id, message, key=key, summary=summary)
 
 
+def send_notifications(users, message, key=None, summary=None):
+    """
+    Queues the same notification for many users with a single outbox write. Recipients' preferences
+    are looked up in bulk when the outbox is flushed, so users who opted out cost no Notification
+    row and no WebSocket push.
 
+    Args:
+        users (iterable): The users to whom the notification will be sent.
+        message (str): The notification message.
+        key (str): Optional coalescing key, as for `send_notification`.
+        summary (str): The message of a merged notification, with a `{count}` placeholder.
+    """
+    items = [[user.id, message, key, summary] for user in users]
+    if items:
+        get_notification_outbox().add(*items)
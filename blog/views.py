@@ -1,21 +1,38 @@
+from datetime import timedelta
 from rest_framework import generics, status, views
 from django.contrib.auth import get_user_model
 from rest_framework.response import Response
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly, IsAdminUser
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from rest_framework.decorators import api_view
-from django.contrib.auth import authenticate
-from rest_framework_simplejwt.tokens import RefreshToken
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework_simplejwt.views import TokenRefreshView
+from .authentication import ClaimsRefreshToken
+from .hashers import aauthenticate
 from django_rest_passwordreset.views import ResetPasswordRequestToken, ResetPasswordConfirm
 from django_otp.plugins.otp_totp.models import TOTPDevice
-from django.core.cache import cache
 from .utils import send_notification
+from .outbox import get_unread_count_buffer
+from .activity import publish_comment
+from .cache import post_page_cache, post_detail_cache
+from .counters import adjust_counter, adjust_unread, get_unread_count, record_view
+from .rollups import GRANULARITIES, METRICS, adjust_total, day_bounds, get_series, get_totals
+from .sketches import estimate_unique_viewers
+from .throttling import ScopedAccountThrottle, ScopedIPThrottle, get_metrics as get_throttle_metrics
+from .likes import apply_like_operations, overlay_pending_likes, write_likes
+from .search import KINDS, SearchResults, parse_terms, remove_comments
+from .threads import THREAD_FIELDS, build_comment_tree, fetch_thread_comments, subtree_ids
 from .models import (BlogPost, Comment, Like, 
                      PostView, Notification, NotificationPreference)
-from .serializers import (UserSerializer, LoginSerializer, TOTPDeviceSerializer, 
-                          BlogPostSerializer, CommentSerializer,
+from .serializers import (UserSerializer, LoginSerializer, RefreshTokenSerializer, TOTPDeviceSerializer, 
+                          BlogPostSerializer, BlogPostDetailSerializer, CommentSerializer,
                            LikeSerializer, PostViewSerializer,
-                           NotificationSerializer, NotificationPreferenceSerializer)
+                           NotificationSerializer, MarkNotificationsReadSerializer, LikeBatchSerializer,
+                           NotificationPreferenceSerializer)
 
 class RegisterView(generics.CreateAPIView):
     """
@@ -25,21 +42,56 @@ class RegisterView(generics.CreateAPIView):
         queryset: All user instances.
         serializer_class: Serializer used for user creation.
         permission_classes: Allows public access.
+        throttle_scope: Rate limits registrations per client IP (`register_ip`).
     """
     queryset = get_user_model().objects.all()
     serializer_class = UserSerializer
     permission_classes = [AllowAny]
+    throttle_scope = 'register'
 
 class LoginView(views.APIView):
     """
     View to handle user login and provide JWT tokens.
+
+    Attempts are rate limited per client IP and per username before any password is hashed, and
+    the password check runs in the bounded hashing pool of `blog.hashers.PooledModelBackend`.
+
+    The view is async: DRF's request setup (authentication, permissions and throttles) and the
+    token issue run in a worker thread as usual, but the password check awaits the hashing pool,
+    so under ASGI slow hashes do not tie up the thread that runs the sync views. Under WSGI Django
+    runs the view in its own event loop.
     
     Methods:
+        dispatch(request): Runs the handler, awaiting it if it is async.
         post(request): Authenticates user and returns JWT tokens.
     """
     permission_classes = [AllowAny]
+    throttle_classes = [ScopedIPThrottle, ScopedAccountThrottle]
+    throttle_scope = 'login'
+    view_is_async = True
 
-    def post(self, request, *args, **kwargs):
+    async def dispatch(self, request, *args, **kwargs):
+        """
+        Async version of `APIView.dispatch`; sync handlers, such as OPTIONS, run in a thread.
+        """
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            if iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def post(self, request, *args, **kwargs):
         """
         Authenticates the user and provides access and refresh tokens.
         
@@ -51,15 +103,22 @@ class LoginView(views.APIView):
         """
         serializer = LoginSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        user = authenticate(username=serializer.validated_data['username'], password=serializer.validated_data['password'])
+        user = await aauthenticate(username=serializer.validated_data['username'], password=serializer.validated_data['password'])
         if user:
-            refresh = RefreshToken.for_user(user)
-            return Response({
-                'refresh': str(refresh),
-                'access': str(refresh.access_token),
-            })
+            return Response(await sync_to_async(self.issue_tokens)(user))
         return Response({"detail": "Invalid credentials"}, status=status.HTTP_401_UNAUTHORIZED)
 
+    def issue_tokens(self, user):
+        """
+        Returns a new refresh token and its access token for the user; the refresh token is
+        recorded as outstanding for the blacklist.
+        """
+        refresh = ClaimsRefreshToken.for_user(user)
+        return {
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
+        }
+
 class LogoutView(views.APIView):
     """
     View to handle user logout by blacklisting the refresh token.
@@ -83,12 +142,25 @@ class LogoutView(views.APIView):
             refresh_token = request.data.get("refresh")
             if not refresh_token:
                 return Response({"detail": "Refresh token is required"}, status=status.HTTP_400_BAD_REQUEST)
-            token = RefreshToken(refresh_token)
+            token = ClaimsRefreshToken(refresh_token)
             token.blacklist()
             return Response(status=status.HTTP_205_RESET_CONTENT)
         except Exception as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+class RefreshTokenView(TokenRefreshView):
+    """
+    View to exchange a refresh token for a new access token.
+
+    With `ROTATE_REFRESH_TOKENS` and `BLACKLIST_AFTER_ROTATION`, the submitted refresh token is
+    blacklisted and a new one is returned. Tokens are checked against the blacklist filter first,
+    so a token that was never blacklisted costs no blacklist lookup.
+
+    Attributes:
+        serializer_class: Serializer used for validating the refresh token and issuing new tokens.
+    """
+    serializer_class = RefreshTokenSerializer
+
 class PasswordResetView(ResetPasswordRequestToken):
     """
     View to request a password reset token.
@@ -132,45 +204,153 @@ class TOTPDeviceView(generics.ListCreateAPIView):
         """
         serializer.save(user=self.request.user)
 
-class BlogPostPagination(PageNumberPagination):
+class KeysetPagination(CursorPagination):
     """
-    Custom pagination for blog posts.
+    Keyset (cursor) pagination on `(created_at, id)` with an opt-in page-number mode.
+
+    By default pages are addressed by an opaque cursor and fetched with a `WHERE created_at < ...`
+    range scan over a matching composite index, so latency stays flat at any depth and no
+    `COUNT(*)` is issued. Clients that still need page numbers can pass the `page` query
+    parameter, which switches to `PageNumberPagination` with the same ordering and page size.
+
+    Attributes:
+        page_size: Number of items per page.
+        ordering: The keyset ordering, ending with `id` as a tiebreaker.
+        page_number_query_param: The query parameter that opts in to page-number pagination.
+    """
+    page_size = 10
+    ordering = ('-created_at', '-id')
+    page_number_query_param = 'page'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Paginates the queryset by cursor, or by page number if the client opted in.
+
+        Args:
+            queryset (QuerySet): The queryset to paginate.
+            request: HTTP request.
+            view: The view being paginated.
+
+        Returns:
+            list: The items on the requested page.
+        """
+        self.page_number_paginator = None
+        if self.page_number_query_param in request.query_params:
+            self.page_number_paginator = PageNumberPagination()
+            self.page_number_paginator.page_size = self.page_size
+            self.page_number_paginator.page_query_param = self.page_number_query_param
+            return self.page_number_paginator.paginate_queryset(queryset.order_by(*self.ordering), request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        """
+        Builds the paginated response in the format of the active pagination mode.
+
+        Args:
+            data (list): The serialized items on the page.
+
+        Returns:
+            Response: The paginated response.
+        """
+        if self.page_number_paginator is not None:
+            return self.page_number_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+class BlogPostPagination(KeysetPagination):
+    """
+    Custom pagination for blog posts, newest first.
     
     Attributes:
         page_size: Number of items per page.
     """
     page_size = 10
 
+class CommentPagination(KeysetPagination):
+    """
+    Pagination for comments, oldest first so threads read in order.
+
+    Attributes:
+        page_size: Number of items per page.
+        ordering: Orders comments by creation date ascending.
+    """
+    page_size = 20
+    ordering = ('created_at', 'id')
+
+class NotificationPagination(KeysetPagination):
+    """
+    Pagination for notifications, newest first.
+
+    Attributes:
+        page_size: Number of items per page.
+    """
+    page_size = 20
+
+class SearchPagination(PageNumberPagination):
+    """
+    Page-number pagination for search results, which are ordered by relevance rather than by a
+    keyset.
+
+    Attributes:
+        page_size: Number of results per page.
+        max_page: The deepest page served; relevance-ranked results past it are rarely useful and
+            cost an ever larger OFFSET.
+    """
+    page_size = 20
+    max_page = 50
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Paginates the search results, rejecting pages beyond `max_page`.
+        """
+        page = request.query_params.get(self.page_query_param, '1')
+        if page.isdigit() and int(page) > self.max_page:
+            raise NotFound(f'Search results are limited to {self.max_page} pages.')
+        return super().paginate_queryset(queryset, request, view)
+
 class BlogPostListCreateView(generics.ListCreateAPIView):
     """
     View to list and create blog posts.
+
+    A page of posts is served with a constant number of queries: one for the pagination count,
+    one for the posts joined with their authors, and one prefetching the liking users' ids.
     
     Attributes:
-        queryset: All blog posts.
+        queryset: All blog posts, prepared for listing.
         serializer_class: Serializer for blog posts.
         permission_classes: Allows read access to all users and write access to authenticated users.
         pagination_class: Uses custom pagination for blog posts.
-        
+
     Methods:
-        get_queryset(): Returns cached blog posts if available, otherwise fetches from the database.
+        list(request, *args, **kwargs): Returns a page of blog posts from the versioned page cache.
     """
-    queryset = BlogPost.objects.all()
+    queryset = BlogPost.objects.for_listing()
     serializer_class = BlogPostSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     pagination_class = BlogPostPagination
 
-    def get_queryset(self):
+    def list(self, request, *args, **kwargs):
         """
-        Retrieves blog posts from cache or database.
-        
+        Returns a page of blog posts, served from the versioned page cache.
+
+        Pages are cached as serialized JSON keyed by scheme, host and query parameters (page,
+        page size and filters), since the pagination links are absolute URLs, and are invalidated
+        by post, comment and like writes bumping the content generation.
+        An authenticated user's likes still in the like buffer are applied to the page.
+
+        Args:
+            request: HTTP request.
+
         Returns:
-            QuerySet: List of blog posts.
+            Response: A paginated list of blog posts.
         """
-        queryset = cache.get('blog_posts')
-        if not queryset:
-            queryset = BlogPost.objects.all()
-            cache.set('blog_posts', queryset, timeout=60*15)  # Cache for 15 minutes
-        return queryset
+        parts = {'scheme': request.scheme, 'host': request.get_host(), 'query': sorted(request.query_params.lists())}
+        data = post_page_cache.get_or_build(
+            parts,
+            lambda: super(BlogPostListCreateView, self).list(request, *args, **kwargs).data,
+        )
+        if request.user.is_authenticated:
+            overlay_pending_likes(data['results'], request.user.pk)
+        return Response(data)
 
 class BlogPostRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     """
@@ -182,48 +362,34 @@ class BlogPostRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
         permission_classes: Allows read access to all users and write access to authenticated users.
         
     Methods:
-        get_object(): Retrieves a blog post from cache or database.
-        perform_update(serializer): Updates the blog post and refreshes the cache.
-        perform_destroy(instance): Deletes the blog post and clears the cache.
+        retrieve(request, *args, **kwargs): Returns the blog post from the versioned fragment cache and records a view for authenticated users.
     """
-    queryset = BlogPost.objects.all()
-    serializer_class = BlogPostSerializer
+    queryset = BlogPost.objects.for_listing()
+    serializer_class = BlogPostDetailSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
-    def get_object(self):
-        """
-        Retrieves the blog post from cache or database.
-        
-        Returns:
-            BlogPost: The requested blog post instance.
+    def retrieve(self, request, *args, **kwargs):
         """
-        obj = cache.get(f'blog_post_{self.kwargs["pk"]}')
-        if not obj:
-            obj = super().get_object()
-            cache.set(f'blog_post_{self.kwargs["pk"]}', obj, timeout=60*15)  # Cache for 15 minutes
-        return obj
+        Returns the blog post and records a view when the requester is authenticated.
 
-    def perform_update(self, serializer):
-        """
-        Updates the blog post and refreshes the cache.
-        
-        Args:
-            serializer: BlogPostSerializer instance.
-        """
-        instance = serializer.save()
-        cache.set(f'blog_post_{instance.pk}', instance, timeout=60*15)
-        cache.delete('blog_posts')
+        The serialized post is cached as a JSON fragment that is invalidated by the content
+        generation, which post saves and deletes bump.
+        The requester's own like still in the like buffer is applied to the post.
 
-    def perform_destroy(self, instance):
-        """
-        Deletes the blog post and clears the cache.
-        
         Args:
-            instance: BlogPost instance to be deleted.
+            request: HTTP request.
+
+        Returns:
+            Response: Serialized blog post data.
         """
-        cache.delete(f'blog_post_{instance.pk}')
-        cache.delete('blog_posts')
-        instance.delete()
+        data = post_detail_cache.get_or_build(
+            {'pk': self.kwargs['pk']},
+            lambda: self.get_serializer(self.get_object()).data,
+        )
+        if request.user.is_authenticated:
+            record_view(data['id'], request.user)
+            overlay_pending_likes([data], request.user.pk)
+        return Response(data)
 
 class CommentListCreateView(generics.ListCreateAPIView):
     """
@@ -233,23 +399,93 @@ class CommentListCreateView(generics.ListCreateAPIView):
         queryset: Retrieves all comment instances.
         serializer_class: Serializer used for serializing and deserializing comment data.
         permission_classes: Allows read access to all users and write access to authenticated users.
+        pagination_class: Uses keyset pagination for comments.
+        throttle_scope: Rate limits new comments per user (`comments`) and per client IP (`comments_ip`).
         
     Methods:
+        get_throttles(): Throttles comment creation only, not listing.
         perform_create(serializer): Associates the newly created comment with the currently authenticated user.
     """
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = CommentPagination
+    throttle_scope = 'comments'
+
+    def get_throttles(self):
+        """
+        Returns the throttles for comment creation; listing comments is not throttled.
+        """
+        if self.request.method == 'POST':
+            return super().get_throttles()
+        return []
 
     def perform_create(self, serializer):
         """
-        Saves the comment with the currently authenticated user as the author.
+        Saves the comment with the currently authenticated user as the author and streams it to
+        the post's watchers.
         
         Args:
             serializer (CommentSerializer): Serializer instance for the comment.
         """
         comment = serializer.save(author=self.request.user)
-        send_notification(comment.post.author, f'New comment on your post: {comment.content}')
+        adjust_counter(comment.post_id, 'comment_count', 1)
+        publish_comment(comment)
+        send_notification(
+            comment.post.author,
+            f'New comment on your post: {comment.content}',
+            key=f'comments:{comment.post_id}',
+            summary=f'{{count}} new comments on your post: {comment.post.title}',
+        )
+
+class PostCommentThreadView(generics.ListAPIView):
+    """
+    View to list the comments of a blog post as threads.
+
+    Top-level comments are paginated with keyset pagination, and all replies in the threads on
+    the page are fetched with one query through the `root` column and assembled into a tree in
+    memory, so a page costs two queries regardless of how deeply the threads are nested.
+
+    Attributes:
+        permission_classes: Allows read access to all users.
+        pagination_class: Uses keyset pagination over top-level comments.
+
+    Methods:
+        get_queryset(): Returns the top-level comments of the post.
+        list(request, *args, **kwargs): Returns a page of threads, optionally limited to `?depth=N` reply levels.
+    """
+    permission_classes = [AllowAny]
+    pagination_class = CommentPagination
+
+    def get_queryset(self):
+        """
+        Retrieves the top-level comments of the blog post as dicts.
+
+        Returns:
+            QuerySet: Top-level comments of the post.
+        """
+        return Comment.objects.filter(post_id=self.kwargs['pk'], parent__isnull=True).values(*THREAD_FIELDS)
+
+    def list(self, request, *args, **kwargs):
+        """
+        Handles the GET request to list the post's comment threads.
+
+        Args:
+            request: HTTP request, optionally with a `depth` query parameter.
+
+        Returns:
+            Response: A paginated list of top-level comments with nested replies.
+        """
+        max_depth = request.query_params.get('depth')
+        if max_depth is not None:
+            if not max_depth.isdigit():
+                raise ValidationError({'depth': 'Must be a non-negative integer.'})
+            max_depth = int(max_depth)
+        roots = self.paginate_queryset(self.get_queryset())
+        if not roots and not BlogPost.objects.filter(pk=self.kwargs['pk']).exists():
+            raise NotFound('Blog post not found.')
+        replies = fetch_thread_comments([root['id'] for root in roots])
+        return self.get_paginated_response(build_comment_tree(roots, replies, max_depth))
 
 class CommentRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     """
@@ -262,6 +498,7 @@ class CommentRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
         
     Methods:
         perform_update(serializer): Updates the comment while preserving the original author.
+        perform_destroy(instance): Deletes the comment and its replies and decrements the post's comment counter.
     """
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
@@ -276,6 +513,20 @@ class CommentRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
         """
         serializer.save(author=self.request.user)
 
+    def perform_destroy(self, instance):
+        """
+        Deletes the comment, cascading to its replies, removes them from the search index, and
+        decrements the post's comment counter by the number of comments actually removed.
+
+        Args:
+            instance (Comment): The comment to delete.
+        """
+        remove_comments(subtree_ids(instance))
+        _, deleted = instance.delete()
+        removed = deleted.get(Comment._meta.label, 0)
+        adjust_counter(instance.post_id, 'comment_count', -removed)
+        adjust_total('comments', -removed)
+
 class LikePostView(generics.CreateAPIView):
     """
     View to handle liking a blog post.
@@ -284,6 +535,7 @@ class LikePostView(generics.CreateAPIView):
         queryset: Retrieves all like instances.
         serializer_class: Serializer used for creating a like.
         permission_classes: Allows access to authenticated users only.
+        throttle_scope: Rate limits likes and unlikes per user (`likes`) and per client IP (`likes_ip`).
         
     Methods:
         post(request, *args, **kwargs): Handles the creation of a like for a blog post, ensuring a user can like a post only once.
@@ -291,10 +543,15 @@ class LikePostView(generics.CreateAPIView):
     queryset = Like.objects.all()
     serializer_class = LikeSerializer
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'likes'
 
     def post(self, request, *args, **kwargs):
         """
         Handles the POST request to like a blog post.
+
+        The like is inserted with a single `INSERT ... ON CONFLICT DO NOTHING` statement, so
+        concurrent double taps create one like and the second gets the "already liked" response.
+        With `LIKE_BUFFER` enabled the like is buffered and written by the next flush instead.
         
         Args:
             request: HTTP request containing user and post data.
@@ -303,12 +560,12 @@ class LikePostView(generics.CreateAPIView):
             Response: Success message if like is created, or error if the post is already liked.
         """
         post_id = self.kwargs['pk']
-        user = request.user
-        post = BlogPost.objects.get(pk=post_id)
-        if Like.objects.filter(user=user, post=post).exists():
-            return Response({"detail": "You have already liked this post."}, status=status.HTTP_400_BAD_REQUEST)
-        Like.objects.create(user=user, post=post)
-        return Response({"detail": "Post liked."}, status=status.HTTP_201_CREATED)
+        added, _ = write_likes(request.user.pk, liked=[post_id])
+        if added:
+            return Response({"detail": "Post liked."}, status=status.HTTP_201_CREATED)
+        if not BlogPost.objects.filter(pk=post_id).exists():
+            raise NotFound("Post not found.")
+        return Response({"detail": "You have already liked this post."}, status=status.HTTP_400_BAD_REQUEST)
 
 class UnlikePostView(generics.DestroyAPIView):
     """
@@ -318,6 +575,7 @@ class UnlikePostView(generics.DestroyAPIView):
         queryset: Retrieves all like instances.
         serializer_class: Serializer used for deleting a like.
         permission_classes: Allows access to authenticated users only.
+        throttle_scope: Shares the `likes` rate limits with LikePostView.
         
     Methods:
         delete(request, *args, **kwargs): Handles the deletion of a like for a blog post, ensuring a user can only unlike posts they have liked.
@@ -325,10 +583,12 @@ class UnlikePostView(generics.DestroyAPIView):
     queryset = Like.objects.all()
     serializer_class = LikeSerializer
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'likes'
 
     def delete(self, request, *args, **kwargs):
         """
-        Handles the DELETE request to unlike a blog post.
+        Handles the DELETE request to unlike a blog post with a single `DELETE ... RETURNING`
+        statement.
         
         Args:
             request: HTTP request containing user and post data.
@@ -336,51 +596,219 @@ class UnlikePostView(generics.DestroyAPIView):
         Returns:
             Response: Success message if like is deleted, or error if the post was not liked.
         """
-        post_id = self.kwargs['pk']
-        user = request.user
-        post = BlogPost.objects.get(pk=post_id)
-        like = Like.objects.filter(user=user, post=post).first()
-        if like:
-            like.delete()
+        _, removed = write_likes(request.user.pk, unliked=[self.kwargs['pk']])
+        if removed:
             return Response({"detail": "Post unliked."}, status=status.HTTP_204_NO_CONTENT)
         return Response({"detail": "You have not liked this post."}, status=status.HTTP_400_BAD_REQUEST)
+
+class LikeBatchView(views.APIView):
+    """
+    View to apply a batch of like and unlike operations, e.g. queued by an offline mobile client.
+
+    Operations on the same post collapse to the last one, all likes are inserted with one
+    statement and all unlikes deleted with another, in one transaction. Operations are idempotent,
+    so a client can resend a batch whose response it did not receive.
+    
+    Attributes:
+        permission_classes: Allows access to authenticated users only.
+        throttle_scope: Shares the `likes` rate limits with LikePostView; a batch counts as one request.
+        
+    Methods:
+        post(request): Applies the operations and returns the outcome of each post.
+    """
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'likes'
+
+    def post(self, request, *args, **kwargs):
+        """
+        Applies the operations and returns, for each distinct post, the applied action, whether it
+        changed anything and whether the post exists.
+        
+        Args:
+            request: HTTP request with `operations`, a list of `{"post": id, "action": "like" | "unlike"}`.
+            
+        Returns:
+            Response: The `results` of the batch.
+        """
+        serializer = LikeBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = apply_like_operations(request.user.pk, serializer.validated_data['operations'])
+        return Response({'results': results}, status=status.HTTP_200_OK)
     
+class SearchView(generics.GenericAPIView):
+    """
+    View to search blog posts and comments by full-text relevance.
+
+    The `q` query parameter is split into terms that must all match; a trailing `*` makes a term a
+    prefix match. `type` restricts the results to `post` or `comment`. Results come from the
+    full-text index in `blog.search` ranked by BM25 (or `ts_rank_cd` on PostgreSQL), and each page
+    costs one ranked query, one COUNT and at most one query each for the matched posts and comments.
+
+    Attributes:
+        permission_classes: Allows access to anyone.
+        pagination_class: Paginates the results by page number.
+
+    Methods:
+        get(request, *args, **kwargs): Returns a page of search results.
+    """
+    permission_classes = [AllowAny]
+    pagination_class = SearchPagination
+
+    def get(self, request, *args, **kwargs):
+        """
+        Handles the GET request to search posts and comments.
+
+        Args:
+            request: HTTP request with the `q` and optional `type` query parameters.
+
+        Returns:
+            Response: A page of results, each with its `type`, `id`, `post`, `title`, highlighted
+                `snippet` and `score`.
+        """
+        terms = parse_terms(request.query_params.get('q'))
+        if not terms:
+            raise ValidationError({'q': 'Enter at least one search term.'})
+        kind = request.query_params.get('type')
+        if kind is not None and kind not in KINDS:
+            raise ValidationError({'type': f'Must be one of: {", ".join(KINDS)}.'})
+        page = self.paginate_queryset(SearchResults(terms, KINDS.get(kind)))
+        return self.get_paginated_response(page)
+
 class AnalyticsView(generics.GenericAPIView):
     """
     View to provide analytics data about the application, including users, posts, comments, likes, and views.
+
+    Totals are read from the running totals kept by `blog.rollups`, and the time series from its
+    hourly and daily buckets, so the cost of a request depends on the requested range rather than
+    on the size of the raw tables.
     
     Attributes:
         permission_classes: Restricts access to admin users only.
+        max_buckets (int): The maximum number of buckets a time series may span.
+        default_days (int): The number of days covered by the time series when no range is given.
         
     Methods:
         get(request, *args, **kwargs): Retrieves aggregated analytics data and returns it in the response.
+        get_date_param(request, name): Parses an optional ISO date query parameter.
+        get_series_params(request, start_day, end_day): Validates the time series query parameters.
     """
     permission_classes = [IsAdminUser]
+    max_buckets = 24 * 31
+    default_days = 7
+
+    def get_date_param(self, request, name):
+        """
+        Parses an optional ISO date (YYYY-MM-DD) query parameter.
+
+        Args:
+            request: HTTP request.
+            name (str): The name of the query parameter.
+
+        Returns:
+            date: The parsed date, or None if the parameter is absent.
+        """
+        value = request.query_params.get(name)
+        if value is None:
+            return None
+        try:
+            parsed = parse_date(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValidationError({name: 'Must be a date in YYYY-MM-DD format.'})
+        return parsed
+
+    def get_series_params(self, request, start_day, end_day):
+        """
+        Validates the time series query parameters and resolves the requested range.
+
+        Without `start` and `end` the series covers the last `default_days` days; with only one of
+        them it covers `default_days` days from or up to that date.
+
+        Args:
+            request: HTTP request.
+            start_day (date): The parsed `start` parameter, or None.
+            end_day (date): The parsed `end` parameter, or None.
+
+        Returns:
+            tuple: The metrics, the granularity, and the aware start and end of the range.
+        """
+        granularity = request.query_params.get('granularity', 'day')
+        if granularity not in GRANULARITIES:
+            raise ValidationError({'granularity': f'Must be one of: {", ".join(GRANULARITIES)}.'})
+        metrics = request.query_params.get('metrics')
+        metrics = [metric for metric in metrics.split(',') if metric] if metrics else list(METRICS)
+        unknown = set(metrics) - set(METRICS)
+        if unknown:
+            raise ValidationError({'metrics': f'Unknown metrics: {", ".join(sorted(unknown))}.'})
+
+        span = timedelta(days=self.default_days - 1)
+        if end_day is None:
+            end_day = start_day + span if start_day else timezone.now().date()
+        if start_day is None:
+            start_day = end_day - span
+        if start_day > end_day:
+            raise ValidationError({'start': 'Must not be after end.'})
+        start, end = day_bounds(start_day, end_day)
+        if (end - start) / GRANULARITIES[granularity] > self.max_buckets:
+            raise ValidationError({'granularity': f'The range spans more than {self.max_buckets} buckets.'})
+        return metrics, granularity, start, end
 
     def get(self, request, *args, **kwargs):
         """
         Handles the GET request to retrieve analytics data.
+
+        The optional `start` and `end` dates select the range of the time series and of the
+        estimated number of distinct viewers, which is computed by merging the site-wide daily
+        HyperLogLog sketches. `granularity` (`hour` or `day`) and a comma-separated `metrics` list
+        shape the series.
         
         Args:
             request: HTTP request.
             
         Returns:
-            Response: Aggregated analytics data including counts of active users, posts, comments, likes, and views.
+            Response: Aggregated analytics data including counts of active users, posts, comments, likes, views,
+                estimated unique viewers, and the per-bucket counts of each metric.
         """
-        active_users = get_user_model().objects.filter(is_active=True).count()
-        total_posts = BlogPost.objects.count()
-        total_comments = Comment.objects.count()
-        total_likes = Like.objects.count()
-        total_views = PostView.objects.count()
+        start_day = self.get_date_param(request, 'start')
+        end_day = self.get_date_param(request, 'end')
+        metrics, granularity, start, end = self.get_series_params(request, start_day, end_day)
+        totals = get_totals()
         data = {
-            "active_users": active_users,
-            "total_posts": total_posts,
-            "total_comments": total_comments,
-            "total_likes": total_likes,
-            "total_views": total_views,
+            "active_users": totals['active_users'],
+            "total_posts": totals['posts'],
+            "total_comments": totals['comments'],
+            "total_likes": totals['likes'],
+            "total_views": totals['views'],
+            "unique_viewers": estimate_unique_viewers(start=start_day, end=end_day),
+            "granularity": granularity,
+            "start": start,
+            "end": end,
+            "series": get_series(metrics, granularity, start, end),
         }
         return Response(data, status=status.HTTP_200_OK)
 
+class ThrottleMetricsView(views.APIView):
+    """
+    View to report rate limiting activity.
+
+    Counters are kept per worker process, so the response covers the worker that served it.
+    
+    Attributes:
+        permission_classes: Restricts access to admin users only.
+        
+    Methods:
+        get(request): Returns the throttling backend, algorithm and per-scope counters.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        """
+        Returns the throttling backend and algorithm, and the rate and the numbers of allowed and
+        throttled requests of each scope.
+        """
+        return Response(get_throttle_metrics(), status=status.HTTP_200_OK)
+
 class NotificationListView(generics.ListAPIView):
     """
     View to list all notifications for the currently authenticated user.
@@ -388,12 +816,14 @@ class NotificationListView(generics.ListAPIView):
     Attributes:
         serializer_class (NotificationSerializer): Serializer used for serializing notification data.
         permission_classes: Allows access to authenticated users only.
+        pagination_class: Uses keyset pagination for notifications.
 
     Methods:
         get_queryset(): Returns the list of notifications for the current user.
     """
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = NotificationPagination
 
     def get_queryset(self):
         """
@@ -402,7 +832,7 @@ class NotificationListView(generics.ListAPIView):
         Returns:
             QuerySet: List of notifications for the current user.
         """
-        return Notification.objects.filter(user=self.request.user)
+        return Notification.objects.filter(user_id=self.request.user.pk)
 
 
 class MarkNotificationAsReadView(generics.UpdateAPIView):
@@ -415,7 +845,7 @@ class MarkNotificationAsReadView(generics.UpdateAPIView):
 
     Methods:
         get_queryset(): Returns the notifications for the current user.
-        perform_update(serializer): Marks the notification as read and saves the instance.
+        perform_update(serializer): Marks the notification as read with a single UPDATE.
     """
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
@@ -427,17 +857,94 @@ class MarkNotificationAsReadView(generics.UpdateAPIView):
         Returns:
             QuerySet: List of notifications for the current user.
         """
-        return Notification.objects.filter(user=self.request.user)
+        return Notification.objects.filter(user_id=self.request.user.pk)
 
     def perform_update(self, serializer):
         """
-        Marks the notification as read and saves the instance.
+        Marks the notification as read with a single UPDATE, which also tells whether it was
+        unread; other submitted fields are ignored. If it was unread, the user's unread counter is
+        decremented and the change pushed to their sockets.
 
         Args:
             serializer (NotificationSerializer): Serializer instance for the notification.
         """
-        serializer.instance.is_read = True
-        serializer.save()
+        notification = serializer.instance
+        marked = Notification.objects.filter(pk=notification.pk, is_read=False).update(is_read=True)
+        notification.is_read = True
+        if marked:
+            adjust_unread({notification.user_id: -marked})
+            get_unread_count_buffer().record(notification.user_id, -marked)
+
+
+class MarkNotificationsReadView(generics.GenericAPIView):
+    """
+    View to mark many notifications as read with a single UPDATE.
+
+    The request body selects the notifications with exactly one of `{"all": true}`, `{"up_to": <id>}`
+    or `{"ids": [...]}`. Only the user's own unread notifications are updated, the unread counter is
+    decremented by the number of rows actually changed, and the change is pushed to the user's
+    sockets as a single count delta.
+
+    Attributes:
+        serializer_class (MarkNotificationsReadSerializer): Serializer validating the selector.
+        permission_classes: Allows access to authenticated users only.
+
+    Methods:
+        post(request, *args, **kwargs): Marks the selected notifications as read.
+    """
+    serializer_class = MarkNotificationsReadSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        """
+        Handles the POST request to mark notifications as read.
+
+        Args:
+            request: HTTP request containing the selector.
+
+        Returns:
+            Response: The number of notifications marked as read and the remaining unread count.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        selector = serializer.validated_data
+        notifications = Notification.objects.filter(user_id=request.user.pk, is_read=False)
+        if 'up_to' in selector:
+            notifications = notifications.filter(pk__lte=selector['up_to'])
+        elif 'ids' in selector:
+            notifications = notifications.filter(pk__in=selector['ids'])
+        with transaction.atomic():
+            marked = notifications.update(is_read=True)
+            adjust_unread({request.user.pk: -marked})
+        if marked:
+            get_unread_count_buffer().record(request.user.pk, -marked)
+        return Response({'marked': marked, 'unread': get_unread_count(request.user.pk)}, status=status.HTTP_200_OK)
+
+
+class UnreadNotificationCountView(views.APIView):
+    """
+    View returning the number of unread notifications of the current user from its maintained
+    counter, with a single primary key lookup.
+
+    Attributes:
+        permission_classes: Allows access to authenticated users only.
+
+    Methods:
+        get(request, *args, **kwargs): Returns the unread count.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        """
+        Handles the GET request for the unread count.
+
+        Args:
+            request: HTTP request.
+
+        Returns:
+            Response: The number of unread notifications.
+        """
+        return Response({'unread': get_unread_count(request.user.pk)}, status=status.HTTP_200_OK)
 
 
 class NotificationPreferenceView(generics.RetrieveUpdateAPIView):
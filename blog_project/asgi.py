@@ -10,13 +10,17 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
-from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
-from blog.routing import websocket_urlpatterns
 
 # Set the default settings module for the Django application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blog_project.settings')
 
+# Set up Django (and load the app registry) before importing modules that use the models.
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from blog.middleware import JWTAuthMiddleware  # noqa: E402
+from blog.routing import websocket_urlpatterns  # noqa: E402
+
 """
 Main ASGI application entry point.
 
@@ -24,13 +28,13 @@ Routes incoming connections based on their protocol type.
 
 Protocols:
     "http": Handles standard HTTP connections using Django's ASGI application.
-    "websocket": Handles WebSocket connections with authentication support.
+    "websocket": Handles WebSocket connections authenticated with a JWT access token.
 """
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
-    "websocket": AuthMiddlewareStack(
-        # Middleware stack that provides authentication for WebSocket connections.
-        # Wraps the WebSocket routing layer with session-based authentication.
+    "http": django_asgi_app,
+    "websocket": JWTAuthMiddleware(
+        # Middleware that authenticates WebSocket connections from the JWT access token offered
+        # as the `bearer` subprotocol or `token` query parameter, without a session or user query.
         URLRouter(
             # Defines the routing for WebSocket connections using `websocket_urlpatterns`.
             # `websocket_urlpatterns`: A list of URL patterns for WebSocket routes defined in `blog.routing`.
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -51,20 +52,111 @@ INSTALLED_APPS = [
 
 ASGI_APPLICATION = 'blog_project.asgi.application'
 
-CHANNEL_LAYERS = {
-    'default': {
+# Channel layer backends (see blog.layers), chosen with the CHANNEL_LAYER_BACKEND environment
+# variable: 'local' keeps groups in the process, for single-node deployments; 'redis' shares them
+# through one Redis server; 'sharded' spreads them over the comma-separated Redis URLs in
+# CHANNEL_LAYER_HOSTS with a consistent hash ring.
+CHANNEL_LAYER_BACKENDS = {
+    'local': {
+        'BACKEND': 'blog.layers.LocalChannelLayer',
+    },
+    'redis': {
         'BACKEND': 'channels_redis.core.RedisChannelLayer',
         'CONFIG': {
             "hosts": [('127.0.0.1', 6379)],
         },
     },
+    'sharded': {
+        'BACKEND': 'blog.layers.ShardedRedisChannelLayer',
+        'CONFIG': {
+            "hosts": os.environ.get('CHANNEL_LAYER_HOSTS', 'redis://127.0.0.1:6379').split(','),
+        },
+    },
+}
+
+CHANNEL_LAYERS = {
+    'default': CHANNEL_LAYER_BACKENDS[os.environ.get('CHANNEL_LAYER_BACKEND', 'redis')],
 }
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'blog.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_THROTTLE_CLASSES': (
+        'blog.throttling.ScopedUserThrottle',
+        'blog.throttling.ScopedIPThrottle',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '30/min',
+        'login_account': '10/min',
+        'register_ip': '10/hour',
+        'likes': '60/min',
+        'likes_ip': '300/min',
+        'comments': '20/min',
+        'comments_ip': '100/min',
+    },
+}
+
+# Rate limiting engine for the scoped throttles above (see blog.throttling). 'local' keeps the
+# counters in each worker; 'redis' shares them between workers through atomic Lua scripts.
+# ALGORITHM is 'token_bucket' (bursts up to the rate, refilled continuously) or 'sliding_window'.
+THROTTLING = {
+    'BACKEND': 'local',
+    'ALGORITHM': 'token_bucket',
+}
+
+# Write-behind buffer for post views (see blog.ingest), written by a background thread every
+# MAX_AGE seconds. Use 'redis' to share the buffer between workers, and with 'BACKGROUND' False
+# flush it from a dedicated process with `python manage.py flush_post_views`.
+POST_VIEW_BUFFER = {
+    'BACKEND': 'local',
+    'MAX_SIZE': 500,
+    'MAX_AGE': 5.0,
+    'BACKGROUND': True,
+}
+
+# Write-behind likes (see blog.likes.LikeBuffer), for posts liked faster than rows can be inserted
+# one request at a time. Likes are written in batches every MAX_AGE seconds and the like counts seen
+# by other users lag by up to that interval. The liking user sees their own pending likes on any
+# worker with 'redis', but only on the accepting worker with 'local' (use sticky routing). Use
+# 'redis' with 'BACKGROUND' False to flush from a dedicated process with `python manage.py flush_likes`.
+LIKE_BUFFER = {
+    'ENABLED': False,
+    'BACKEND': 'local',
+    'MAX_SIZE': 500,
+    'MAX_AGE': 1.0,
+    'BACKGROUND': True,
+}
+
+# Activity streamed to the readers of each post over ws/posts/<id>/ (see blog.activity): new
+# comments and counter changes are batched and pushed at most once every MAX_AGE seconds per post.
+POST_ACTIVITY = {
+    'BACKEND': 'local',
+    'MAX_SIZE': 10000,
+    'MAX_AGE': 1.0,
+    'BACKGROUND': True,
+}
+
+# Outbox for notifications (see blog.outbox). Rows are written and WebSocket pushes sent in bulk
+# by a background thread. To dispatch from a dedicated process instead, use 'redis', set
+# 'BACKGROUND' to False and run `python manage.py dispatch_notifications --interval 1`.
+NOTIFICATION_OUTBOX = {
+    'BACKEND': 'local',
+    'MAX_SIZE': 200,
+    'MAX_AGE': 1.0,
+    'BACKGROUND': True,
+}
+
+# Retention policy applied by `python manage.py purge_notifications` (see blog.retention): read
+# notifications older than READ_DAYS and each user's notifications beyond MAX_PER_USER are removed
+# in batches of BATCH_SIZE, and copied to NotificationArchive first when ARCHIVE is set.
+NOTIFICATION_RETENTION = {
+    'READ_DAYS': 30,
+    'MAX_PER_USER': 1000,
+    'ARCHIVE': False,
+    'BATCH_SIZE': 1000,
+    'SLEEP': 0.0,
 }
 
 SPECTACULAR_SETTINGS = {
@@ -91,6 +183,19 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
 }
 
+# Per-worker Bloom filter of blacklisted refresh tokens (see blog.blacklist). Tokens blacklisted by
+# other workers are picked up every SYNC_INTERVAL seconds; the filter is rebuilt without expired
+# tokens every REBUILD_INTERVAL seconds. Tokens blacklisted in the last SYNC_MARGIN seconds are
+# re-read by every sync, so entries whose transaction commits late are not skipped. Prune expired
+# tokens with `python manage.py prune_tokens`.
+TOKEN_BLACKLIST_FILTER = {
+    'CAPACITY': 100000,
+    'ERROR_RATE': 0.001,
+    'SYNC_INTERVAL': 1.0,
+    'REBUILD_INTERVAL': 300.0,
+    'SYNC_MARGIN': 60.0,
+}
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -136,6 +241,27 @@ DATABASES = {
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
+# Passwords are hashed with scrypt at the cost in PASSWORD_HASHING (see blog.hashers); hashes made
+# by the other hashers are still accepted and upgraded on the next login. To use Argon2 instead,
+# add argon2-cffi to requirements.txt and put 'django.contrib.auth.hashers.Argon2PasswordHasher'
+# first. Logins check passwords in a pool of WORKERS threads.
+PASSWORD_HASHERS = [
+    'blog.hashers.ScryptPasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
+PASSWORD_HASHING = {
+    'SCRYPT_WORK_FACTOR': 2 ** 14,
+    'SCRYPT_BLOCK_SIZE': 8,
+    'SCRYPT_PARALLELISM': 1,
+    'WORKERS': 4,
+}
+
+AUTHENTICATION_BACKENDS = [
+    'blog.hashers.PooledModelBackend',
+]
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',